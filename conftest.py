@@ -0,0 +1,3 @@
+# conftest.py na raiz: o pytest insere este diretório em sys.path,
+# tornando fase1/, fase2/, fase3/, utils/ e testes/ importáveis sem
+# nenhum sys.path.append nos próprios testes
@@ -5,6 +5,7 @@ Características:
 - Detecta corrupção com checksum
 - Protocolo Stop-and-Wait
 """
+import collections
 import socket
 import threading
 import time
@@ -15,26 +16,40 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.packet import RDTPacket, PacketType
 from utils.simulator import UnreliableChannel
 from utils.logger import ProtocolLogger
+from utils.mmsg import batch_receiver
+from utils.bufpool import BufferPool
+
+
+def _log_socket_buffers(sock, logger):
+    """Registra os tamanhos efetivos dos buffers do socket (o kernel os dobra)"""
+    rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    sndbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+    logger.debug("Buffers do socket: SO_RCVBUF=%d, SO_SNDBUF=%d", rcvbuf, sndbuf)
 
 
 class RDT20Sender:
     """Remetente do protocolo rdt2.0"""
     
-    def __init__(self, port, channel = None):
+    def __init__(self, port, channel = None, rcvbuf = 12582912, sndbuf = 12582912):
         """
         Inicializa o Remetente (Sender)
-        
+
         Args:
             port: Porta local para bind
             channel: UnreliableChannel para simular erros (opcional)
+            rcvbuf: Tamanho solicitado do buffer de recepção (SO_RCVBUF)
+            sndbuf: Tamanho solicitado do buffer de envio (SO_SNDBUF)
         """
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) # --> Define o canal socket como Ipv4 e UDP
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
         self.socket.bind(('localhost', port))
         self.port = port
         self.channel = channel
-        
+
         self.logger = ProtocolLogger(f'RDT2.0-Sender-{port}')
-        
+        _log_socket_buffers(self.socket, self.logger)
+
         # Estado
         self.state = 'WAIT_CALL'  # WAIT_CALL ou WAIT_ACK
         self.peer_address = None
@@ -44,7 +59,18 @@ class RDT20Sender:
         self.retransmissions = 0
         self.acks_received = 0
         self.naks_received = 0
-    
+
+        # Buffers reutilizáveis de recepção
+        self._rx_pool = BufferPool(buffer_size = 1024)
+
+        # Envio pré-vinculado: elimina o branch if self.channel do caminho quente
+        if channel:
+            self._send_buffers = (lambda buffers, addr:
+                                  channel.send(buffers, self.socket, addr))
+        else:
+            self._send_buffers = (lambda buffers, addr:
+                                  self.socket.sendmsg(buffers, [], 0, addr))
+
     def send(self, data, dest_address):
         """
         Envia dados usando protocolo rdt2.0 (Stop-and-Wait)
@@ -60,7 +86,7 @@ class RDT20Sender:
         
         # Criar pacote DATA
         packet = RDTPacket(PacketType.DATA, seq_num = 0, data = data)
-        self.logger.send(f"{packet} - Dados: {data[:20]}")
+        self.logger.send("%s - Dados: %r", packet, data[:20])
         
         # Loop Stop-and-Wait
         while True:
@@ -74,45 +100,45 @@ class RDT20Sender:
             response = self._wait_for_response()
             
             if response.is_corrupt():
-                self.logger.corrupt(f"{response} - Retransmitindo")
+                self.logger.corrupt("%s - Retransmitindo", response)
                 self.retransmissions += 1
                 continue
             
             if response.type == PacketType.ACK:
-                self.logger.receive(f"{response} - Pacote confirmado")
+                self.logger.receive("%s - Pacote confirmado", response)
                 self.acks_received += 1
                 self.state = 'WAIT_CALL'
                 break
             
             elif response.type == PacketType.NAK:
-                self.logger.receive(f"{response} - Retransmissão solicitada")
+                self.logger.receive("%s - Retransmissão solicitada", response)
                 self.naks_received += 1
                 self.retransmissions += 1
                 continue
     
     def _send_packet(self, packet):
-        """Envia pacote através do canal"""
-        packet_bytes = packet.serialize()
+        """Envia pacote através do canal (função de envio pré-vinculada)"""
+        self._send_buffers((packet.serialize_header(), packet.data),
+                           self.peer_address)
 
-        if self.channel:
-            self.channel.send(packet_bytes, self.socket, self.peer_address)
-        else:
-            self.socket.sendto(packet_bytes, self.peer_address)
-    
     def _wait_for_response(self):
         """
         Aguarda resposta (ACK ou NAK) do receptor
-            
+
         Returns:
             RDTPacket
         """
+        buf = self._rx_pool.acquire()
         try:
-            packet_bytes, _ = self.socket.recvfrom(1024)
-            return RDTPacket.deserialize(packet_bytes)
+            nbytes, _ = self.socket.recvfrom_into(buf)
+            return RDTPacket.deserialize(memoryview(buf)[:nbytes])
         except Exception:
             ...
             # RDT 2.0 assume que pacotes podem ser corrompidos, mas não perdidos, portanto
             # não implementa validação de timeout
+        finally:
+            # Devolver o buffer ao pool (deserialize já copiou os dados)
+            self._rx_pool.release(buf)
     
     def get_statistics(self):
         """Retorna estatísticas do remetente"""
@@ -131,23 +157,28 @@ class RDT20Sender:
 class RDT20Receiver:
     """Receptor do protocolo rdt2.0"""
     
-    def __init__(self, port, channel = None):
+    def __init__(self, port, channel = None, rcvbuf = 12582912, sndbuf = 12582912):
         """
         Inicializa o receptor
-        
+
         Args:
             port: Porta local para bind
             channel: UnreliableChannel para simular erros (opcional)
+            rcvbuf: Tamanho solicitado do buffer de recepção (SO_RCVBUF)
+            sndbuf: Tamanho solicitado do buffer de envio (SO_SNDBUF)
         """
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
         self.socket.bind(('localhost', port))
         self.port = port
         self.channel = channel
-        
+
         self.logger = ProtocolLogger(f'RDT2.0-Receiver-{port}')
-        
-        # Buffer de mensagens recebidas
-        self.received_messages = []
+        _log_socket_buffers(self.socket, self.logger)
+
+        # Buffer de mensagens recebidas (deque: thread-safe e append O(1))
+        self.received_messages = collections.deque()
         
         # Estatísticas
         self.packets_received = 0
@@ -158,76 +189,94 @@ class RDT20Receiver:
         # Thread de recepção
         self.running = False
         self.receive_thread = None
-    
+
+        # Receptor em lote (recvmmsg no Linux, recvfrom nas demais plataformas)
+        self._batch = batch_receiver(self.socket)
+
+        # Instância única de pacote reutilizada no loop de recepção
+        self._rx_packet = RDTPacket.__new__(RDTPacket)
+
+        # Pacotes de controle pré-serializados: o rdt2.0 só usa um ACK e um NAK,
+        # então não há motivo para reconstruí-los (e recalcular o checksum)
+        # a cada datagrama recebido
+        self._ack_packet = RDTPacket(PacketType.ACK, seq_num = 0)
+        self._ack_bytes = self._ack_packet.serialize()
+        self._nak_packet = RDTPacket(PacketType.NAK, seq_num = 0)
+        self._nak_bytes = self._nak_packet.serialize()
+
+        # Envio pré-vinculado: elimina o branch if self.channel do caminho quente
+        if channel:
+            self._send_bytes = (lambda data, addr:
+                                channel.send(data, self.socket, addr))
+        else:
+            self._send_bytes = self.socket.sendto
+
     def start(self):
         """Inicia o receptor em uma thread"""
         self.running = True
         self.receive_thread = threading.Thread(target = self._receive_loop)
         self.receive_thread.daemon = True
         self.receive_thread.start()
-        self.logger.info(f"Receptor iniciado na porta {self.port}")
+        self.logger.info("Receptor iniciado na porta %d", self.port)
     
     def _receive_loop(self):
         """Loop principal de recepção"""
         while self.running:
             try:
-                packet_bytes, sender_addr = self.socket.recvfrom(2048)
-                self.packets_received += 1
-                
-                packet = RDTPacket.deserialize(packet_bytes)
-                
-                if packet is None:
-                    self.logger.error("Pacote inválido recebido")
-                    continue
-                
-                self.logger.receive(f"{packet}")
-                
-                # Verificar corrupção
-                if packet.is_corrupt():
-                    self.logger.corrupt(f"{packet} - Enviando NAK")
-                    self.corrupted_packets += 1
-                    self._send_nak(sender_addr)
-                else:
+                # Receber datagramas em lote (uma chamada de sistema para vários)
+                for packet_bytes, sender_addr in self._batch.recv():
+                    self.packets_received += 1
+
+                    # Validar antes de interpretar: checksum conferido direto
+                    # no buffer bruto, sem construir pacote para corrompidos
+                    if not RDTPacket.verify_buffer(packet_bytes):
+                        self.logger.corrupt("Pacote corrompido (%d bytes) - Enviando NAK",
+                                            len(packet_bytes))
+                        self.corrupted_packets += 1
+                        self._send_nak(sender_addr)
+                        continue
+
+                    # Reutilizar a mesma instância de pacote (zero alocações)
+                    packet = self._rx_packet
+                    if not packet.deserialize_into(packet_bytes):
+                        self.logger.error("Pacote inválido recebido")
+                        continue
+
+                    self.logger.receive("%s", packet)
+
                     # Pacote íntegro - entregar dados e enviar ACK
-                    self.logger.deliver(f"Dados: {packet.data[:30]}")
+                    self.logger.deliver("Dados: %r", packet.data[:30])
                     self.received_messages.append(packet.data)
                     self._send_ack(sender_addr)
-                    
+
+
             except Exception as e:
                 if self.running:
-                    self.logger.error(f"Erro no loop de recepção: {e}")
+                    self.logger.error("Erro no loop de recepção: %s", e)
     
     def _send_ack(self, dest_addr):
-        """Envia ACK ao remetente"""
-        ack_packet = RDTPacket(PacketType.ACK, seq_num = 0)
-        self.logger.send(f"{ack_packet}")
-        
-        packet_bytes = ack_packet.serialize()
-        
-        if self.channel:
-            self.channel.send(packet_bytes, self.socket, dest_addr)
-        else:
-            self.socket.sendto(packet_bytes, dest_addr)
-        
+        """Envia o ACK pré-serializado ao remetente"""
+        self.logger.send("%s", self._ack_packet)
+        self._send_bytes(self._ack_bytes, dest_addr)
         self.acks_sent += 1
-    
+
     def _send_nak(self, dest_addr):
-        """Envia NAK ao remetente"""
-        nak_packet = RDTPacket(PacketType.NAK, seq_num = 0)
-        self.logger.send(f"{nak_packet}")
-        
-        packet_bytes = nak_packet.serialize()
-        
-        if self.channel:
-            self.channel.send(packet_bytes, self.socket, dest_addr)
-        else:
-            self.socket.sendto(packet_bytes, dest_addr)
-        
+        """Envia o NAK pré-serializado ao remetente"""
+        self.logger.send("%s", self._nak_packet)
+        self._send_bytes(self._nak_bytes, dest_addr)
         self.naks_sent += 1
     
+    def reset(self):
+        """Zera mensagens e estatísticas sem parar a thread de recepção"""
+        self.received_messages.clear()
+        self.packets_received = 0
+        self.corrupted_packets = 0
+        self.acks_sent = 0
+        self.naks_sent = 0
+    
     def get_messages(self):
         """Retorna lista de mensagens recebidas"""
-        return self.received_messages
+        return list(self.received_messages)
     
     def get_statistics(self):
         """Retorna estatísticas do receptor"""
@@ -270,13 +319,13 @@ if __name__ == "__main__":
     messages = [f"Mensagem {i}" for i in range(10)]
     
     print(f"\nEnviando {len(messages)} mensagens...\n")
-    
+
+    # send() já bloqueia até o ACK (Stop-and-Wait); nenhum sleep necessário
     for msg in messages:
         sender.send(msg, ('localhost', 5001))
-        time.sleep(0.2)
-    
+
     # Aguardar processamento
-    time.sleep(2)
+    time.sleep(0.5)
     
     # Exibir resultados
     print("\n" + "=" * 60)
@@ -5,6 +5,10 @@ Características:
 - Detecta e descarta pacotes duplicados
 - Remetente retransmite se ACK corrompido ou incorreto
 """
+import collections
+import multiprocessing
+import queue
+import selectors
 import socket
 import threading
 import time
@@ -15,21 +19,35 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.packet import RDTPacket, PacketType
 from utils.simulator import UnreliableChannel
 from utils.logger import ProtocolLogger
+from utils.mmsg import batch_receiver
+from utils.bufpool import BufferPool
+
+
+def _log_socket_buffers(sock, logger):
+    """Registra os tamanhos efetivos dos buffers do socket (o kernel os dobra)"""
+    rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    sndbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+    logger.debug("Buffers do socket: SO_RCVBUF=%d, SO_SNDBUF=%d", rcvbuf, sndbuf)
 
 
 class RDT21Sender:
     """Remetente do protocolo rdt2.1 com números de sequência"""
-    
-    def __init__(self, port, channel = None):
+
+    def __init__(self, port, channel = None, seq_modulus = 2,
+                 rcvbuf = 12582912, sndbuf = 12582912):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
         self.socket.bind(('localhost', port))
         self.port = port
         self.channel = channel
-        
+        self.seq_modulus = seq_modulus
+
         self.logger = ProtocolLogger(f'RDT2.1-Sender-{port}')
-        
+        _log_socket_buffers(self.socket, self.logger)
+
         # Estado e número de sequência
-        self.seq_num = 0  # Alterna entre 0 e 1
+        self.seq_num = 0  # Alterna no espaço [0, seq_modulus)
         self.peer_address = None
         
         # Estatísticas
@@ -38,7 +56,22 @@ class RDT21Sender:
         self.acks_received = 0
         self.duplicated_acks = 0
         self.naks_received = 0
-    
+
+        # Buffers reutilizáveis de recepção
+        self._rx_pool = BufferPool(buffer_size = 1024)
+
+        # Seletor para aguardar respostas com timeout opcional
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(self.socket, selectors.EVENT_READ)
+
+        # Envio pré-vinculado: elimina o branch if self.channel do caminho quente
+        if channel:
+            self._send_buffers = (lambda buffers, addr:
+                                  channel.send(buffers, self.socket, addr))
+        else:
+            self._send_buffers = (lambda buffers, addr:
+                                  self.socket.sendmsg(buffers, [], 0, addr))
+
 
 
     def send(self, data, dest_address):
@@ -56,7 +89,7 @@ class RDT21Sender:
 
         # Criar pacote com número de sequência atual
         packet = RDTPacket(PacketType.DATA, seq_num = self.seq_num, data = data)
-        self.logger.send(f"{packet} - Dados: {data[:20]}")
+        self.logger.send("%s - Dados: %r", packet, data[:20])
 
         # Loop Stop-and-Wait com Números de Sequência (SeqNum)
         while True:
@@ -67,7 +100,7 @@ class RDT21Sender:
             response = self._wait_for_response()
 
             if response.is_corrupt():
-                self.logger.corrupt(f"{response} - Retransmitindo")
+                self.logger.corrupt("%s - Retransmitindo", response)
                 self.retransmissions += 1
                 continue
 
@@ -75,13 +108,13 @@ class RDT21Sender:
             if response.type == PacketType.ACK:
                 if response.seq_num == self.seq_num:
                     # ACK correto recebido - sucesso!
-                    self.logger.receive(f"{response} - Pacote confirmado")
+                    self.logger.receive("%s - Pacote confirmado", response)
                     self.acks_received += 1
-                    self.seq_num = 1 - self.seq_num
+                    self.seq_num = (self.seq_num + 1) % self.seq_modulus
                     break
                 else:
                     # ACK duplicado (número de sequência incorreto)
-                    self.logger.receive(f"{response} - ACK duplicado, retransmitindo")
+                    self.logger.receive("%s - ACK duplicado, retransmitindo", response)
                     self.duplicated_acks += 1
                     self.retransmissions += 1
                     continue
@@ -89,32 +122,129 @@ class RDT21Sender:
             elif response.type == PacketType.NAK:
                 self.naks_received += 1
                 if response.seq_num == self.seq_num:
-                    self.logger.receive(f"{response} - Retransmissão solicitada (NAK Seq{response.seq_num})")
+                    self.logger.receive("%s - Retransmissão solicitada (NAK Seq%d)", response, response.seq_num)
                     self.retransmissions += 1
                     continue
                 else:
-                    self.logger.receive(f"{response} - NAK duplicado, ignorando")
+                    self.logger.receive("%s - NAK duplicado, ignorando", response)
                     continue
 
-    
+    def send_many(self, data_list, dest_address, window_size = 4):
+        """
+        Envia várias mensagens em pipeline usando janela deslizante (Go-Back-N)
+
+        Mantém até window_size pacotes em trânsito sobre o espaço de
+        sequência [0, seq_modulus). Exige window_size < seq_modulus para
+        que os ACKs sejam inequívocos. Como todo Go-Back-N, assume que o
+        canal não reordena pacotes (delays aleatórios do UnreliableChannel
+        podem violar isso).
+
+        Args:
+            data_list: Lista de bytes ou strings a enviar
+            dest_address: Tupla (host, port) do destinatário
+            window_size: Número máximo de pacotes em trânsito
+        """
+        if window_size >= self.seq_modulus:
+            raise ValueError("window_size deve ser menor que seq_modulus")
+
+        self.peer_address = dest_address
+
+        # Pré-criar todos os pacotes com números de sequência consecutivos
+        packets = []
+        for i, data in enumerate(data_list):
+            if isinstance(data, str):
+                data = data.encode()
+            seq = (self.seq_num + i) % self.seq_modulus
+            packets.append(RDTPacket(PacketType.DATA, seq_num = seq, data = data))
+
+        base = 0
+        next_seq = 0
+        total = len(packets)
+
+        while base < total:
+            # Preencher a janela
+            while next_seq < total and next_seq - base < window_size:
+                self.logger.send("%s - Em pipeline", packets[next_seq])
+                self._send_packet(packets[next_seq])
+                self.packets_sent += 1
+                next_seq += 1
+
+            # Aguardar pelo menos uma resposta e drenar as demais disponíveis
+            response = self._wait_for_response()
+            while response is not None and base < total:
+                base = self._process_pipeline_response(response, packets, base, next_seq)
+
+                # Drenar ACKs adicionais já disponíveis sem bloquear
+                response = self._wait_for_response(timeout = 0)
+
+        self.seq_num = (self.seq_num + total) % self.seq_modulus
+
+    def _process_pipeline_response(self, response, packets, base, next_seq):
+        """
+        Processa uma resposta (ACK/NAK) do modo pipeline e retorna a nova base
+
+        ACK válido desliza a base cumulativamente; NAK ou resposta corrompida
+        dispara retransmissão Go-Back-N de toda a janela pendente.
+        """
+        if response.is_corrupt():
+            self.logger.corrupt("%s - Retransmitindo janela", response)
+            self._retransmit_window(packets, base, next_seq)
+            return base
+
+        if response.type == PacketType.ACK:
+            # Distância do ACK em relação à base, no espaço de sequência
+            offset = (response.seq_num - packets[base].seq_num) % self.seq_modulus
+            if offset < next_seq - base:
+                # ACK cumulativo - desliza a base
+                self.logger.receive("%s - Janela desliza %d pacote(s)", response, offset + 1)
+                self.acks_received += offset + 1
+                return base + offset + 1
+            else:
+                self.logger.receive("%s - ACK duplicado, retransmitindo janela", response)
+                self.duplicated_acks += 1
+                self._retransmit_window(packets, base, next_seq)
+                return base
+
+        elif response.type == PacketType.NAK:
+            self.naks_received += 1
+            self.logger.receive("%s - NAK recebido, retransmitindo janela", response)
+            self._retransmit_window(packets, base, next_seq)
+
+        return base
+
+    def _retransmit_window(self, packets, base, next_seq):
+        """Retransmite todos os pacotes pendentes da janela (Go-Back-N)"""
+        for i in range(base, next_seq):
+            self._send_packet(packets[i])
+            self.retransmissions += 1
+
     def _send_packet(self, packet):
-        """Envia pacote através do canal"""
-        packet_bytes = packet.serialize()
-        
-        if self.channel:
-            self.channel.send(packet_bytes, self.socket, self.peer_address)
-        else:
-            self.socket.sendto(packet_bytes, self.peer_address)
-    
-    def _wait_for_response(self):
-        """Aguarda ACK do receptor"""
+        """Envia pacote através do canal (função de envio pré-vinculada)"""
+        self._send_buffers((packet.serialize_header(), packet.data),
+                           self.peer_address)
+
+    def _wait_for_response(self, timeout = None):
+        """
+        Aguarda ACK do receptor
+
+        Args:
+            timeout: Tempo máximo de espera em segundos; None bloqueia
+                indefinidamente (RDT 2.1 assume que pacotes podem ser
+                corrompidos, mas não perdidos) e 0 apenas verifica
+
+        Returns:
+            RDTPacket ou None se nada chegou dentro do timeout
+        """
+        if not self._sel.select(timeout):
+            return None
+
+        buf = self._rx_pool.acquire()
         try:
-            packet_bytes, _ = self.socket.recvfrom(1024)
-            return RDTPacket.deserialize(packet_bytes)
-        except Exception:
-            ...
-            # RDT 2.1 também assume que pacotes podem ser corrompidos, mas não perdidos.
-            # Logo, não há implementaçaõ de timeout aqui.
+            nbytes, _ = self.socket.recvfrom_into(buf)
+            return RDTPacket.deserialize(memoryview(buf)[:nbytes])
+        finally:
+            # Devolver o buffer ao pool (deserialize já copiou os dados)
+            self._rx_pool.release(buf)
     
     def get_statistics(self):
         """Retorna estatísticas do remetente"""
@@ -127,126 +257,200 @@ class RDT21Sender:
         }
     
     def close(self):
-        """Fecha o socket"""
+        """Fecha o seletor e o socket"""
+        self._sel.close()
         self.socket.close()
 
 
 class RDT21Receiver:
     """Receptor do protocolo rdt2.1 com números de sequência"""
     
-    def __init__(self, port, channel = None):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(('localhost', port))
+    def __init__(self, port, channel = None, seq_modulus = 2,
+                 rcvbuf = 12582912, sndbuf = 12582912, use_process = False):
         self.port = port
         self.channel = channel
-        
+        self.seq_modulus = seq_modulus
+        self.use_process = use_process
+
         self.logger = ProtocolLogger(f'RDT2.1-Receiver-{port}')
-        
+
         # Estado - número de sequência esperado
         self.expected_seq_num = 0
-        self.last_ack_sent = 1  # ACK do pacote anterior
-        
-        # Buffer de mensagens recebidas
-        self.received_messages = []
-        
+        self.last_ack_sent = seq_modulus - 1  # ACK do pacote anterior
+
+        # Buffer de mensagens recebidas (deque: thread-safe e append O(1))
+        self.received_messages = collections.deque()
+
         # Estatísticas
         self.packets_received = 0
         self.corrupted_packets = 0
         self.duplicated_packets = 0
         self.acks_sent = 0
         self.naks_sent = 0
-        
+
         # Thread de recepção
         self.running = False
         self.receive_thread = None
-    
+
+        if use_process:
+            # O socket e os caches são criados no processo filho (_receive_main),
+            # fora do GIL deste processo; aqui ficam só os canais de comunicação
+            self.socket = None
+            self._batch = None
+            self._ctrl = None
+            self._process = None
+            self._manager = None
+            self._msg_queue = None
+            self._stats = None
+            return
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+        self.socket.bind(('localhost', port))
+        _log_socket_buffers(self.socket, self.logger)
+
+        # Receptor em lote (recvmmsg no Linux, recvfrom nas demais plataformas)
+        self._batch = batch_receiver(self.socket)
+
+        # Instância única de pacote reutilizada no loop de recepção
+        self._rx_packet = RDTPacket.__new__(RDTPacket)
+
+        # Pacotes de controle pré-serializados: só existem 2 * seq_modulus
+        # possíveis (ACK/NAK por número de sequência), então o caminho quente
+        # pula a construção do pacote e o cálculo do checksum
+        self._ctrl = {}
+        for seq in range(seq_modulus):
+            for ptype in (PacketType.ACK, PacketType.NAK):
+                pkt = RDTPacket(ptype, seq_num = seq)
+                self._ctrl[(ptype, seq)] = (pkt, pkt.serialize())
+
+        # Envio pré-vinculado: elimina o branch if self.channel do caminho quente
+        if channel:
+            self._send_bytes = (lambda data, addr:
+                                channel.send(data, self.socket, addr))
+        else:
+            self._send_bytes = self.socket.sendto
+
     def start(self):
-        """Inicia o receptor em uma thread"""
+        """Inicia o receptor em uma thread (ou processo, se use_process=True)"""
+        if self.use_process:
+            channel_cfg = None
+            if self.channel:
+                channel_cfg = (self.channel.loss_rate, self.channel.corrupt_rate,
+                               self.channel.delay_range)
+            self._manager = multiprocessing.Manager()
+            self._stats = self._manager.dict()
+            self._msg_queue = multiprocessing.Queue()
+            self._process = multiprocessing.Process(
+                target = _receive_main,
+                args = (self.port, channel_cfg, self.seq_modulus,
+                        self._msg_queue, self._stats),
+                daemon = True
+            )
+            self._process.start()
+            self.logger.info("Receptor iniciado em processo separado (pid %d)", self._process.pid)
+            return
+
         self.running = True
         self.receive_thread = threading.Thread(target = self._receive_loop)
         self.receive_thread.daemon = True
         self.receive_thread.start()
-        self.logger.info(f"Receptor iniciado na porta {self.port}")
+        self.logger.info("Receptor iniciado na porta %d", self.port)
 
     def _receive_loop(self):
         """Loop principal de recepção"""
         while self.running:
             try:
-                packet_bytes, sender_addr = self.socket.recvfrom(2048)
-                self.packets_received += 1
-
-                packet = RDTPacket.deserialize(packet_bytes)
+                # Receber datagramas em lote (uma chamada de sistema para vários)
+                for packet_bytes, sender_addr in self._batch.recv():
+                    self.packets_received += 1
 
-                if packet is None:
-                    self.logger.error("Pacote inválido recebido")
-                    continue
+                    # Validar antes de interpretar: checksum conferido direto no
+                    # buffer bruto - NAK com último número de sequência válido,
+                    # sem construir pacote para corrompidos
+                    if not RDTPacket.verify_buffer(packet_bytes):
+                        self.logger.corrupt("Pacote corrompido (%d bytes), enviando NAK%d",
+                                            len(packet_bytes), self.last_ack_sent)
+                        self.corrupted_packets += 1
+                        self._send_nak(sender_addr, self.last_ack_sent)
+                        continue
 
-                self.logger.receive(f"{packet}")
+                    # Reutilizar a mesma instância de pacote (zero alocações)
+                    packet = self._rx_packet
+                    if not packet.deserialize_into(packet_bytes):
+                        self.logger.error("Pacote inválido recebido")
+                        continue
 
-                # Verificar corrupção - enviar NAK com último número de sequência válido
-                if packet.is_corrupt():
-                    self.logger.corrupt(f"{packet} - Pacote corrompido, enviando NAK{self.last_ack_sent}")
-                    self.corrupted_packets += 1
-                    self._send_nak(sender_addr, self.last_ack_sent)
-                    continue
+                    self.logger.receive("%s", packet)
 
-                # Verificar número de sequência
-                if packet.seq_num == self.expected_seq_num:
-                    # Pacote esperado - entregar dados
-                    self.logger.deliver(f"Seq{packet.seq_num} - Dados: {packet.data[:30]}")
-                    self.received_messages.append(packet.data)
+                    # Verificar número de sequência
+                    if packet.seq_num == self.expected_seq_num:
+                        # Pacote esperado - entregar dados
+                        self.logger.deliver("Seq%d - Dados: %r", packet.seq_num, packet.data[:30])
+                        self.received_messages.append(packet.data)
 
-                    # Enviar ACK e alternar número esperado
-                    self._send_ack(sender_addr, self.expected_seq_num)
-                    self.last_ack_sent = self.expected_seq_num
-                    self.expected_seq_num = 1 - self.expected_seq_num
-                else:
-                    # Pacote duplicado - reenviar ACK do último pacote válido
-                    self.logger.warning(
-                        f"{packet} - Duplicado! Esperava Seq. Num.: {self.expected_seq_num}, "
-                        f"reenviando ACK{self.last_ack_sent}"
-                    )
-                    self.duplicated_packets += 1
-                    self._send_ack(sender_addr, self.last_ack_sent)
+                        # Enviar ACK e alternar número esperado
+                        self._send_ack(sender_addr, self.expected_seq_num)
+                        self.last_ack_sent = self.expected_seq_num
+                        self.expected_seq_num = (self.expected_seq_num + 1) % self.seq_modulus
+                    else:
+                        # Pacote duplicado - reenviar ACK do último pacote válido
+                        self.logger.warning(
+                            "%s - Duplicado! Esperava Seq. Num.: %d, reenviando ACK%d",
+                            packet, self.expected_seq_num, self.last_ack_sent
+                        )
+                        self.duplicated_packets += 1
+                        self._send_ack(sender_addr, self.last_ack_sent)
 
             except Exception as e:
                 if self.running:
-                    self.logger.error(f"Erro no loop de recepção: {e}")
+                    self.logger.error("Erro no loop de recepção: %s", e)
     
     def _send_ack(self, dest_addr, seq_num):
-        """Envia ACK ao Remetente (Sender) com número de sequência"""
-        ack_packet = RDTPacket(PacketType.ACK, seq_num = seq_num)
-        self.logger.send(f"{ack_packet}")
-        
-        packet_bytes = ack_packet.serialize()
-        
-        if self.channel:
-            self.channel.send(packet_bytes, self.socket, dest_addr)
-        else:
-            self.socket.sendto(packet_bytes, dest_addr)
-        
+        """Envia ACK pré-serializado ao Remetente (Sender) com número de sequência"""
+        ack_packet, packet_bytes = self._ctrl[(PacketType.ACK, seq_num)]
+        self.logger.send("%s", ack_packet)
+        self._send_bytes(packet_bytes, dest_addr)
         self.acks_sent += 1
 
     def _send_nak(self, dest_addr, seq_num):
-        """Envia NAK ao Remetente (Sender) com número de sequência"""
-        nak_packet = RDTPacket(PacketType.NAK, seq_num = seq_num)
-        self.logger.send(f"{nak_packet}")
-
-        packet_bytes = nak_packet.serialize()
-
-        if self.channel:
-            self.channel.send(packet_bytes, self.socket, dest_addr)
-        else:
-            self.socket.sendto(packet_bytes, dest_addr)
-
+        """Envia NAK pré-serializado ao Remetente (Sender) com número de sequência"""
+        nak_packet, packet_bytes = self._ctrl[(PacketType.NAK, seq_num)]
+        self.logger.send("%s", nak_packet)
+        self._send_bytes(packet_bytes, dest_addr)
         self.naks_sent += 1
     
+    def reset(self):
+        """
+        Zera mensagens, estatísticas e o estado de sequência sem parar a
+        thread de recepção (reuso do receptor entre cenários de teste;
+        disponível apenas no modo em thread)
+        """
+        self.received_messages.clear()
+        self.expected_seq_num = 0
+        self.last_ack_sent = self.seq_modulus - 1
+        self.packets_received = 0
+        self.corrupted_packets = 0
+        self.duplicated_packets = 0
+        self.acks_sent = 0
+        self.naks_sent = 0
+    
     def get_messages(self):
         """Retorna lista de mensagens recebidas (sem duplicatas)"""
-        return self.received_messages
-    
+        if self.use_process and self._msg_queue is not None:
+            # Drenar as mensagens entregues pelo processo filho
+            while True:
+                try:
+                    self.received_messages.append(self._msg_queue.get_nowait())
+                except queue.Empty:
+                    break
+        return list(self.received_messages)
+
     def get_statistics(self):
         """Retorna estatísticas do receptor"""
+        if self.use_process and self._stats:
+            return dict(self._stats)
         return {
             'packets_received': self.packets_received,
             'corrupted_packets': self.corrupted_packets,
@@ -255,15 +459,51 @@ class RDT21Receiver:
             'naks_sent': self.naks_sent,
             'messages_delivered': len(self.received_messages)
         }
-    
+
     def stop(self):
         """Para o receptor"""
+        if self.use_process:
+            self.get_messages()  # Drenar o que ainda estiver na fila
+            if self._process:
+                self._process.terminate()
+                self._process.join(timeout = 1.0)
+            if self._manager:
+                self._manager.shutdown()
+            return
+
         self.running = False
         if self.receive_thread:
             self.receive_thread.join(timeout=1.0)
         self.socket.close()
 
 
+def _receive_main(port, channel_cfg, seq_modulus, msg_queue, stats_dict):
+    """
+    Ponto de entrada do processo filho do receptor (use_process=True)
+
+    Reconstrói o canal a partir da configuração (UnreliableChannel não é
+    picklable por causa do socket) e roda um receptor normal, publicando
+    mensagens entregues na fila e estatísticas no dicionário compartilhado.
+    """
+    channel = UnreliableChannel(*channel_cfg) if channel_cfg else None
+    receiver = RDT21Receiver(port, channel, seq_modulus)
+    receiver.start()
+
+    delivered = 0
+    try:
+        while True:
+            messages = receiver.received_messages
+            while delivered < len(messages):
+                msg_queue.put(messages[delivered])
+                delivered += 1
+            stats_dict.update(receiver.get_statistics())
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.stop()
+
+
 # Exemplo de uso e teste
 if __name__ == "__main__":
     print("=" * 60)
@@ -271,26 +511,27 @@ if __name__ == "__main__":
     print("=" * 60)
     
     # Criar canal com corrupção de pacotes DATA e ACKs
-    channel = UnreliableChannel(loss_rate=0.0, corrupt_rate=0.2, 
-                                delay_range=(0.01, 0.1))
-    
-    # Criar receptor e remetente
-    receiver = RDT21Receiver(5011, channel)
+    # (sem atraso aleatório: o modo pipeline exige canal que não reordena)
+    channel = UnreliableChannel(loss_rate=0.0, corrupt_rate=0.2,
+                                delay_range=(0, 0))
+
+    # Criar receptor e remetente com espaço de sequência ampliado
+    receiver = RDT21Receiver(5011, channel, seq_modulus = 8)
     receiver.start()
-    
-    sender = RDT21Sender(5010, channel)
-    
+
+    sender = RDT21Sender(5010, channel, seq_modulus = 8)
+
     # Enviar mensagens
     messages = [f"Mensagem {i}" for i in range(15)]
-    
+
     print(f"\nEnviando {len(messages)} mensagens com 20% de corrupção...\n")
-    
-    for msg in messages:
-        sender.send(msg, ('localhost', 5011))
-        time.sleep(0.15)
-    
+
+    # Pipeline com janela deslizante: o backpressure vem da própria janela,
+    # sem sleeps artificiais entre mensagens
+    sender.send_many(messages, ('localhost', 5011), window_size = 4)
+
     # Aguardar processamento
-    time.sleep(2)
+    time.sleep(0.5)
     
     # Exibir resultados
     print("\n" + "=" * 60)
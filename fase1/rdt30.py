@@ -5,6 +5,8 @@ Características:
 - Retransmissão automática em caso de timeout
 - Protocolo completo: lida com corrupção, perda e duplicação
 """
+import io
+import selectors
 import socket
 import threading
 import time
@@ -17,27 +19,41 @@ from utils.simulator import UnreliableChannel
 from utils.logger import ProtocolLogger
 
 
+def _log_socket_buffers(sock, logger):
+    """Registra os tamanhos efetivos dos buffers do socket (o kernel os dobra)"""
+    rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    sndbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+    logger.debug("Buffers do socket: SO_RCVBUF=%d, SO_SNDBUF=%d", rcvbuf, sndbuf)
+
+
 class RDT30Sender:
     """Remetente do protocolo rdt3.0 com timer (utiliza estratégias de timeout)"""
     
-    def __init__(self, port, channel = None, timeout =2.0):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(('localhost', port))
+    def __init__(self, port, channel = None, timeout =2.0, sock = None,
+                 rcvbuf = 12582912, sndbuf = 12582912):
+        # Aceita um socket externo já criado/conectado (permite compartilhar
+        # um único socket bidirecional entre remetente e receptor)
+        if sock is not None:
+            self.socket = sock
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+            if hasattr(socket, 'SO_REUSEPORT'):
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self.socket.bind(('localhost', port))
         self.port = port
         self.channel = channel
         self.timeout_value = timeout
         
         self.logger = ProtocolLogger(f'RDT3.0-Sender-{port}')
+        _log_socket_buffers(self.socket, self.logger)
         
         # Estado e número de sequência
         self.seq_num = 0
         self.peer_address = None
-        
-        # Timer
-        self.timer = None
-        self.timer_running = False
-        self.lock = threading.Lock()
-        
+        self._connected_peer = None
+
         # Estatísticas
         self.packets_sent = 0
         self.retransmissions = 0
@@ -59,32 +75,36 @@ class RDT30Sender:
         
         self.peer_address = dest_address
         self.total_bytes_sent += len(data)
+
+        # Sem canal simulado, conectar o socket ao destino: o sockaddr é
+        # resolvido e empacotado uma única vez, em vez de a cada sendto
+        if self.channel is None and dest_address != self._connected_peer:
+            addrinfo = socket.getaddrinfo(dest_address[0], dest_address[1],
+                                          socket.AF_INET, socket.SOCK_DGRAM)[0]
+            self.socket.connect(addrinfo[4])
+            self._connected_peer = dest_address
         
-        # Criar pacote
+        # Criar pacote e serializar uma única vez (retransmissões reutilizam)
         packet = RDTPacket(PacketType.DATA, seq_num = self.seq_num, data = data)
+        packet_bytes = packet.serialize()
 
         if self.start_time is None:
             self.start_time = time.time()
         
-        # Loop com timer
+        # Loop com timeout
         ack_received = False
-        
+
         while not ack_received:
-            # Enviar pacote e iniciar timer
-            self.logger.send(f"{packet} - Dados: {data[:20]}")
-            self._send_packet(packet)
+            # Enviar pacote
+            self.logger.send("%s - Dados: %r", packet, data[:20])
+            self._send_packet(packet_bytes)
             self.packets_sent += 1
-            
-            self._start_timer(packet)
-            
-            # Aguardar ACK
+
+            # Aguardar ACK (o timeout do socket faz o papel do timer)
             response = self._wait_for_ack()
-            
-            # Parar timer
-            self._stop_timer()
-            
+
             if response == 'TIMEOUT':
-                self.logger.timeout(f"Seq{self.seq_num} - Retransmitindo")
+                self.logger.timeout("Seq%d - Retransmitindo", self.seq_num)
                 self.timeouts += 1
                 self.retransmissions += 1
                 continue
@@ -93,84 +113,59 @@ class RDT30Sender:
                 continue
             
             if response.is_corrupt():
-                self.logger.corrupt(f"{response} - Retransmitindo")
+                self.logger.corrupt("%s - Retransmitindo", response)
                 self.retransmissions += 1
                 continue
             
             if response.type == PacketType.ACK and response.seq_num == self.seq_num:
-                self.logger.receive(f"{response} - Pacote confirmado")
+                self.logger.receive("%s - Pacote confirmado", response)
                 self.acks_received += 1
                 ack_received = True
                 
                 # Alternar número de sequência
                 self.seq_num = 1 - self.seq_num
     
-    def _send_packet(self, packet):
-        """Envia pacote através do canal"""
-        packet_bytes = packet.serialize()
-        
+    def _send_packet(self, packet_bytes):
+        """Envia os bytes (já serializados) do pacote através do canal"""
         if self.channel:
             self.channel.send(packet_bytes, self.socket, self.peer_address)
         else:
-            self.socket.sendto(packet_bytes, self.peer_address)
-    
-    def _start_timer(self, packet):
-        """Inicia o timer"""
-        with self.lock:
-            if self.timer:
-                self.timer.cancel()
-            
-            self.timer_running = True
-            self.timer = threading.Timer(self.timeout_value, self._on_timeout)
-            self.timer.daemon = True
-            self.timer.start()
-    
-    def _stop_timer(self):
-        """Para o timer"""
-        with self.lock:
-            self.timer_running = False
-            if self.timer:
-                self.timer.cancel()
-                self.timer = None
-    
-    def _on_timeout(self):
-        """Callback quando o timer expira"""
-        with self.lock:
-            if self.timer_running:
-                # Força o socket a desbloquear
-                try:
-                    self.socket.sendto(b'', self.peer_address)
-                except:
-                    pass
+            # Socket conectado: nenhum endereço por chamada
+            self.socket.send(packet_bytes)
     
     def _wait_for_ack(self):
         """
-        Aguarda ACK (com possibilidade de timeout)
-        
+        Aguarda ACK até expirar o prazo de retransmissão
+
+        O timeout do próprio socket substitui o threading.Timer: nenhuma
+        thread extra, nenhum sendto-sentinela para desbloquear o recvfrom.
+        O prazo é absoluto (time.monotonic), então datagramas espúrios não
+        o reiniciam.
+
         Returns:
             RDTPacket, 'TIMEOUT', ou None
         """
-        self.socket.settimeout(self.timeout_value + 0.5)
-        
+        deadline = time.monotonic() + self.timeout_value
+
         try:
-            with self.lock:
-                if not self.timer_running:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
                     return 'TIMEOUT'
-            
-            packet_bytes, _ = self.socket.recvfrom(1024)
-            
-            # Verificar se ainda está aguardando
-            with self.lock:
-                if not self.timer_running:
+
+                self.socket.settimeout(remaining)
+                try:
+                    packet_bytes, _ = self.socket.recvfrom(1024)
+                except socket.timeout:
                     return 'TIMEOUT'
-            
-            return RDTPacket.deserialize(packet_bytes)
-            
-        except socket.timeout:
-            return 'TIMEOUT'
+
+                if len(packet_bytes) == 0:
+                    continue
+
+                return RDTPacket.deserialize(packet_bytes)
         finally:
             self.socket.settimeout(None)
-    
+
     def get_statistics(self):
         """Retorna estatísticas do remetente"""
         elapsed = time.time() - self.start_time if self.start_time else 0
@@ -189,20 +184,30 @@ class RDT30Sender:
     
     def close(self):
         """Fecha o socket"""
-        self._stop_timer()
         self.socket.close()
 
 
 class RDT30Receiver:
     """Receptor do protocolo rdt3.0"""
     
-    def __init__(self, port, channel = None):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(('localhost', port))
+    def __init__(self, port, channel = None, sock = None,
+                 rcvbuf = 12582912, sndbuf = 12582912):
+        if sock is not None:
+            self.socket = sock
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+            # SO_REUSEPORT permite distribuir fluxos do mesmo porto entre
+            # vários receptores (escalabilidade multi-core futura)
+            if hasattr(socket, 'SO_REUSEPORT'):
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self.socket.bind(('localhost', port))
         self.port = port
         self.channel = channel
         
         self.logger = ProtocolLogger(f'RDT3.0-Receiver-{port}')
+        _log_socket_buffers(self.socket, self.logger)
         
         # Estado
         self.expected_seq_num = 0
@@ -220,62 +225,95 @@ class RDT30Receiver:
         # Thread
         self.running = False
         self.receive_thread = None
-    
+
+        # Buffer de recepção reutilizado (recvfrom_into) e instância única
+        # de pacote preenchida a cada datagrama (zero alocações por recv)
+        self._rxbuf = bytearray(2048)
+        self._rx_packet = RDTPacket.__new__(RDTPacket)
+
     def start(self):
         """Inicia o receptor"""
         self.running = True
         self.receive_thread = threading.Thread(target = self._receive_loop)
         self.receive_thread.daemon = True
         self.receive_thread.start()
-        self.logger.info(f"Receptor iniciado na porta {self.port}")
+        self.logger.info("Receptor iniciado na porta %d", self.port)
     
     def _receive_loop(self):
-        """Loop principal de recepção"""
+        """
+        Loop principal de recepção
+
+        O socket fica não-bloqueante atrás de um seletor; quando há dados,
+        um laço interno drena todos os datagramas enfileirados antes de
+        voltar a esperar, amortizando o custo do select por rajada.
+        """
+        self.socket.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(self.socket, selectors.EVENT_READ)
+
         while self.running:
             try:
-                packet_bytes, sender_addr = self.socket.recvfrom(2048)
-                
-                if len(packet_bytes) == 0:
-                    continue
-                
-                self.packets_received += 1
-                packet = RDTPacket.deserialize(packet_bytes)
-                
-                if packet is None:
-                    continue
-                
-                self.logger.receive(f"{packet}")
-                
-                # Verificar corrupção
-                if packet.is_corrupt():
-                    self.logger.corrupt(f"{packet} - Reenviando ACK{self.last_ack_sent}")
-                    self.corrupted_packets += 1
-                    self._send_ack(sender_addr, self.last_ack_sent)
+                if not sel.select(timeout = 0.5):
                     continue
-                
-                # Verificar número de sequência
-                if packet.seq_num == self.expected_seq_num:
-                    # Pacote esperado
-                    self.logger.deliver(f"Seq{packet.seq_num} - Dados: {packet.data[:30]}")
-                    self.received_messages.append(packet.data)
-                    
-                    self._send_ack(sender_addr, self.expected_seq_num)
-                    self.last_ack_sent = self.expected_seq_num
-                    self.expected_seq_num = 1 - self.expected_seq_num
-                else:
-                    # Pacote duplicado
-                    self.logger.warning(f"{packet} - Duplicado! Reenviando ACK{self.last_ack_sent}")
-                    self.duplicated_packets += 1
-                    self._send_ack(sender_addr, self.last_ack_sent)
-                    
+
+                while True:
+                    try:
+                        nbytes, sender_addr = self.socket.recvfrom_into(self._rxbuf)
+                    except BlockingIOError:
+                        break
+
+                    if nbytes == 0:
+                        continue
+
+                    self._process_packet(memoryview(self._rxbuf)[:nbytes],
+                                         sender_addr)
+
             except Exception as e:
                 if self.running:
-                    self.logger.error(f"Erro: {e}")
+                    self.logger.error("Erro: %s", e)
+
+        sel.close()
+
+    def _process_packet(self, packet_bytes, sender_addr):
+        """Processa um datagrama recebido"""
+        self.packets_received += 1
+
+        # Validar antes de interpretar: checksum conferido direto no buffer
+        # bruto, sem construir pacote (nem copiar payload) para corrompidos
+        if not RDTPacket.verify_buffer(packet_bytes):
+            self.logger.corrupt("Pacote corrompido (%d bytes) - Reenviando ACK%d",
+                                len(packet_bytes), self.last_ack_sent)
+            self.corrupted_packets += 1
+            self._send_ack(sender_addr, self.last_ack_sent)
+            return
+
+        # Reutilizar a mesma instância de pacote (copia os dados do buffer)
+        packet = self._rx_packet
+        if not packet.deserialize_into(packet_bytes):
+            self.logger.error("Pacote inválido recebido")
+            return
+
+        self.logger.receive("%s", packet)
+
+        # Verificar número de sequência
+        if packet.seq_num == self.expected_seq_num:
+            # Pacote esperado
+            self.logger.deliver("Seq%d - Dados: %r", packet.seq_num, packet.data[:30])
+            self.received_messages.append(packet.data)
+
+            self._send_ack(sender_addr, self.expected_seq_num)
+            self.last_ack_sent = self.expected_seq_num
+            self.expected_seq_num = 1 - self.expected_seq_num
+        else:
+            # Pacote duplicado
+            self.logger.warning("%s - Duplicado! Reenviando ACK%d", packet, self.last_ack_sent)
+            self.duplicated_packets += 1
+            self._send_ack(sender_addr, self.last_ack_sent)
     
     def _send_ack(self, dest_addr, seq_num):
         """Envia ACK"""
         ack_packet = RDTPacket(PacketType.ACK, seq_num = seq_num)
-        self.logger.send(f"{ack_packet}")
+        self.logger.send("%s", ack_packet)
         
         packet_bytes = ack_packet.serialize()
         
@@ -286,6 +324,16 @@ class RDT30Receiver:
         
         self.acks_sent += 1
     
+    def reset(self):
+        """Zera mensagens, estatísticas e sequência sem parar a thread"""
+        self.received_messages.clear()
+        self.expected_seq_num = 0
+        self.last_ack_sent = 1
+        self.packets_received = 0
+        self.corrupted_packets = 0
+        self.duplicated_packets = 0
+        self.acks_sent = 0
+    
     def get_messages(self):
         """Retorna mensagens recebidas"""
         return self.received_messages
@@ -345,43 +393,47 @@ if __name__ == "__main__":
     # Aguardar processamento final
     time.sleep(1)
     
-    # Resultados
-    print("\n" + "=" * 70)
-    print("RESULTADOS")
-    print("=" * 70)
-    
-    print("\nRemetente:")
+    # Resultados: montar o relatório inteiro e escrever de uma vez
+    # (uma única chamada de escrita em vez de ~40 prints)
+    report = io.StringIO()
+    report.write("\n" + "=" * 70 + "\n")
+    report.write("RESULTADOS\n")
+    report.write("=" * 70 + "\n")
+
+    report.write("\nRemetente:\n")
     stats_sender = sender.get_statistics()
     for key, value in stats_sender.items():
         if 'rate' in key:
-            print(f"  {key}: {value:.2%}")
+            report.write(f"  {key}: {value:.2%}\n")
         elif 'time' in key:
-            print(f"  {key}: {value:.2f}s")
+            report.write(f"  {key}: {value:.2f}s\n")
         elif 'throughput' in key:
-            print(f"  {key}: {value:.2f} bytes/s")
+            report.write(f"  {key}: {value:.2f} bytes/s\n")
         else:
-            print(f"  {key}: {value}")
-    
-    print("\nReceptor:")
+            report.write(f"  {key}: {value}\n")
+
+    report.write("\nReceptor:\n")
     stats_receiver = receiver.get_statistics()
     for key, value in stats_receiver.items():
-        print(f"  {key}: {value}")
-    
+        report.write(f"  {key}: {value}\n")
+
     received = receiver.get_messages()
-    
-    print(f"\n✓ Mensagens recebidas: {len(received)}/{len(messages)}")
-    
+
+    report.write(f"\n✓ Mensagens recebidas: {len(received)}/{len(messages)}\n")
+
     if len(received) == len(messages):
         all_correct = all(
             received[i].decode() == messages[i]
             for i in range(len(messages))
         )
         if all_correct:
-            print("✓ SUCESSO: Todas as mensagens entregues corretamente!")
+            report.write("✓ SUCESSO: Todas as mensagens entregues corretamente!\n")
         else:
-            print("✗ ERRO: Mensagens com conteúdo incorreto")
+            report.write("✗ ERRO: Mensagens com conteúdo incorreto\n")
     else:
-        print("✗ ERRO: Mensagens perdidas")
+        report.write("✗ ERRO: Mensagens perdidas\n")
+
+    sys.stdout.write(report.getvalue())
     
     # Estatísticas do canal
     channel.print_statistics()
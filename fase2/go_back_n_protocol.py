@@ -0,0 +1,555 @@
+"""
+Go-Back-N (GBN): Protocolo com janela deslizante e ACKs cumulativos
+Características:
+- Janela de envio de tamanho N, sem janela de recepção
+- ACKs cumulativos: ACK(n) confirma todos os pacotes até n
+- Um único timer para o pacote mais antigo não confirmado
+- Em timeout, retransmite TODA a janela pendente
+- Receptor descarta pacotes fora de ordem
+"""
+import collections
+import errno
+import io
+import selectors
+import socket
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.packet import RDTPacket, PacketType
+from utils.simulator import UnreliableChannel
+from utils.logger import ProtocolLogger
+from utils.mmsg import batch_send, batch_receiver
+from utils.scheduler import call_later
+
+# Lock mais rápido quando disponível: FastRLock (Cython) evita o custo de
+# aquisição em nível Python do threading.Lock no caso sem contenção, que é
+# o comum aqui (thread de envio + thread de ACKs raramente colidem)
+try:
+    from fastrlock.rlock import FastRLock as _Lock
+except ImportError:
+    _Lock = threading.Lock
+
+
+def _log_socket_buffers(sock, logger):
+    """Registra os tamanhos efetivos dos buffers do socket (o kernel os dobra)"""
+    rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    sndbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+    logger.debug("Buffers do socket: SO_RCVBUF=%d, SO_SNDBUF=%d", rcvbuf, sndbuf)
+
+
+class GBNSender:
+    """Remetente Go-Back-N com janela deslizante e timer único"""
+
+    def __init__(self, port, window_size = 5, channel = None, timeout = 1.0,
+                 sock = None, rcvbuf = 12582912, sndbuf = 12582912):
+        # Aceita um socket externo já criado/conectado (permite compartilhar
+        # um único socket bidirecional entre remetente e receptor)
+        if sock is not None:
+            self.socket = sock
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+            if hasattr(socket, 'SO_REUSEPORT'):
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self.socket.bind(('localhost', port))
+        self.port = port
+        self.window_size = window_size
+        self.channel = channel
+        self.timeout_value = timeout
+
+        self.logger = ProtocolLogger(f'GBN-Sender-{port}')
+        _log_socket_buffers(self.socket, self.logger)
+
+        # Variáveis de controle
+        self.base = 0
+        self.next_seq_num = 0
+
+        # Buffer de pacotes não confirmados: deque de (seq_num, packet_bytes,
+        # send_time) ordenado por seq_num; um ACK cumulativo só remove do
+        # início (popleft). Guardar os bytes já serializados evita refazer
+        # checksum e serialização a cada retransmissão
+        self.send_buffer = collections.deque()
+        self.lock = _Lock()
+
+        # Condição para bloquear send() com janela cheia sem busy-wait;
+        # _handle_ack notifica quando a base avança
+        self.window_cv = threading.Condition(self.lock)
+
+        # Timer único (cobre o pacote mais antigo não confirmado), servido
+        # pelo agendador compartilhado - nenhuma thread por temporizador
+        self.timer = None
+
+        # Thread para receber ACKs
+        self.running = False
+        self.ack_thread = None
+        self.peer_address = None
+
+        # Par de sockets de despertar: stop() escreve um byte para acordar
+        # o select bloqueado, sem timeout periódico de verificação
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+
+        # Estatísticas
+        self.packets_sent = 0
+        self.retransmissions = 0
+        self.timeouts = 0
+        self.acks_received = 0
+        self.start_time = None
+        self.total_bytes_sent = 0
+
+    def start(self, dest_address):
+        """Inicia o remetente GBN"""
+        self.peer_address = dest_address
+        self.running = True
+        self.start_time = time.time()
+
+        # Sem canal simulado, conectar o socket ao destino: o sockaddr é
+        # resolvido e empacotado uma única vez no kernel, em vez de a cada
+        # sendto/sendmsg
+        if self.channel is None:
+            addrinfo = socket.getaddrinfo(dest_address[0], dest_address[1],
+                                          socket.AF_INET, socket.SOCK_DGRAM)[0]
+            self.socket.connect(addrinfo[4])
+
+        self.ack_thread = threading.Thread(target = self._ack_receive_loop)
+        self.ack_thread.daemon = True
+        self.ack_thread.start()
+
+        self.logger.info("Remetente GBN iniciado (janela=%d)", self.window_size)
+
+    def send(self, data):
+        """Envia dados usando protocolo GBN"""
+        if isinstance(data, str):
+            data = data.encode()
+
+        self.total_bytes_sent += len(data)
+
+        # Criar e serializar o pacote uma única vez
+        packet = RDTPacket(PacketType.DATA, seq_num = self.next_seq_num, data = data)
+        packet_bytes = packet.serialize()
+
+        with self.window_cv:
+            # Aguardar se a janela estiver cheia (acorda no avanço da base)
+            self.window_cv.wait_for(
+                lambda: self.next_seq_num < self.base + self.window_size)
+
+            # Adicionar ao buffer de retransmissão
+            self.send_buffer.append((self.next_seq_num, packet_bytes, time.time()))
+
+            # Enviar pacote
+            self._send_packet(packet_bytes)
+            self.packets_sent += 1
+
+            # Timer único: inicia apenas quando a janela estava vazia
+            if self.base == self.next_seq_num:
+                self._start_timer()
+
+            self.logger.send("%s - Dados: %r", packet, data[:20])
+            self.next_seq_num += 1
+
+    def _send_packet(self, packet_bytes):
+        """Envia os bytes (já serializados) do pacote através do canal"""
+        if self.channel:
+            self.channel.send(packet_bytes, self.socket, self.peer_address)
+        else:
+            # Socket conectado: nenhum endereço por chamada
+            self.socket.send(packet_bytes)
+
+    def _start_timer(self):
+        """(Re)inicia o timer único da janela"""
+        if self.timer:
+            self.timer.cancel()
+
+        self.timer = call_later(self.timeout_value, self._on_timeout)
+
+    def _stop_timer(self):
+        """Para o timer da janela"""
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+    def _on_timeout(self):
+        """
+        Callback quando o timer da janela expira
+        Retransmite TODOS os pacotes pendentes (Go-Back-N)
+        """
+        with self.lock:
+            if not self.send_buffer:
+                return
+
+            self.logger.timeout("Base%d - Retransmitindo janela (%d pacotes)",
+                                self.base, len(self.send_buffer))
+            self.timeouts += 1
+
+            if self.channel:
+                for seq_num, pkt_bytes, _ in self.send_buffer:
+                    self._send_packet(pkt_bytes)
+            else:
+                # Janela inteira em uma única chamada de sistema (sendmmsg);
+                # destino None pois o socket está conectado
+                payloads = [pkt_bytes for _, pkt_bytes, _ in self.send_buffer]
+                batch_send(self.socket, payloads, None)
+            self.retransmissions += len(self.send_buffer)
+
+            self._start_timer()
+
+    def _ack_receive_loop(self):
+        """
+        Thread que recebe ACKs cumulativos
+
+        O socket fica não-bloqueante e um seletor espera por dados; quando
+        há ACKs disponíveis, recvmmsg drena vários de uma vez (uma chamada
+        de sistema por rajada, em vez de um recvfrom por ACK). O select é
+        totalmente bloqueante: stop() acorda a thread pelo socketpair, sem
+        despertares periódicos quando ociosa.
+        """
+        self.socket.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(self.socket, selectors.EVENT_READ)
+        sel.register(self._wakeup_r, selectors.EVENT_READ)
+        batch = batch_receiver(self.socket, batch_size = 2 * self.window_size,
+                               buffer_size = 1024)
+
+        while self.running:
+            try:
+                events = sel.select()
+
+                for key, _ in events:
+                    if key.fileobj is self._wakeup_r:
+                        # Byte de despertar de stop(): consumir e reavaliar
+                        self._wakeup_r.recv(64)
+
+                if not any(key.fileobj is self.socket for key, _ in events):
+                    continue
+
+                try:
+                    datagrams = batch.recv()
+                except OSError as e:
+                    if e.errno == errno.EAGAIN:
+                        continue
+                    raise
+
+                for packet_bytes, _ in datagrams:
+                    ack_packet = RDTPacket.deserialize(packet_bytes)
+
+                    if ack_packet is None or ack_packet.is_corrupt():
+                        continue
+
+                    if ack_packet.type == PacketType.ACK:
+                        self._handle_ack(ack_packet)
+
+            except Exception as e:
+                if self.running:
+                    self.logger.error("Erro recebendo ACK: %s", e)
+
+        sel.close()
+
+    def _handle_ack(self, ack_packet):
+        """
+        Processa ACK cumulativo: ACK(n) confirma todos os pacotes até n
+
+        Args:
+            ack_packet: Pacote ACK recebido
+        """
+        ack_num = ack_packet.seq_num
+
+        with self.lock:
+            # ACK antigo (duplicado) - ignorar
+            if ack_num < self.base:
+                return
+
+            self.logger.receive("%s - ACK cumulativo", ack_packet)
+            self.acks_received += 1
+
+            # Remover do buffer todos os pacotes confirmados: O(k) popleft
+            # em vez de reconstruir a lista inteira a cada ACK
+            while self.send_buffer and self.send_buffer[0][0] <= ack_num:
+                self.send_buffer.popleft()
+            self.base = ack_num + 1
+
+            # Acordar quem espera por espaço na janela ou pela conclusão
+            self.window_cv.notify_all()
+
+            # Reiniciar timer se ainda há pacotes pendentes
+            if self.send_buffer:
+                self._start_timer()
+            else:
+                self._stop_timer()
+
+            self.logger.info("Janela avançada para base=%d", self.base)
+
+    def wait_for_completion(self, timeout = 10.0):
+        """Aguarda todos os pacotes serem confirmados"""
+        with self.window_cv:
+            return self.window_cv.wait_for(
+                lambda: self.base >= self.next_seq_num, timeout = timeout)
+
+    def get_statistics(self):
+        """Retorna estatísticas"""
+        elapsed = time.time() - self.start_time if self.start_time else 0
+        throughput = (self.total_bytes_sent / elapsed) if elapsed > 0 else 0
+
+        return {
+            'packets_sent': self.packets_sent,
+            'retransmissions': self.retransmissions,
+            'timeouts': self.timeouts,
+            'acks_received': self.acks_received,
+            'window_size': self.window_size,
+            'retransmission_rate': self.retransmissions / self.packets_sent if self.packets_sent > 0 else 0,
+            'total_bytes': self.total_bytes_sent,
+            'elapsed_time': elapsed,
+            'throughput_bps': throughput,
+            'utilization': (self.packets_sent / (self.packets_sent + self.retransmissions)) if (self.packets_sent + self.retransmissions) > 0 else 0
+        }
+
+    def stop(self):
+        """Para o remetente"""
+        self.running = False
+
+        with self.lock:
+            self._stop_timer()
+
+        # Acordar a thread de ACKs bloqueada no select
+        try:
+            self._wakeup_w.send(b'\x00')
+        except OSError:
+            pass
+
+        if self.ack_thread:
+            self.ack_thread.join(timeout = 1.0)
+        self.socket.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+
+class GBNReceiver:
+    """Receptor Go-Back-N: só aceita pacotes em ordem"""
+
+    def __init__(self, port, channel = None, sock = None,
+                 rcvbuf = 12582912, sndbuf = 12582912):
+        if sock is not None:
+            self.socket = sock
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+            # SO_REUSEPORT permite distribuir fluxos do mesmo porto entre
+            # vários receptores (escalabilidade multi-core futura)
+            if hasattr(socket, 'SO_REUSEPORT'):
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self.socket.bind(('localhost', port))
+        self.port = port
+        self.channel = channel
+
+        self.logger = ProtocolLogger(f'GBN-Receiver-{port}')
+        _log_socket_buffers(self.socket, self.logger)
+
+        # Próximo número de sequência esperado
+        self.expected_seq_num = 0
+
+        # Mensagens entregues em ordem
+        self.delivered_messages = []
+
+        # Estatísticas
+        self.packets_received = 0
+        self.out_of_order_packets = 0
+        self.corrupted_packets = 0
+        self.acks_sent = 0
+
+        # Thread
+        self.running = False
+        self.receive_thread = None
+
+    def start(self):
+        """Inicia o receptor"""
+        self.running = True
+        self.receive_thread = threading.Thread(target = self._receive_loop)
+        self.receive_thread.daemon = True
+        self.receive_thread.start()
+        self.logger.info("Receptor GBN iniciado na porta %d", self.port)
+
+    def _receive_loop(self):
+        """
+        Loop principal de recepção
+
+        O socket fica não-bloqueante atrás de um seletor; quando há dados,
+        um laço interno drena toda a rajada de datagramas antes de voltar
+        a esperar, amortizando o custo do select por rajada.
+        """
+        self.socket.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(self.socket, selectors.EVENT_READ)
+
+        while self.running:
+            try:
+                if not sel.select(timeout = 0.5):
+                    continue
+
+                # Drenar a rajada inteira antes de processar
+                burst = []
+                while True:
+                    try:
+                        burst.append(self.socket.recvfrom(2048))
+                    except BlockingIOError:
+                        break
+
+                for packet_bytes, sender_addr in burst:
+                    self._process_packet(packet_bytes, sender_addr)
+
+                # ACK cumulativo coalescido: um único ACK(n) por rajada
+                # confirma tudo até n — tanto o caso em ordem quanto o
+                # ACK duplicado de pacotes descartados/corrompidos
+                if burst:
+                    self._resend_last_ack(burst[-1][1])
+
+            except Exception as e:
+                if self.running:
+                    self.logger.error("Erro: %s", e)
+
+        sel.close()
+
+    def _process_packet(self, packet_bytes, sender_addr):
+        """Processa um datagrama recebido"""
+        self.packets_received += 1
+
+        packet = RDTPacket.deserialize(packet_bytes)
+
+        if packet is None:
+            return
+
+        self.logger.receive("%s", packet)
+
+        if packet.is_corrupt():
+            self.logger.corrupt("%s", packet)
+            self.corrupted_packets += 1
+            return
+
+        if packet.seq_num == self.expected_seq_num:
+            # Pacote esperado - entregar (o ACK sai coalescido após a rajada)
+            self.logger.deliver("Seq%d - Dados: %r", packet.seq_num, packet.data[:30])
+            self.delivered_messages.append(packet.data)
+            self.expected_seq_num += 1
+        else:
+            # Fora de ordem - descartar (o ACK da rajada reconfirma o último)
+            self.logger.warning("Seq%d - Fora de ordem (esperado %d), descartando",
+                                packet.seq_num, self.expected_seq_num)
+            self.out_of_order_packets += 1
+
+    def _send_ack(self, dest_addr, seq_num):
+        """Envia ACK cumulativo"""
+        ack_packet = RDTPacket(PacketType.ACK, seq_num = seq_num)
+        self.logger.send("%s - ACK cumulativo", ack_packet)
+
+        packet_bytes = ack_packet.serialize()
+
+        if self.channel:
+            self.channel.send(packet_bytes, self.socket, dest_addr)
+        else:
+            self.socket.sendto(packet_bytes, dest_addr)
+
+        self.acks_sent += 1
+
+    def _resend_last_ack(self, dest_addr):
+        """Reenvia o ACK do último pacote entregue em ordem (se houver)"""
+        if self.expected_seq_num > 0:
+            self._send_ack(dest_addr, self.expected_seq_num - 1)
+
+    def get_messages(self):
+        """Retorna mensagens entregues em ordem"""
+        return self.delivered_messages
+
+    def get_statistics(self):
+        """Retorna estatísticas"""
+        return {
+            'packets_received': self.packets_received,
+            'out_of_order_packets': self.out_of_order_packets,
+            'corrupted_packets': self.corrupted_packets,
+            'acks_sent': self.acks_sent,
+            'messages_delivered': len(self.delivered_messages)
+        }
+
+    def stop(self):
+        """Para o receptor"""
+        self.running = False
+        if self.receive_thread:
+            self.receive_thread.join(timeout = 1.0)
+        self.socket.close()
+
+
+# Exemplo de uso
+if __name__ == "__main__":
+    print("=" * 70)
+    print("Teste do Protocolo Go-Back-N (GBN)")
+    print("=" * 70)
+
+    # Canal com perda
+    channel = UnreliableChannel(
+        loss_rate = 0.15,
+        corrupt_rate = 0.05,
+        delay_range = (0.01, 0.1)
+    )
+
+    # Criar receptor e remetente
+    receiver = GBNReceiver(7001, channel = channel)
+    receiver.start()
+
+    sender = GBNSender(7000, window_size = 8, channel = channel, timeout = 1.0)
+    sender.start(('localhost', 7001))
+
+    # Enviar dados
+    print(f"\nEnviando 50 mensagens com janela={sender.window_size}...")
+    print("Canal: 15% perda, 5% corrupção\n")
+
+    messages = [f"Pacote {i:03d}" for i in range(50)]
+
+    for msg in messages:
+        sender.send(msg)
+
+    # Aguardar conclusão
+    print("Aguardando confirmação...")
+    success = sender.wait_for_completion(timeout = 15.0)
+
+    time.sleep(1)
+
+    # Resultados: montar o relatório inteiro e escrever de uma vez
+    # (uma única chamada de escrita em vez de ~40 prints)
+    report = io.StringIO()
+    report.write("\n" + "=" * 70 + "\n")
+    report.write("RESULTADOS\n")
+    report.write("=" * 70 + "\n")
+
+    report.write("\nRemetente:\n")
+    stats_sender = sender.get_statistics()
+    for key, value in stats_sender.items():
+        if 'rate' in key or 'utilization' in key:
+            report.write(f"  {key}: {value:.2%}\n")
+        elif 'time' in key:
+            report.write(f"  {key}: {value:.2f}s\n")
+        elif 'throughput' in key:
+            report.write(f"  {key}: {value:.2f} bytes/s\n")
+        else:
+            report.write(f"  {key}: {value}\n")
+
+    report.write("\nReceptor:\n")
+    stats_receiver = receiver.get_statistics()
+    for key, value in stats_receiver.items():
+        report.write(f"  {key}: {value}\n")
+
+    received = receiver.get_messages()
+
+    report.write(f"\n✓ Mensagens recebidas: {len(received)}/{len(messages)}\n")
+
+    if len(received) == len(messages):
+        report.write("✓ SUCESSO: Todas as mensagens entregues em ordem!\n")
+
+    sys.stdout.write(report.getvalue())
+
+    # Estatísticas do canal
+    channel.print_statistics()
+
+    # Limpar
+    sender.stop()
+    receiver.stop()
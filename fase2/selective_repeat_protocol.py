@@ -6,9 +6,14 @@ Características:
 - Retransmissão seletiva apenas dos pacotes perdidos
 - Receptor bufferiza pacotes fora de ordem
 """
+import errno
+import gc
+import selectors
 import socket
+import struct
 import threading
 import time
+import zlib
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -16,34 +21,91 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.packet import RDTPacket, PacketType
 from utils.simulator import UnreliableChannel
 from utils.logger import ProtocolLogger
+from utils.mmsg import batch_send, batch_receiver
+from utils.scheduler import call_later
+
+# ACKs individuais têm formato fixo de 6 bytes (tipo, seq, CRC): um
+# decodificador pré-compilado dedicado evita o deserialize genérico de
+# pacotes com payload variável no caminho que dispara uma vez por ACK
+_ACK_STRUCT = struct.Struct('BB4s')
+_CRC_STRUCT = struct.Struct('>I')
+
+
+def _log_socket_buffers(sock, logger):
+    """Registra os tamanhos efetivos dos buffers do socket (o kernel os dobra)"""
+    rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    sndbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+    logger.debug("Buffers do socket: SO_RCVBUF=%d, SO_SNDBUF=%d", rcvbuf, sndbuf)
+
+
+def _pin_to_cpu(cpu, logger):
+    """Fixa a thread chamadora em um núcleo específico (quando suportado)"""
+    if cpu is None or not hasattr(os, 'sched_setaffinity'):
+        return
+    try:
+        os.sched_setaffinity(0, {cpu})
+        logger.debug("Thread fixada no núcleo %d", cpu)
+    except OSError as e:
+        logger.warning("Falha ao fixar no núcleo %d: %s", cpu, e)
 
 
 class SRSender:
     """Remetente Selective Repeat com timers individuais"""
     
-    def __init__(self, port, window_size = 5, channel = None, timeout = 1.0):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(('localhost', port))
+    def __init__(self, port, window_size = 5, channel = None, timeout = 1.0,
+                 cpu = None, sock = None, rcvbuf = 12582912, sndbuf = 12582912):
+        # Aceita um socket externo já criado (permite compartilhar um único
+        # socket bidirecional entre remetente e receptor)
+        if sock is not None:
+            self.socket = sock
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+            # SO_REUSEPORT permite que vários processos/threads partilhem o
+            # mesmo porto (o kernel distribui os fluxos entre eles)
+            if hasattr(socket, 'SO_REUSEPORT'):
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self.socket.bind(('localhost', port))
         self.port = port
         self.window_size = window_size
         self.channel = channel
         self.timeout_value = timeout
+        # Núcleo onde fixar a thread de ACKs (None = deixar com o escalonador)
+        self.cpu = cpu
         
         self.logger = ProtocolLogger(f'SR-Sender-{port}')
+        _log_socket_buffers(self.socket, self.logger)
         
         # Variáveis de controle
         self.base = 0
         self.next_seq_num = 0
         
-        # Buffer: {seq_num: (packet, timer, acked, send_time)}
-        self.send_buffer = {}
+        # Buffer em anel no formato SoA (structure-of-arrays): um vetor por
+        # campo, indexados por seq_num % window_size. Um slot é válido
+        # enquanto base <= seq_num < next_seq_num. Elimina o dicionário
+        # aninhado por pacote (e seu custo de memória/alocação por entrada)
+        self._ring_packet = [None] * window_size
+        self._ring_bytes = [None] * window_size
+        self._ring_timer = [None] * window_size
+        self._ring_send_time = [0.0] * window_size
+        # Bitmap de confirmações relativo à base: o bit i corresponde ao
+        # seq_num base + i. Avançar a janela vira uma contagem de uns no
+        # final (O(1) em bits) em vez de um teste por slot
+        self._acked_bitmap = 0
         self.lock = threading.Lock()
+        # Sinalizada quando a base avança (janela deixa de estar cheia)
+        self.window_cv = threading.Condition(self.lock)
         
         # Thread para receber ACKs
         self.running = False
         self.ack_thread = None
         self.peer_address = None
-        
+
+        # Par de sockets de despertar: stop() escreve um byte para acordar
+        # o select bloqueado, sem timeout periódico de verificação
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+
         # Estatísticas
         self.packets_sent = 0
         self.retransmissions = 0
@@ -56,13 +118,14 @@ class SRSender:
         """Inicia o remetente SR"""
         self.peer_address = dest_address
         self.running = True
-        self.start_time = time.time()
+        # Base monotônica para elapsed_time/throughput nas estatísticas
+        self.start_time = time.perf_counter()
         
         self.ack_thread = threading.Thread(target = self._ack_receive_loop)
         self.ack_thread.daemon = True
         self.ack_thread.start()
         
-        self.logger.info(f"Remetente SR iniciado (janela={self.window_size})")
+        self.logger.info("Remetente SR iniciado (janela=%d)", self.window_size)
     
     def send(self, data):
         """Envia dados usando protocolo SR"""
@@ -71,53 +134,113 @@ class SRSender:
         
         self.total_bytes_sent += len(data)
         
-        # Aguardar se a janela estiver cheia
-        while self.next_seq_num >= self.base + self.window_size:
-            time.sleep(0.01)
-        
-        # Criar pacote
-        packet = RDTPacket(PacketType.DATA, seq_num = self.next_seq_num, data = data)
-        
-        with self.lock:
-            # Adicionar ao buffer
-            self.send_buffer[self.next_seq_num] = {
-                'packet': packet,
-                'timer': None,
-                'acked': False,
-                'send_time': time.time()
-            }
-            
-            # Enviar pacote e iniciar timer individual
-            self._send_packet(packet)
+        with self.window_cv:
+            # Aguardar se a janela estiver cheia (acordado por _handle_ack
+            # quando a base avança, sem polling)
+            self.window_cv.wait_for(
+                lambda: self.next_seq_num < self.base + self.window_size)
+
+            # Criar e serializar o pacote uma única vez: retransmissões
+            # reutilizam os mesmos bytes guardados no anel
+            packet = RDTPacket(PacketType.DATA, seq_num = self.next_seq_num, data = data)
+            packet_bytes = packet.serialize()
+
+            # Adicionar ao buffer (slot do anel)
+            idx = self.next_seq_num % self.window_size
+            self._ring_packet[idx] = packet
+            self._ring_bytes[idx] = packet_bytes
+            self._ring_timer[idx] = None
+            self._ring_send_time[idx] = time.perf_counter()
+
+            # Enviar pacote e iniciar timer individual (avançar
+            # next_seq_num antes: o slot só é válido dentro da janela)
+            self._send_packet(packet_bytes)
             self.packets_sent += 1
-            self._start_timer(self.next_seq_num)
-            
-            self.logger.send(f"{packet} - Dados: {data[:20]}")
             self.next_seq_num += 1
+            self._start_timer(packet.seq_num)
+
+            self.logger.send("%s - Dados: %r", packet, data[:20])
     
-    def _send_packet(self, packet):
-        """Envia pacote através do canal"""
-        packet_bytes = packet.serialize()
-        
+    def send_many(self, data_list):
+        """
+        Envia uma sequência de mensagens amortizando lock e syscalls
+
+        As mensagens que cabem na janela saem juntas em um único lote
+        (uma chamada de sendmmsg no caminho sem canal) e o lock é
+        adquirido uma vez por lote, não uma vez por mensagem. Quando a
+        janela enche, o lote acumulado é despachado e a thread espera o
+        avanço da base, como em send().
+        """
+        with self.window_cv:
+            pending = []
+
+            for data in data_list:
+                if isinstance(data, str):
+                    data = data.encode()
+
+                self.total_bytes_sent += len(data)
+
+                if self.next_seq_num >= self.base + self.window_size:
+                    # Janela cheia: despachar o acumulado antes de dormir
+                    if pending:
+                        self._flush_packets(pending)
+                        pending = []
+                    self.window_cv.wait_for(
+                        lambda: self.next_seq_num < self.base + self.window_size)
+
+                packet = RDTPacket(PacketType.DATA, seq_num = self.next_seq_num,
+                                   data = data)
+                packet_bytes = packet.serialize()
+
+                idx = self.next_seq_num % self.window_size
+                self._ring_packet[idx] = packet
+                self._ring_bytes[idx] = packet_bytes
+                self._ring_timer[idx] = None
+                self._ring_send_time[idx] = time.perf_counter()
+
+                pending.append(packet_bytes)
+                self.packets_sent += 1
+                self.next_seq_num += 1
+                self._start_timer(packet.seq_num)
+
+                self.logger.send("%s - Dados: %r", packet, data[:20])
+
+            if pending:
+                self._flush_packets(pending)
+
+    def _send_packet(self, packet_bytes):
+        """Envia um pacote já serializado através do canal"""
+        self._flush_packets([packet_bytes])
+
+    def _flush_packets(self, payloads):
+        """
+        Envia um lote de pacotes já serializados ao destino
+
+        Sem canal simulado, o lote inteiro sai em uma única chamada de
+        sistema via sendmmsg; com canal, cada pacote passa individualmente
+        pelo simulador (que decide perda/corrupção por pacote).
+        """
         if self.channel:
-            self.channel.send(packet_bytes, self.socket, self.peer_address)
+            for payload in payloads:
+                self.channel.send(payload, self.socket, self.peer_address)
         else:
-            self.socket.sendto(packet_bytes, self.peer_address)
+            batch_send(self.socket, payloads, self.peer_address)
     
     def _start_timer(self, seq_num):
-        """Inicia timer individual para um pacote"""
-        if seq_num in self.send_buffer:
-            if self.send_buffer[seq_num]['timer']:
-                self.send_buffer[seq_num]['timer'].cancel()
-            
-            timer = threading.Timer(
-                self.timeout_value,
-                self._on_timeout,
-                args=(seq_num,)
-            )
-            timer.daemon = True
-            timer.start()
-            self.send_buffer[seq_num]['timer'] = timer
+        """
+        Inicia timer individual para um pacote
+
+        Os temporizadores vão para o agendador compartilhado (uma thread
+        daemon e um heap para o processo todo) em vez de um threading.Timer
+        - e portanto uma thread do SO - por pacote e por retransmissão.
+        """
+        if self.base <= seq_num < self.next_seq_num:
+            idx = seq_num % self.window_size
+            if self._ring_timer[idx]:
+                self._ring_timer[idx].cancel()
+
+            self._ring_timer[idx] = call_later(
+                self.timeout_value, lambda: self._on_timeout(seq_num))
     
     def _on_timeout(self, seq_num):
         """
@@ -125,83 +248,145 @@ class SRSender:
         Retransmite APENAS esse pacote
         """
         with self.lock:
-            if seq_num in self.send_buffer and not self.send_buffer[seq_num]['acked']:
-                packet = self.send_buffer[seq_num]['packet']
-                
-                self.logger.timeout(f"Seq{seq_num} - Retransmitindo seletivamente")
+            idx = seq_num % self.window_size
+            if (self.base <= seq_num < self.next_seq_num
+                    and not (self._acked_bitmap >> (seq_num - self.base)) & 1):
+                self.logger.timeout("Seq%d - Retransmitindo seletivamente", seq_num)
                 self.timeouts += 1
                 self.retransmissions += 1
-                
-                # Retransmitir apenas este pacote
-                self._send_packet(packet)
+
+                # Retransmitir apenas este pacote (bytes já serializados)
+                self._send_packet(self._ring_bytes[idx])
                 
                 # Reiniciar timer
                 self._start_timer(seq_num)
     
     def _ack_receive_loop(self):
-        """Thread que recebe ACKs individuais"""
-        self.socket.settimeout(0.1)
-        
+        """
+        Thread que recebe ACKs individuais
+
+        O socket fica não-bloqueante atrás de um seletor; quando há ACKs,
+        recvmmsg drena a rajada inteira em uma chamada de sistema e o lote
+        é processado sob uma única aquisição do lock (em vez de um
+        recvfrom e um lock por ACK).
+        """
+        _pin_to_cpu(self.cpu, self.logger)
+
+        self.socket.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(self.socket, selectors.EVENT_READ)
+        sel.register(self._wakeup_r, selectors.EVENT_READ)
+        batch = batch_receiver(self.socket, batch_size = 32, buffer_size = 1024)
+
         while self.running:
             try:
-                packet_bytes, _ = self.socket.recvfrom(1024)
-                ack_packet = RDTPacket.deserialize(packet_bytes)
-                
-                if ack_packet is None or ack_packet.is_corrupt():
+                # Select totalmente bloqueante: stop() acorda pelo socketpair
+                events = sel.select()
+
+                for key, _ in events:
+                    if key.fileobj is self._wakeup_r:
+                        # Byte de despertar de stop(): consumir e reavaliar
+                        self._wakeup_r.recv(64)
+
+                if not any(key.fileobj is self.socket for key, _ in events):
                     continue
-                
-                if ack_packet.type == PacketType.ACK:
-                    self._handle_ack(ack_packet)
-                    
-            except socket.timeout:
-                continue
+
+                try:
+                    datagrams = batch.recv()
+                except OSError as e:
+                    if e.errno == errno.EAGAIN:
+                        continue
+                    raise
+
+                # Verificação CRC em lote, direto nos buffers brutos
+                # (zlib.crc32 em C): ACKs corrompidos são descartados sem
+                # nunca virar um RDTPacket
+                acks = []
+                for packet_bytes, _ in datagrams:
+                    # Caminho rápido: ACK individual de formato fixo, um
+                    # único unpack pré-compilado + CRC do cabeçalho
+                    if len(packet_bytes) == 6:
+                        ptype, seq, crc = _ACK_STRUCT.unpack(packet_bytes)
+                        if (ptype == PacketType.ACK and crc ==
+                                _CRC_STRUCT.pack(zlib.crc32(packet_bytes[:2]))):
+                            acks.append(seq)
+                        continue
+
+                    # Caminho genérico: vetores de ACK e demais formatos
+                    if not RDTPacket.verify_buffer(packet_bytes):
+                        continue
+
+                    if packet_bytes[0] == PacketType.ACK_VECTOR:
+                        # Um byte por seq_num confirmado
+                        acks.extend(packet_bytes[6:])
+
+                if acks:
+                    self._handle_ack_batch(acks)
+
             except Exception as e:
                 if self.running:
-                    self.logger.error(f"Erro recebendo ACK: {e}")
-    
-    def _handle_ack(self, ack_packet):
+                    self.logger.error("Erro recebendo ACK: %s", e)
+
+        sel.close()
+
+    def _handle_ack_batch(self, ack_nums):
         """
-        Processa ACK individual
-        
+        Processa um lote de ACKs sob um único lock
+
+        Cada ACK marca seu slot; a varredura de avanço da base roda uma
+        só vez ao final, depois que o lote inteiro foi aplicado. O lote
+        pode vir de ACKs individuais ou de um vetor ACK_VECTOR.
+
         Args:
-            ack_packet: Pacote ACK recebido
+            ack_nums: Lista de seq_nums confirmados
         """
-        ack_num = ack_packet.seq_num
-        
         with self.lock:
-            # ACK individual
-            if ack_num in self.send_buffer and not self.send_buffer[ack_num]['acked']:
-                self.logger.receive(f"{ack_packet} - ACK individual")
-                self.acks_received += 1
-                
-                # Marcar como confirmado
-                self.send_buffer[ack_num]['acked'] = True
-                
-                # Cancelar timer
-                if self.send_buffer[ack_num]['timer']:
-                    self.send_buffer[ack_num]['timer'].cancel()
-                
-                # Se for o base, avançar janela
-                if ack_num == self.base:
-                    # Avançar base até o próximo pacote não confirmado
-                    while self.base in self.send_buffer and self.send_buffer[self.base]['acked']:
-                        del self.send_buffer[self.base]
-                        self.base += 1
-                    
-                    self.logger.info(f"Janela avançada para base={self.base}")
+            for ack_num in ack_nums:
+                if self.base <= ack_num < self.next_seq_num:
+                    bit = 1 << (ack_num - self.base)
+                    if self._acked_bitmap & bit:
+                        continue
+
+                    self.logger.receive("ACK Seq%d - confirmado", ack_num)
+                    self.acks_received += 1
+
+                    # Marcar como confirmado
+                    self._acked_bitmap |= bit
+
+                    # Cancelar timer
+                    idx = ack_num % self.window_size
+                    if self._ring_timer[idx]:
+                        self._ring_timer[idx].cancel()
+                        self._ring_timer[idx] = None
+
+            # Avançar a base: a quantidade de uns consecutivos no final do
+            # bitmap sai de uma única operação de bits, sem testar slot a
+            # slot (o índice do zero mais baixo é o total de uns finais)
+            zeros = ~self._acked_bitmap
+            trailing_ones = (zeros & -zeros).bit_length() - 1
+
+            if trailing_ones:
+                # Liberar as referências dos slots que saem da janela
+                for seq in range(self.base, self.base + trailing_ones):
+                    idx = seq % self.window_size
+                    self._ring_packet[idx] = None
+                    self._ring_bytes[idx] = None
+
+                self.base += trailing_ones
+                self._acked_bitmap >>= trailing_ones
+
+                self.logger.info("Janela avançada para base=%d", self.base)
+                self.window_cv.notify_all()
     
     def wait_for_completion(self, timeout=10.0):
         """Aguarda todos os pacotes serem confirmados"""
-        start = time.time()
-        while self.base < self.next_seq_num:
-            if time.time() - start > timeout:
-                return False
-            time.sleep(0.1)
-        return True
+        with self.window_cv:
+            return self.window_cv.wait_for(
+                lambda: self.base >= self.next_seq_num, timeout = timeout)
     
     def get_statistics(self):
         """Retorna estatísticas"""
-        elapsed = time.time() - self.start_time if self.start_time else 0
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0
         throughput = (self.total_bytes_sent / elapsed) if elapsed > 0 else 0
         
         return {
@@ -223,26 +408,47 @@ class SRSender:
         
         with self.lock:
             # Cancelar todos os timers
-            for seq_num in self.send_buffer:
-                if self.send_buffer[seq_num]['timer']:
-                    self.send_buffer[seq_num]['timer'].cancel()
-        
+            for timer in self._ring_timer:
+                if timer:
+                    timer.cancel()
+
+        # Acordar a thread de ACKs bloqueada no select
+        try:
+            self._wakeup_w.send(b'\x00')
+        except OSError:
+            pass
+
         if self.ack_thread:
             self.ack_thread.join(timeout=1.0)
         self.socket.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
 
 
 class SRReceiver:
     """Receptor Selective Repeat com buffer para pacotes fora de ordem"""
     
-    def __init__(self, port, window_size=5, channel=None):
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.socket.bind(('localhost', port))
+    def __init__(self, port, window_size=5, channel=None, cpu=None,
+                 sock=None, rcvbuf=12582912, sndbuf=12582912):
+        if sock is not None:
+            self.socket = sock
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+            # SO_REUSEPORT: vários receptores poderiam partilhar este porto,
+            # com o kernel repartindo os fluxos entre eles
+            if hasattr(socket, 'SO_REUSEPORT'):
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self.socket.bind(('localhost', port))
         self.port = port
         self.window_size = window_size
         self.channel = channel
+        # Núcleo onde fixar a thread de recepção
+        self.cpu = cpu
         
         self.logger = ProtocolLogger(f'SR-Receiver-{port}')
+        _log_socket_buffers(self.socket, self.logger)
         
         # Base da janela de recepção
         self.rcv_base = 0
@@ -252,7 +458,17 @@ class SRReceiver:
         
         # Mensagens entregues em ordem
         self.delivered_messages = []
-        
+
+        # ACKs atrasados (RFC 813): seq_nums acumulados aqui saem juntos
+        # em um único pacote ACK_VECTOR quando o lote enche ou o timer
+        # de coalescência expira
+        self.pending_acks = []
+        self._ack_dest = None
+        self._ack_timer = None
+        self._ack_lock = threading.Lock()
+        self.ack_batch_max = 8
+        self.ack_delay = 0.005
+
         # Estatísticas
         self.packets_received = 0
         self.buffered_packets = 0
@@ -263,6 +479,9 @@ class SRReceiver:
         # Thread
         self.running = False
         self.receive_thread = None
+
+        # Par de sockets de despertar para stop() interromper o select
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
     
     def start(self):
         """Inicia o receptor"""
@@ -270,83 +489,164 @@ class SRReceiver:
         self.receive_thread = threading.Thread(target = self._receive_loop)
         self.receive_thread.daemon = True
         self.receive_thread.start()
-        self.logger.info(f"Receptor SR iniciado (janela={self.window_size})")
+        self.logger.info("Receptor SR iniciado (janela=%d)", self.window_size)
     
     def _receive_loop(self):
-        """Loop principal de recepção"""
+        """
+        Loop principal de recepção
+
+        O socket fica não-bloqueante atrás de um seletor; quando há dados,
+        recvmmsg puxa a rajada inteira em uma única chamada de sistema
+        (um recvfrom por datagrama nas plataformas sem recvmmsg).
+        """
+        _pin_to_cpu(self.cpu, self.logger)
+
+        self.socket.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(self.socket, selectors.EVENT_READ)
+        sel.register(self._wakeup_r, selectors.EVENT_READ)
+        batch = batch_receiver(self.socket, batch_size = 64, buffer_size = 2048)
+
         while self.running:
             try:
-                packet_bytes, sender_addr = self.socket.recvfrom(2048)
-                self.packets_received += 1
-                
-                packet = RDTPacket.deserialize(packet_bytes)
-                
-                if packet is None:
-                    continue
-                
-                self.logger.receive(f"{packet}")
+                # Select totalmente bloqueante: stop() acorda pelo socketpair
+                events = sel.select()
 
-                if packet.is_corrupt():
-                    self.logger.corrupt(f"{packet}")
-                    self.corrupted_packets += 1
+                for key, _ in events:
+                    if key.fileobj is self._wakeup_r:
+                        self._wakeup_r.recv(64)
+
+                if not any(key.fileobj is self.socket for key, _ in events):
                     continue
-                
-                seq_num = packet.seq_num
-
-                # Verificar se está dentro da janela
-                if self.rcv_base <= seq_num < self.rcv_base + self.window_size:
-                    # Dentro da janela - enviar ACK individual
-                    self._send_ack(sender_addr, seq_num)
-                    
-                    if seq_num == self.rcv_base:
-                        # Pacote esperado - entregar
-                        self.logger.deliver(f"Seq{seq_num} - Dados: {packet.data[:30]}")
-                        self.delivered_messages.append(packet.data)
-                        self.rcv_base += 1
-                        
-                        # Entregar pacotes bufferizados consecutivos
-                        while self.rcv_base in self.receive_buffer:
-                            data = self.receive_buffer.pop(self.rcv_base)
-                            self.logger.deliver(f"Seq{self.rcv_base} - Do buffer")
-                            self.delivered_messages.append(data)
-                            self.rcv_base += 1
-                        
-                        self.logger.info(f"Janela avançada para rcv_base={self.rcv_base}")
-                    
-                    elif seq_num > self.rcv_base:
-                        # Pacote fora de ordem mas dentro da janela - bufferizar
-                        if seq_num not in self.receive_buffer:
-                            self.logger.warning(f"Seq{seq_num} - Bufferizando (fora de ordem)")
-                            self.receive_buffer[seq_num] = packet.data
-                            self.buffered_packets += 1
-                
-                elif seq_num < self.rcv_base:
-                    # Pacote já recebido - reenviar ACK
-                    self.logger.warning(f"Seq{seq_num} - Já recebido, reenviando ACK")
-                    self._send_ack(sender_addr, seq_num)
-                
-                else:
-                    # Fora da janela
-                    self.out_of_window_packets += 1
-                    self.logger.warning(f"Seq{seq_num} - Fora da janela!")
-                    
+
+                try:
+                    datagrams = batch.recv()
+                except OSError as e:
+                    if e.errno == errno.EAGAIN:
+                        continue
+                    raise
+
+                for packet_bytes, sender_addr in datagrams:
+                    self._process_packet(packet_bytes, sender_addr)
+
             except Exception as e:
                 if self.running:
-                    self.logger.error(f"Erro: {e}")
+                    self.logger.error("Erro: %s", e)
+
+        sel.close()
+
+    def _process_packet(self, packet_bytes, sender_addr):
+        """
+        Processa um datagrama recebido
+
+        Validação e classificação acontecem direto no buffer bruto: o
+        payload só é copiado quando o pacote é de fato entregue ou
+        bufferizado. Corrompidos, duplicados e fora da janela são
+        descartados sem nenhuma cópia (o buffer do pool será reutilizado).
+        """
+        self.packets_received += 1
+
+        # Checksum sobre o próprio buffer, antes de qualquer parse
+        if not RDTPacket.verify_buffer(packet_bytes):
+            self.logger.corrupt("Datagrama inválido de %s - descartado", sender_addr)
+            self.corrupted_packets += 1
+            return
+
+        seq_num = packet_bytes[1]
+
+        self.logger.receive("[DATA | Seq:%d | Len:%d]", seq_num, len(packet_bytes) - 6)
+
+        # Verificar se está dentro da janela
+        if self.rcv_base <= seq_num < self.rcv_base + self.window_size:
+            # Dentro da janela - enviar ACK individual
+            self._send_ack(sender_addr, seq_num)
+
+            if seq_num == self.rcv_base:
+                # Pacote esperado - entregar (única cópia do payload)
+                data = bytes(packet_bytes[6:])
+                self.logger.deliver("Seq%d - Dados: %r", seq_num, data[:30])
+                self.delivered_messages.append(data)
+                self.rcv_base += 1
+
+                # Entregar pacotes bufferizados consecutivos
+                while self.rcv_base in self.receive_buffer:
+                    data = self.receive_buffer.pop(self.rcv_base)
+                    self.logger.deliver("Seq%d - Do buffer", self.rcv_base)
+                    self.delivered_messages.append(data)
+                    self.rcv_base += 1
+
+                self.logger.info("Janela avançada para rcv_base=%d", self.rcv_base)
+
+            elif seq_num > self.rcv_base:
+                # Fora de ordem mas dentro da janela - bufferizar (cópia
+                # necessária: o payload precisa sobreviver ao pool)
+                if seq_num not in self.receive_buffer:
+                    self.logger.warning("Seq%d - Bufferizando (fora de ordem)", seq_num)
+                    self.receive_buffer[seq_num] = bytes(packet_bytes[6:])
+                    self.buffered_packets += 1
+
+                # Lacuna detectada: o remetente precisa saber já quais
+                # pacotes chegaram, sem esperar o timer de coalescência
+                self._flush_acks()
+
+        elif seq_num < self.rcv_base:
+            # Pacote já recebido - reenviar ACK imediatamente: um duplicado
+            # indica que o timer do remetente já disparou para este seq
+            self.logger.warning("Seq%d - Já recebido, reenviando ACK", seq_num)
+            self._send_ack(sender_addr, seq_num)
+            self._flush_acks()
+
+        else:
+            # Fora da janela
+            self.out_of_window_packets += 1
+            self.logger.warning("Seq%d - Fora da janela!", seq_num)
     
     def _send_ack(self, dest_addr, seq_num):
-        """Envia ACK individual para um pacote específico"""
-        ack_packet = RDTPacket(PacketType.ACK, seq_num = seq_num)
-        self.logger.send(f"{ack_packet} - ACK individual")
-        
+        """
+        Agenda ACK para um pacote (coalescido em um vetor de ACKs)
+
+        Em vez de um datagrama ACK por pacote de dados, o seq_num entra em
+        pending_acks; o vetor inteiro sai quando acumula ack_batch_max
+        confirmações ou quando o timer de ack_delay expira.
+        """
+        with self._ack_lock:
+            self.pending_acks.append(seq_num)
+            self._ack_dest = dest_addr
+
+            if len(self.pending_acks) >= self.ack_batch_max:
+                self._flush_acks_locked()
+            elif self._ack_timer is None:
+                self._ack_timer = call_later(self.ack_delay, self._flush_acks)
+
+    def _flush_acks(self):
+        """Envia os ACKs pendentes (callback do timer de coalescência)"""
+        with self._ack_lock:
+            self._flush_acks_locked()
+
+    def _flush_acks_locked(self):
+        """Envia os ACKs pendentes; chamar com _ack_lock adquirido"""
+        if self._ack_timer:
+            self._ack_timer.cancel()
+            self._ack_timer = None
+
+        if not self.pending_acks:
+            return
+
+        # Payload: um byte por seq_num confirmado
+        ack_packet = RDTPacket(PacketType.ACK_VECTOR,
+                               seq_num = self.pending_acks[-1],
+                               data = bytes(self.pending_acks))
+        self.logger.send("%s - Vetor com %d ACKs", ack_packet, len(self.pending_acks))
+
         packet_bytes = ack_packet.serialize()
-        
+
         if self.channel:
-            self.channel.send(packet_bytes, self.socket, dest_addr)
+            self.channel.send(packet_bytes, self.socket, self._ack_dest)
         else:
-            self.socket.sendto(packet_bytes, dest_addr)
-        
+            self.socket.sendto(packet_bytes, self._ack_dest)
+
         self.acks_sent += 1
+        self.pending_acks = []
     
     def get_messages(self):
         """Retorna mensagens entregues em ordem"""
@@ -366,10 +666,20 @@ class SRReceiver:
     
     def stop(self):
         """Para o receptor"""
+        self._flush_acks()
         self.running = False
+
+        # Acordar a thread de recepção bloqueada no select
+        try:
+            self._wakeup_w.send(b'\x00')
+        except OSError:
+            pass
+
         if self.receive_thread:
             self.receive_thread.join(timeout=1.0)
         self.socket.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
 
 
 # Exemplo de uso
@@ -385,11 +695,15 @@ if __name__ == "__main__":
         delay_range=(0.01, 0.15)
     )
     
-    # Criar receptor e remetente
-    receiver = SRReceiver(8001, window_size = 8, channel = channel)
+    # Criar receptor e remetente, cada um fixado em um núcleo (quando há
+    # mais de um) para evitar migrações entre CPUs durante o teste
+    multi_core = (os.cpu_count() or 1) > 1
+    receiver = SRReceiver(8001, window_size = 8, channel = channel,
+                          cpu = 1 if multi_core else None)
     receiver.start()
-    
-    sender = SRSender(8000, window_size = 8, channel = channel, timeout = 1.0)
+
+    sender = SRSender(8000, window_size = 8, channel = channel, timeout = 1.0,
+                      cpu = 0 if multi_core else None)
     sender.start(('localhost', 8001))
     
     # Enviar dados
@@ -397,15 +711,22 @@ if __name__ == "__main__":
     print("Canal: 15% perda, 5% corrupção\n")
     
     messages = [f"Pacote {i:03d}" for i in range(50)]
-    
-    for msg in messages:
-        sender.send(msg)
-        time.sleep(0.01)
-    
-    # Aguardar conclusão
-    print("Aguardando confirmação...")
-    success = sender.wait_for_completion(timeout = 15.0)
-    
+
+    # GC desabilitado durante a fase de transferência: evita pausas de
+    # coleta intercaladas com os callbacks de timer e o caminho de pacotes
+    gc.disable()
+    try:
+        # Sem pausas artificiais entre envios: o lote inteiro alimenta a
+        # janela na velocidade do protocolo
+        sender.send_many(messages)
+
+        # Aguardar conclusão
+        print("Aguardando confirmação...")
+        success = sender.wait_for_completion(timeout = 15.0)
+    finally:
+        gc.collect()
+        gc.enable()
+
     time.sleep(1)
     
     # Resultados
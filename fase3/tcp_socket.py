@@ -7,7 +7,12 @@ Funcionalidades:
 - Retransmissão adaptativa (estimativa de RTT)
 - Encerramento com four-way handshake
 """
+import collections
+import errno
+import selectors
 import socket
+import struct
+import zlib
 import threading
 import time
 import random
@@ -17,6 +22,25 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from utils.packet import TCPSegment
 from utils.logger import ProtocolLogger
+from utils.mmsg import batch_send
+from utils.scheduler import call_later
+
+# Constantes de ajuste de kernel (Linux) não expostas pelo módulo socket:
+# valores de <asm-generic/socket.h> e <linux/in.h>
+_SO_BUSY_POLL = getattr(socket, 'SO_BUSY_POLL', 46)
+_IP_MTU_DISCOVER = getattr(socket, 'IP_MTU_DISCOVER', 10)
+_IP_PMTUDISC_DO = getattr(socket, 'IP_PMTUDISC_DO', 2)
+
+
+def _pin_to_cpu(cpu, logger):
+    """Fixa a thread chamadora em um núcleo específico (quando suportado)"""
+    if cpu is None or not hasattr(os, 'sched_setaffinity'):
+        return
+    try:
+        os.sched_setaffinity(0, {cpu})
+        logger.debug("Thread fixada no núcleo %d", cpu)
+    except OSError as e:
+        logger.warning("Falha ao fixar no núcleo %d: %s", cpu, e)
 
 
 class SimpleTCPSocket:
@@ -34,24 +58,49 @@ class SimpleTCPSocket:
     STATE_LAST_ACK = 'LAST_ACK'
     STATE_TIME_WAIT = 'TIME_WAIT'
     
-    def __init__(self, port, channel=None):
+    # Tamanho máximo de segmento (bytes de payload por datagrama)
+    MSS = 1024
+    
+    def __init__(self, port, channel=None, recv_window=4096,
+                 sndbuf=2097152, rcvbuf=2097152, cpu=None, nodelay=False):
         """
         Inicializa o socket TCP simplificado
         
         Args:
             port: Porta local para bind
             channel: Canal não confiável (opcional, para testes)
+            recv_window: Janela de recepção anunciada, em bytes (o campo
+                no cabeçalho tem 16 bits, então o teto é 65535)
+            sndbuf: Tamanho do buffer de envio do kernel (SO_SNDBUF)
+            rcvbuf: Tamanho do buffer de recepção do kernel (SO_RCVBUF)
+            cpu: Núcleo onde fixar a thread de recepção (opcional)
+            nodelay: Desativa a coalescência de escritas pequenas
+                (análogo ao TCP_NODELAY)
         """
         self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Buffers de socket dimensionados para o produto banda x atraso:
+        # com o padrão do kernel, rajadas de sendmmsg estouram a fila de
+        # recepção antes de a janela da aplicação ser o limite
+        self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
         self.udp_socket.bind(('localhost', port))
         self.port = port
         self.channel = channel
+        self.cpu = cpu
         
         self.logger = ProtocolLogger(f'TCP-{port}')
         
         # Estado da conexão
         self.state = self.STATE_CLOSED
         self.state_lock = threading.Lock()
+        # Sinalizada a cada transição de estado: connect/accept/close
+        # esperam nela em vez de consultar o estado em polling
+        self._state_cv = threading.Condition(self.state_lock)
+        # Eventos espelhando os estados terminais: a leitura de um Event
+        # dispensa o lock nos guardas quentes de send/connect/accept
+        self._established = threading.Event()
+        self._closed = threading.Event()
+        self._listening = threading.Event()
         
         # Números de sequência e ACK
         self.seq_num = random.randint(0, 10000)  # ISN
@@ -61,32 +110,86 @@ class SimpleTCPSocket:
         self.peer_address = None
         self.peer_seq_num = 0
         
-        # Buffers
-        self.send_buffer = []  # [(seq, data, time, acked)]
+        # Buffers. O send_buffer é um deque ordenado por seq: um ACK
+        # cumulativo só remove da esquerda, sem varrer nem reconstruir a
+        # lista; tudo que permanece no deque está pendente de confirmação
+        self.send_buffer = collections.deque()
         self.recv_buffer = {}  # {seq: data}
         self.buffer_lock = threading.Lock()
+        # Contador corrente de bytes em voo (mantido junto do deque) e
+        # condição para acordar send() quando ACKs abrirem a janela,
+        # em vez de varrer o buffer em polling
+        self._unacked_bytes = 0
+        self._window_cv = threading.Condition(self.buffer_lock)
         
         # Controle de fluxo
-        self.recv_window = 4096  # Janela de recepção (bytes)
+        self.recv_window = min(recv_window, 65535)  # Janela de recepção (bytes)
         self.send_window = 4096  # Janela do peer
-        self.cwnd = 1024  # Congestion window (simplificado)
+        # Congestion window (simplificado): 4 segmentos MSS em voo, o
+        # suficiente para o ACK atrasado do receptor disparar pela regra
+        # dos 2 segmentos em vez de esperar o timer de 40 ms
+        self.cwnd = 4096
         
         # Controle de tempo (RTT)
         self.estimated_rtt = 1.0
         self.dev_rtt = 0.5
+        # Backoff exponencial do RTO (Karn/Partridge): dobra a cada
+        # estouro de timer e volta a 1 quando chega um ACK com amostra
+        # limpa (segmento nunca retransmitido). O teto evita que uma
+        # sequência de estouros leve o RTO a dezenas de segundos em um
+        # canal cujo RTT é de milissegundos
+        self._rto_backoff = 1
+        self._max_rto = 4.0
         self.rtt_lock = threading.Lock()
         
+        # Fast Retransmit: 3 ACKs duplicados sinalizam perda isolada e
+        # disparam a retransmissão imediata, sem esperar o RTO
+        self._last_ack = 0
+        self._dup_ack_count = 0
+        
+        # Coalescência à la Nagle: escritas pequenas com dados ainda em
+        # voo são acumuladas até ~1 MSS ou 10 ms antes de virar segmento
+        self.nodelay = nodelay
+        self._coalesce_buf = bytearray()
+        self._coalesce_timer = None
+        self._coalesce_lock = threading.Lock()
+        
+        # Template do ACK puro: cabeçalho pré-serializado com os campos
+        # fixos; só seq/ack e o checksum são reescritos a cada envio
+        self._ack_template = None
+        
+        # ACK atrasado (RFC 1122): confirma a cada 2 segmentos ou após
+        # 40 ms, o que vier primeiro; dados enviados nesse meio-tempo
+        # levam o ACK de carona e dispensam o datagrama separado
+        self._pending_ack = False
+        self._segs_since_ack = 0
+        self._delayed_ack_timer = None
+        self._ack_lock = threading.Lock()
+        
         # Thread de recepção
         self.running = False
         self.receive_thread = None
+        # Buffer de recepção reutilizado: recvfrom_into evita alocar um
+        # bytes novo de 4 KiB por segmento (só _receive_loop o utiliza)
+        self._recv_buf = bytearray(4096)
+        self._recv_view = memoryview(self._recv_buf)
+        # Par de sockets interno usado só para acordar o select() do loop
+        # de recepção no encerramento (self-pipe)
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
         
-        # Timer para retransmissão
+        # Timer de retransmissão: TimerHandle do agendador compartilhado
+        # (uma única thread de timers no processo, sem threading.Timer)
         self.timer = None
         self.timer_lock = threading.Lock()
         
         # Dados recebidos prontos para aplicação
-        self.app_data = []
+        # Acumulador único de bytes entregues em ordem; _app_data_off é o
+        # índice de leitura (recv consome avançando o offset, sem refatiar)
+        self.app_data = bytearray()
+        self._app_data_off = 0
         self.app_data_lock = threading.Lock()
+        # Sinalizada quando app_data ganha dados novos (acorda recv)
+        self._app_data_cv = threading.Condition(self.app_data_lock)
         
         # Estatísticas
         self.segments_sent = 0
@@ -106,7 +209,7 @@ class SimpleTCPSocket:
         Returns:
             True se conectado, False caso contrário
         """
-        self.logger.info(f"Iniciando conexão com {dest_address}")
+        self.logger.info("Iniciando conexão com %s", dest_address)
         self.peer_address = dest_address
         self.start_time = time.time()
         
@@ -114,8 +217,7 @@ class SimpleTCPSocket:
         self._start_receive_thread()
         
         # Estado: SYN_SENT
-        with self.state_lock:
-            self.state = self.STATE_SYN_SENT
+        self._set_state(self.STATE_SYN_SENT)
         
         # Enviar SYN
         syn_segment = TCPSegment(
@@ -127,33 +229,48 @@ class SimpleTCPSocket:
             window_size=self.recv_window
         )
         
-        self.logger.send(f"{syn_segment}")
-        self._send_segment(syn_segment)
-        self.segments_sent += 1
-        
-        # Aguardar SYN-ACK (timeout 5s)
-        timeout = 5.0
-        start = time.time()
-        
-        while time.time() - start < timeout:
-            with self.state_lock:
-                if self.state == self.STATE_ESTABLISHED:
-                    self.logger.info("✓ Conexão estabelecida!")
-                    return True
-            time.sleep(0.1)
-        
+        # Enviar SYN com retransmissão: em canal com perda, SYN ou
+        # SYN-ACK perdidos não podem condenar o handshake inteiro
+        for attempt in range(4):
+            if attempt:
+                self.logger.retransmit("%s", syn_segment)
+            else:
+                self.logger.send("%s", syn_segment)
+            self._send_segment(syn_segment)
+            self.segments_sent += 1
+
+            # O evento é setado na transição para ESTABLISHED
+            if self._established.wait(1.5):
+                self.logger.info("✓ Conexão estabelecida!")
+                return True
+
         self.logger.error("✗ Timeout ao conectar")
-        self.state = self.STATE_CLOSED
+        self._set_state(self.STATE_CLOSED)
         return False
     
     def listen(self):
         """Coloca socket em modo de escuta (servidor)"""
-        self.logger.info(f"Escutando na porta {self.port}")
+        self.logger.info("Escutando na porta %d", self.port)
         
-        with self.state_lock:
-            self.state = self.STATE_LISTEN
+        self._set_state(self.STATE_LISTEN)
         
         self._start_receive_thread()
+        self._listening.set()
+    
+    def wait_listening(self, timeout=5.0):
+        """
+        Aguarda o socket entrar em modo de escuta
+        
+        Sincronização determinística para quem sobe o servidor em outra
+        thread: substitui o sleep fixo entre iniciar a thread e conectar.
+        
+        Args:
+            timeout: Tempo máximo de espera em segundos
+        
+        Returns:
+            True se o servidor está escutando, False se o tempo esgotou
+        """
+        return self._listening.wait(timeout)
     
     def accept(self, timeout=30.0):
         """
@@ -166,16 +283,12 @@ class SimpleTCPSocket:
             True se conexão aceita, False se timeout
         """
         self.logger.info("Aguardando conexão...")
-        
-        start = time.time()
-        while time.time() - start < timeout:
-            with self.state_lock:
-                if self.state == self.STATE_ESTABLISHED:
-                    self.logger.info("✓ Conexão aceita!")
-                    self.start_time = time.time()
-                    return True
-            time.sleep(0.1)
-        
+
+        if self._established.wait(timeout):
+            self.logger.info("✓ Conexão aceita!")
+            self.start_time = time.time()
+            return True
+
         self.logger.error("✗ Timeout aguardando conexão")
         return False
     
@@ -192,55 +305,174 @@ class SimpleTCPSocket:
         if isinstance(data, str):
             data = data.encode()
         
-        if self.state != self.STATE_ESTABLISHED:
-            self.logger.error(f"Não é possível enviar: estado={self.state}")
+        if not self._established.is_set():
+            self.logger.error("Não é possível enviar: estado=%s", self.state)
             return 0
         
+        # Coalescência (Nagle): escrita pequena com dados em voo entra no
+        # acumulador e só vira segmento ao completar ~1 MSS ou após 10 ms,
+        # poupando cabeçalho, checksum e syscall por escrita miúda
+        if (not self.nodelay and len(data) < self.MSS // 2
+                and self._unacked_bytes > 0):
+            with self._coalesce_lock:
+                self._coalesce_buf += data
+                if len(self._coalesce_buf) < self.MSS:
+                    if self._coalesce_timer is None:
+                        self._coalesce_timer = call_later(
+                            0.01, self._flush_coalesced)
+                    return len(data)
+            self._flush_coalesced()
+            return len(data)
+        
+        # Escrita grande: preservar a ordem despachando antes o que
+        # estiver coalescido
+        self._flush_coalesced()
+        
+        return self._transmit(data)
+    
+    def _flush_coalesced(self):
+        """Transmite o que estiver acumulado pela coalescência"""
+        with self._coalesce_lock:
+            if self._coalesce_timer is not None:
+                self._coalesce_timer.cancel()
+                self._coalesce_timer = None
+            if not self._coalesce_buf:
+                return
+            buf = bytes(self._coalesce_buf)
+            del self._coalesce_buf[:]
+        
+        self._transmit(buf)
+    
+    def _transmit(self, data):
+        """Segmenta e envia dados já prontos (núcleo do send)"""
         self.bytes_sent += len(data)
         
-        # Dividir dados em segmentos (MSS = 1024 bytes)
-        mss = 1024
+        # Os segmentos de dados carregam o ack_num: o ACK atrasado que
+        # estiver pendente pega carona e não precisa de datagrama próprio
+        self._cancel_pending_ack()
+        
+        # Dividir dados em segmentos (MSS = 1024 bytes). As fatias saem
+        # de uma memoryview: nenhuma cópia do payload por segmento — o
+        # único traslado dos bytes acontece na serialização do datagrama
+        data = memoryview(data)
+        mss = self.MSS
         offset = 0
         
-        while offset < len(data):
-            # Aguardar se a janela estiver cheia
-            while self._get_unacked_bytes() >= min(self.send_window, self.cwnd):
-                time.sleep(0.01)
-            
-            # Criar segmento
-            chunk = data[offset:offset + mss]
-            
-            segment = TCPSegment(
-                src_port=self.port,
-                dst_port=self.peer_address[1],
-                seq_num=self.seq_num,
-                ack_num=self.ack_num,
-                flags=TCPSegment.FLAG_ACK,
-                window_size=self.recv_window,
-                data=chunk
-            )
-            
-            with self.buffer_lock:
+        # Segmentos serializados aguardando a rajada (flush) da janela
+        pending = []
+        
+        with self._window_cv:
+            while offset < len(data):
+                # Janela cheia: despachar o que já foi acumulado e
+                # dormir até _process_ack liberar espaço e notificar
+                while self._unacked_bytes >= min(self.send_window, self.cwnd):
+                    if pending:
+                        self._flush_segments(pending)
+                        pending = []
+                    self._window_cv.wait()
+                
+                # Criar segmento
+                chunk = data[offset:offset + mss]
+                
+                segment = TCPSegment(
+                    src_port=self.port,
+                    dst_port=self.peer_address[1],
+                    seq_num=self.seq_num,
+                    ack_num=self.ack_num,
+                    flags=TCPSegment.FLAG_ACK,
+                    window_size=self.recv_window,
+                    data=chunk
+                )
+                
                 self.send_buffer.append({
                     'seq': self.seq_num,
                     'data': chunk,
-                    'time': time.time(),
-                    'acked': False,
+                    'time': time.monotonic(),
+                    'retransmitted': False,
                     'segment': segment
                 })
+                self._unacked_bytes += len(chunk)
+                
+                self.logger.send("%s", segment)
+                pending.append(segment.serialize())
+                self.segments_sent += 1
+                
+                self.seq_num += len(chunk)
+                offset += len(chunk)
             
-            self.logger.send(f"{segment}")
-            self._send_segment(segment)
-            self.segments_sent += 1
-            
-            self.seq_num += len(chunk)
-            offset += len(chunk)
-            
-            # Iniciar timer se necessário
-            self._start_retransmit_timer()
+            if pending:
+                self._flush_segments(pending)
         
         return len(data)
     
+    def _flush_segments(self, payloads):
+        """
+        Despacha uma rajada de segmentos já serializados
+        
+        Sem canal simulado, a rajada inteira vai em uma única chamada de
+        sistema via sendmmsg (batch_send); com canal, cada segmento passa
+        individualmente pelo simulador de perdas.
+        """
+        if self.channel:
+            for payload in payloads:
+                self.channel.send(payload, self.udp_socket, self.peer_address)
+        else:
+            batch_send(self.udp_socket, payloads, self.peer_address)
+        
+        # Iniciar timer se necessário
+        self._start_retransmit_timer()
+    
+    def wait_for_completion(self, timeout=10.0):
+        """
+        Aguarda todos os dados enviados serem confirmados pelo outro lado
+        
+        Substitui os sleeps fixos de "acomodação" nos testes: o chamador
+        segue assim que o último ACK chegar, acordado pela condition da
+        janela em vez de esperar um tempo arbitrário.
+        
+        Args:
+            timeout: Tempo máximo de espera em segundos
+        
+        Returns:
+            True se tudo foi confirmado, False se o tempo esgotou
+        """
+        self._flush_coalesced()
+        with self._window_cv:
+            return self._window_cv.wait_for(
+                lambda: self._unacked_bytes == 0, timeout = timeout)
+    
+    def _await_app_data(self, buffer_size):
+        """
+        Espera dados da aplicação e retorna o fim da fatia disponível
+        
+        Deve ser chamado segurando _app_data_cv. Retorna None no timeout.
+        """
+        # Aguardar dados: acordado por _deliver_in_order_data
+        if not self._app_data_cv.wait_for(
+                lambda: len(self.app_data) > self._app_data_off,
+                timeout = 10.0):
+            return None
+
+        # Janela curta de agregação: enquanto segmentos continuarem
+        # chegando em sequência, drenar antes de voltar à aplicação
+        # (em vez de retornar chunk a chunk). A folga de 200 ms cobre
+        # o ritmo imposto pelo ACK atrasado do outro lado (40 ms por
+        # segmento quando há só um segmento em voo)
+        while len(self.app_data) - self._app_data_off < buffer_size:
+            n = len(self.app_data)
+            if not self._app_data_cv.wait_for(
+                    lambda: len(self.app_data) > n, timeout = 0.2):
+                break
+
+        # Entregar até buffer_size BYTES
+        return min(self._app_data_off + buffer_size, len(self.app_data))
+    
+    def _compact_app_data(self):
+        """Compacta o prefixo já consumido de tempos em tempos"""
+        if self._app_data_off > 65536:
+            del self.app_data[:self._app_data_off]
+            self._app_data_off = 0
+    
     def recv(self, buffer_size=4096):
         """
         Recebe dados da conexão
@@ -254,20 +486,46 @@ class SimpleTCPSocket:
         if self.state not in [self.STATE_ESTABLISHED, self.STATE_CLOSE_WAIT]:
             return b''
         
-        # Aguardar dados
-        timeout = 10.0
-        start = time.time()
+        with self._app_data_cv:
+            end = self._await_app_data(buffer_size)
+            if end is None:
+                return b''
+
+            start = self._app_data_off
+            data = bytes(self.app_data[start:end])
+            self._app_data_off = end
+            self._compact_app_data()
+
+            return data
+    
+    def recv_into(self, buf, nbytes=None):
+        """
+        Recebe dados direto no buffer do chamador, sem alocar bytes
+        
+        Args:
+            buf: bytearray ou memoryview gravável de destino
+            nbytes: Máximo de bytes a receber (padrão: len(buf))
+            
+        Returns:
+            Número de bytes gravados em buf (0 no timeout)
+        """
+        if self.state not in [self.STATE_ESTABLISHED, self.STATE_CLOSE_WAIT]:
+            return 0
         
-        while time.time() - start < timeout:
-            with self.app_data_lock:
-                if self.app_data:
-                    # Retornar dados disponíveis
-                    data = b''.join(self.app_data[:buffer_size])
-                    self.app_data = self.app_data[buffer_size:]
-                    return data
-            time.sleep(0.05)
+        limit = len(buf) if nbytes is None else min(nbytes, len(buf))
         
-        return b''
+        with self._app_data_cv:
+            end = self._await_app_data(limit)
+            if end is None:
+                return 0
+
+            start = self._app_data_off
+            n = end - start
+            buf[:n] = self.app_data[start:end]
+            self._app_data_off = end
+            self._compact_app_data()
+
+            return n
     
     def close(self):
         """Fecha a conexão com four-way handshake"""
@@ -276,10 +534,12 @@ class SimpleTCPSocket:
         
         self.logger.info("Iniciando encerramento da conexão")
         
+        # Nada pode ficar retido no acumulador de coalescência
+        self._flush_coalesced()
+        
         if self.state == self.STATE_ESTABLISHED:
             # Enviar FIN
-            with self.state_lock:
-                self.state = self.STATE_FIN_WAIT_1
+            self._set_state(self.STATE_FIN_WAIT_1)
             
             fin_segment = TCPSegment(
                 src_port=self.port,
@@ -290,22 +550,19 @@ class SimpleTCPSocket:
                 window_size=self.recv_window
             )
             
-            self.logger.send(f"{fin_segment}")
+            self.logger.send("%s", fin_segment)
             self._send_segment(fin_segment)
             self.seq_num += 1
             
             # Aguardar encerramento
-            timeout = 5.0
-            start = time.time()
-            
-            while time.time() - start < timeout:
-                with self.state_lock:
-                    if self.state == self.STATE_CLOSED:
-                        break
-                time.sleep(0.1)
+            self._closed.wait(5.0)
         
         # Limpar recursos
         self.running = False
+        try:
+            self._wakeup_w.send(b'\x00')  # Acorda o select() do loop
+        except OSError:
+            pass
         if self.receive_thread:
             self.receive_thread.join(timeout=1.0)
         
@@ -314,8 +571,37 @@ class SimpleTCPSocket:
                 self.timer.cancel()
         
         self.udp_socket.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
         self.logger.info("✓ Conexão encerrada")
     
+    def set_window(self, recv_window):
+        """
+        Ajusta a janela de recepção anunciada
+        
+        Args:
+            recv_window: Nova janela em bytes (teto de 65535, o campo do
+                cabeçalho tem 16 bits)
+        """
+        self.recv_window = min(recv_window, 65535)
+        # O template de ACK puro embute a janela; forçar a reconstrução
+        with self._ack_lock:
+            self._ack_template = None
+    
+    def _set_state(self, new_state):
+        """Atualiza o estado da conexão e acorda quem espera a transição"""
+        with self._state_cv:
+            self.state = new_state
+            self._state_cv.notify_all()
+        
+        # Espelhar nos eventos (fora do lock: set/clear são atômicos)
+        if new_state == self.STATE_ESTABLISHED:
+            self._established.set()
+        else:
+            self._established.clear()
+        if new_state == self.STATE_CLOSED:
+            self._closed.set()
+
     def _start_receive_thread(self):
         """Inicia thread de recepção de segmentos"""
         if not self.running:
@@ -324,29 +610,75 @@ class SimpleTCPSocket:
             self.receive_thread.daemon = True
             self.receive_thread.start()
     
+    def tune_kernel(self, busy_poll_us=50):
+        """
+        Aplica ajustes opcionais de kernel ao socket UDP
+        
+        SO_BUSY_POLL faz o kernel sondar a fila da NIC por alguns
+        microssegundos antes de bloquear (menos latência em alta taxa) e
+        IP_MTU_DISCOVER=IP_PMTUDISC_DO proíbe fragmentação IP, mantendo
+        cada segmento em um único datagrama na rede. Os ajustes são
+        ignorados com aviso quando a plataforma ou as permissões não os
+        suportam.
+        
+        Args:
+            busy_poll_us: Tempo de busy-poll em microssegundos
+        """
+        try:
+            self.udp_socket.setsockopt(socket.SOL_SOCKET,
+                                       _SO_BUSY_POLL, busy_poll_us)
+        except OSError as e:
+            self.logger.warning("SO_BUSY_POLL indisponível: %s", e)
+        
+        try:
+            self.udp_socket.setsockopt(socket.IPPROTO_IP,
+                                       _IP_MTU_DISCOVER, _IP_PMTUDISC_DO)
+        except OSError as e:
+            self.logger.warning("IP_MTU_DISCOVER indisponível: %s", e)
+    
     def _receive_loop(self):
         """Loop principal de recepção"""
-        self.udp_socket.settimeout(0.1)
+        _pin_to_cpu(self.cpu, self.logger)
+        
+        # select() bloqueia sem prazo até chegar um segmento ou o byte de
+        # wakeup enviado por close(): nenhum ciclo de timeout/retry ocioso
+        self.udp_socket.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(self.udp_socket, selectors.EVENT_READ)
+        sel.register(self._wakeup_r, selectors.EVENT_READ)
         
         while self.running:
             try:
-                segment_bytes, addr = self.udp_socket.recvfrom(4096)
-                segment = TCPSegment.deserialize(segment_bytes)
-                
-                if segment is None or segment.is_corrupt():
-                    continue
+                for key, _ in sel.select():
+                    if key.fileobj is self._wakeup_r:
+                        self._wakeup_r.recv(64)
+                        continue
+                    # Drenar todos os datagramas prontos antes de voltar
+                    # ao select()
+                    while True:
+                        try:
+                            nbytes, addr = self.udp_socket.recvfrom_into(
+                                self._recv_buf)
+                        except OSError as e:
+                            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                                break
+                            raise
+                        segment = TCPSegment.deserialize(self._recv_view[:nbytes])
+                        
+                        if segment is None or segment.is_corrupt():
+                            continue
+                        
+                        self.segments_received += 1
+                        self.logger.receive("%s", segment)
+                        
+                        # Processar segmento baseado no estado
+                        self._process_segment(segment, addr)
                 
-                self.segments_received += 1
-                self.logger.receive(f"{segment}")
-                
-                # Processar segmento baseado no estado
-                self._process_segment(segment, addr)
-                
-            except socket.timeout:
-                continue
             except Exception as e:
                 if self.running:
-                    self.logger.error(f"Erro no loop de recepção: {e}")
+                    self.logger.error("Erro no loop de recepção: %s", e)
+        
+        sel.close()
     
     def _process_segment(self, segment, addr):
         """Processa segmento recebido baseado no estado da conexão"""
@@ -372,12 +704,11 @@ class SimpleTCPSocket:
                     window_size=self.recv_window
                 )
                 
-                self.logger.send(f"{syn_ack}")
+                self.logger.send("%s", syn_ack)
                 self._send_segment(syn_ack)
                 self.seq_num += 1
                 
-                with self.state_lock:
-                    self.state = self.STATE_SYN_RECEIVED
+                self._set_state(self.STATE_SYN_RECEIVED)
         
         # SYN_SENT: Aguardando SYN-ACK
         elif current_state == self.STATE_SYN_SENT:
@@ -396,18 +727,29 @@ class SimpleTCPSocket:
                     window_size=self.recv_window
                 )
                 
-                self.logger.send(f"{ack_segment}")
+                self.logger.send("%s", ack_segment)
                 self._send_segment(ack_segment)
                 self.seq_num += 1
                 
-                with self.state_lock:
-                    self.state = self.STATE_ESTABLISHED
+                self._set_state(self.STATE_ESTABLISHED)
         
         # SYN_RECEIVED: Aguardando ACK final
         elif current_state == self.STATE_SYN_RECEIVED:
             if segment.has_flag(TCPSegment.FLAG_ACK):
-                with self.state_lock:
-                    self.state = self.STATE_ESTABLISHED
+                self._set_state(self.STATE_ESTABLISHED)
+            elif segment.has_flag(TCPSegment.FLAG_SYN):
+                # SYN duplicado: o SYN-ACK se perdeu no canal, reenviar
+                # (seq_num já foi incrementado após o primeiro envio)
+                syn_ack = TCPSegment(
+                    src_port=self.port,
+                    dst_port=segment.src_port,
+                    seq_num=self.seq_num - 1,
+                    ack_num=self.ack_num,
+                    flags=TCPSegment.FLAG_SYN | TCPSegment.FLAG_ACK,
+                    window_size=self.recv_window
+                )
+                self.logger.retransmit("%s", syn_ack)
+                self._send_segment(syn_ack)
         
         # ESTABLISHED: Transferência de dados
         elif current_state == self.STATE_ESTABLISHED:
@@ -423,6 +765,9 @@ class SimpleTCPSocket:
             if segment.has_flag(TCPSegment.FLAG_FIN):
                 self.ack_num = segment.seq_num + 1
                 
+                # O ACK do FIN é cumulativo e substitui o ACK atrasado
+                self._cancel_pending_ack()
+                
                 # Enviar ACK
                 ack_segment = TCPSegment(
                     src_port=self.port,
@@ -434,8 +779,7 @@ class SimpleTCPSocket:
                 )
                 self._send_segment(ack_segment)
                 
-                with self.state_lock:
-                    self.state = self.STATE_CLOSE_WAIT
+                self._set_state(self.STATE_CLOSE_WAIT)
                 
                 # Enviar FIN de volta
                 time.sleep(0.1)
@@ -449,14 +793,12 @@ class SimpleTCPSocket:
                 )
                 self._send_segment(fin_segment)
                 
-                with self.state_lock:
-                    self.state = self.STATE_LAST_ACK
+                self._set_state(self.STATE_LAST_ACK)
         
         # FIN_WAIT_1: Aguardando ACK do FIN
         elif current_state == self.STATE_FIN_WAIT_1:
             if segment.has_flag(TCPSegment.FLAG_ACK):
-                with self.state_lock:
-                    self.state = self.STATE_FIN_WAIT_2
+                self._set_state(self.STATE_FIN_WAIT_2)
             
             if segment.has_flag(TCPSegment.FLAG_FIN):
                 self.ack_num = segment.seq_num + 1
@@ -470,8 +812,7 @@ class SimpleTCPSocket:
                 )
                 self._send_segment(ack_segment)
                 
-                with self.state_lock:
-                    self.state = self.STATE_CLOSED
+                self._set_state(self.STATE_CLOSED)
         
         # FIN_WAIT_2: Aguardando FIN
         elif current_state == self.STATE_FIN_WAIT_2:
@@ -487,19 +828,18 @@ class SimpleTCPSocket:
                 )
                 self._send_segment(ack_segment)
                 
-                with self.state_lock:
-                    self.state = self.STATE_CLOSED
+                self._set_state(self.STATE_CLOSED)
         
         # LAST_ACK: Aguardando ACK final
         elif current_state == self.STATE_LAST_ACK:
             if segment.has_flag(TCPSegment.FLAG_ACK):
-                with self.state_lock:
-                    self.state = self.STATE_CLOSED
+                self._set_state(self.STATE_CLOSED)
     
     def _receive_data(self, segment):
         """Processa dados recebidos"""
         seq_num = segment.seq_num
         data = segment.data
+        expected_seq = self.peer_seq_num + 1
         
         self.bytes_received += len(data)
         
@@ -510,19 +850,86 @@ class SimpleTCPSocket:
         # Entregar dados em ordem à aplicação
         self._deliver_in_order_data()
         
-        # Enviar ACK
-        self.ack_num = segment.seq_num + len(data)
-        ack_segment = TCPSegment(
-            src_port=self.port,
-            dst_port=segment.src_port,
-            seq_num=self.seq_num,
-            ack_num=self.ack_num,
-            flags=TCPSegment.FLAG_ACK,
-            window_size=self.recv_window
-        )
+        # Confirmar apenas o prefixo entregue em ordem: um ACK cobrindo
+        # segmento além de um buraco faria o emissor descartar o segmento
+        # perdido do buffer e ele nunca seria retransmitido. Segmento
+        # fora de ordem ou duplicado é sinal de perda e recebe ACK
+        # imediato (alimenta o Fast Retransmit do emissor); o caso em
+        # ordem pode ser atrasado/agrupado
+        self.ack_num = self.peer_seq_num + 1
+        self._schedule_ack(immediate = (seq_num != expected_seq))
+    
+    def _schedule_ack(self, immediate = False):
+        """Agenda (ou dispara) o ACK cumulativo do que já foi recebido"""
+        with self._ack_lock:
+            self._pending_ack = True
+            self._segs_since_ack += 1
+            
+            if immediate or self._segs_since_ack >= 2:
+                self._flush_ack_locked()
+            elif self._delayed_ack_timer is None:
+                self._delayed_ack_timer = call_later(0.04, self._flush_ack)
+    
+    def _flush_ack(self):
+        """Envia o ACK pendente, se houver"""
+        with self._ack_lock:
+            self._flush_ack_locked()
+    
+    def _flush_ack_locked(self):
+        """Versão interna de _flush_ack; chamar com _ack_lock retido"""
+        if self._delayed_ack_timer is not None:
+            self._delayed_ack_timer.cancel()
+            self._delayed_ack_timer = None
+        
+        if not self._pending_ack:
+            return
         
-        self.logger.send(f"{ack_segment}")
-        self._send_segment(ack_segment)
+        self._pending_ack = False
+        self._segs_since_ack = 0
+        self._send_pure_ack()
+    
+    def _cancel_pending_ack(self):
+        """
+        Descarta o ACK pendente: o próximo segmento de saída (dados, ACK
+        de controle ou FIN) já carrega o ack_num cumulativo de carona
+        """
+        with self._ack_lock:
+            if self._delayed_ack_timer is not None:
+                self._delayed_ack_timer.cancel()
+                self._delayed_ack_timer = None
+            self._pending_ack = False
+            self._segs_since_ack = 0
+    
+    def _send_pure_ack(self):
+        """
+        Envia um ACK puro sem construir um TCPSegment
+        
+        O cabeçalho de 18 bytes tem formato fixo para ACKs puros: portas,
+        flags e janela não mudam entre envios. O template é montado uma
+        vez e cada ACK só reescreve seq/ack (pack_into) e o checksum,
+        evitando a criação do objeto e a serialização completa no caminho
+        mais quente do receptor.
+        """
+        buf = self._ack_template
+        if buf is None:
+            buf = self._ack_template = bytearray(18)
+            struct.pack_into('!HHIIBBH', buf, 0,
+                             self.port, self.peer_address[1], 0, 0,
+                             5, TCPSegment.FLAG_ACK, self.recv_window)
+        
+        struct.pack_into('!II', buf, 4, self.seq_num, self.ack_num)
+        # O checksum cobre o cabeçalho sem o próprio campo (dados vazios)
+        struct.pack_into('!H', buf, 16, zlib.crc32(buf[:16]) & 0xFFFF)
+        
+        self.logger.send("[TCP | %d->%d | Seq:%d Ack:%d | Flags:ACK | "
+                         "Win:%d | Len:0]", self.port,
+                         self.peer_address[1], self.seq_num, self.ack_num,
+                         self.recv_window)
+        
+        if self.channel:
+            self.channel.send(bytes(buf), self.udp_socket, self.peer_address)
+        else:
+            self.udp_socket.sendto(buf, self.peer_address)
     
     def _deliver_in_order_data(self):
         """Entrega dados em ordem à aplicação"""
@@ -531,9 +938,10 @@ class SimpleTCPSocket:
             
             while expected_seq in self.recv_buffer:
                 data = self.recv_buffer.pop(expected_seq)
-                
-                with self.app_data_lock:
-                    self.app_data.append(data)
+
+                with self._app_data_cv:
+                    self.app_data += data
+                    self._app_data_cv.notify()
                 
                 expected_seq += len(data)
                 self.peer_seq_num = expected_seq - 1
@@ -544,17 +952,45 @@ class SimpleTCPSocket:
         self.send_window = segment.window_size
         
         with self.buffer_lock:
-            # Marcar segmentos como confirmados
-            for entry in self.send_buffer:
-                if not entry['acked'] and entry['seq'] < ack_num:
-                    entry['acked'] = True
-                    
-                    # Atualizar estimativa de RTT
-                    rtt_sample = time.time() - entry['time']
+            # Fast Retransmit: o 3º ACK duplicado (puro, sem dados)
+            # indica que o segmento em ack_num se perdeu mas os
+            # seguintes chegaram; retransmitir já, sem esperar o RTO
+            if ack_num == self._last_ack and not segment.data:
+                self._dup_ack_count += 1
+                if self._dup_ack_count == 3:
+                    for entry in self.send_buffer:
+                        if entry['seq'] == ack_num:
+                            self.logger.retransmit(
+                                "FAST RETRANSMIT: %s", entry['segment'])
+                            self._send_segment(entry['segment'])
+                            self.retransmissions += 1
+                            entry['retransmitted'] = True
+                            break
+            elif ack_num > self._last_ack:
+                self._last_ack = ack_num
+                self._dup_ack_count = 0
+            
+            # ACK cumulativo: remover confirmados da esquerda do deque
+            # (relógio monotônico amostrado uma vez para o lote inteiro;
+            # RTT é um delta, então monotonic é o relógio correto aqui)
+            now = time.monotonic()
+            freed = 0
+            while self.send_buffer and self.send_buffer[0]['seq'] < ack_num:
+                entry = self.send_buffer.popleft()
+                freed += len(entry['data'])
+
+                # Algoritmo de Karn: a amostra de RTT de um segmento
+                # retransmitido é ambígua (o ACK pode ser da primeira
+                # transmissão) e não entra na estimativa
+                if not entry['retransmitted']:
+                    rtt_sample = now - entry['time']
                     self._update_rtt(rtt_sample)
+                    with self.rtt_lock:
+                        self._rto_backoff = 1
             
-            # Remover segmentos confirmados
-            self.send_buffer = [e for e in self.send_buffer if not e['acked']]
+            if freed:
+                self._unacked_bytes -= freed
+                self._window_cv.notify_all()
         
         # Parar timer se tudo foi confirmado
         if not self.send_buffer:
@@ -573,9 +1009,10 @@ class SimpleTCPSocket:
             self.udp_socket.sendto(segment_bytes, self.peer_address)
     
     def _calculate_timeout(self):
-        """Calcula timeout baseado em RTT"""
+        """Calcula timeout baseado em RTT (com backoff exponencial e teto)"""
         with self.rtt_lock:
-            return self.estimated_rtt + 4 * self.dev_rtt
+            return min((self.estimated_rtt + 4 * self.dev_rtt)
+                       * self._rto_backoff, self._max_rto)
     
     def _update_rtt(self, sample_rtt):
         """Atualiza estimativa de RTT"""
@@ -588,32 +1025,31 @@ class SimpleTCPSocket:
         with self.timer_lock:
             if self.timer is None and self.send_buffer:
                 timeout = self._calculate_timeout()
-                self.timer = threading.Timer(timeout, self._on_retransmit_timeout)
-                self.timer.daemon = True
-                self.timer.start()
+                self.timer = call_later(timeout, self._on_retransmit_timeout)
     
     def _on_retransmit_timeout(self):
         """Callback de timeout - retransmite segmentos não confirmados"""
         self.logger.timeout("Retransmitindo segmentos não confirmados")
         
         with self.buffer_lock:
+            # Tudo que ainda está no deque segue sem confirmação
+            now = time.monotonic()
             for entry in self.send_buffer:
-                if not entry['acked']:
-                    self.logger.retransmit(f"{entry['segment']}")
-                    self._send_segment(entry['segment'])
-                    self.retransmissions += 1
-                    entry['time'] = time.time()
+                self.logger.retransmit("%s", entry['segment'])
+                self._send_segment(entry['segment'])
+                self.retransmissions += 1
+                entry['retransmitted'] = True
+                entry['time'] = now
+        
+        # Backoff exponencial: cada estouro consecutivo dobra o RTO
+        with self.rtt_lock:
+            self._rto_backoff *= 2
         
         # Reiniciar timer
         with self.timer_lock:
             self.timer = None
         self._start_retransmit_timer()
     
-    def _get_unacked_bytes(self):
-        """Retorna número de bytes não confirmados"""
-        with self.buffer_lock:
-            return sum(len(e['data']) for e in self.send_buffer if not e['acked'])
-    
     def get_statistics(self):
         """Retorna estatísticas da conexão"""
         elapsed = time.time() - self.start_time if self.start_time else 0
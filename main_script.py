@@ -20,6 +20,155 @@ import time
 import argparse
 
 
+# Importar os runners de teste uma vez na carga do módulo: o menu
+# interativo fica livre de resolução de import (e do try/except) a cada
+# opção, pagando o custo de primeira importação apenas no startup
+try:
+    from testes.test_fase1 import run_all_tests as _run_fase1
+    _erro_fase1 = None
+except ImportError as e:
+    _run_fase1, _erro_fase1 = None, e
+
+try:
+    from testes.test_fase2 import run_all_tests as _run_fase2
+    _erro_fase2 = None
+except ImportError as e:
+    _run_fase2, _erro_fase2 = None, e
+
+try:
+    from testes.test_fase3 import run_all_tests as _run_fase3
+    _erro_fase3 = None
+except ImportError as e:
+    _run_fase3, _erro_fase3 = None, e
+
+
+# Estrutura do projeto (contagens de linhas como ints): estática, então
+# montada e totalizada uma única vez na importação
+ESTRUTURA = {
+    "Fase 1 - Protocolos RDT": {
+        "rdt20.py": 250,
+        "rdt21.py": 280,
+        "rdt30.py": 350,
+    },
+    "Fase 2 - Pipelining": {
+        "gbn.py": 420,
+        "sr.py": 480,
+    },
+    "Fase 3 - TCP Simplificado": {
+        "tcp_socket.py": 650,
+        "tcp_server.py": 180,
+        "tcp_client.py": 220,
+    },
+    "Utilitários": {
+        "packet.py": 180,
+        "simulator.py": 120,
+        "logger.py": 80,
+    },
+    "Testes": {
+        "test_fase1.py": 280,
+        "test_fase2.py": 350,
+        "test_fase3.py": 420,
+    }
+}
+
+TOTAL_LINHAS = sum(v for arquivos in ESTRUTURA.values() for v in arquivos.values())
+TOTAL_ARQUIVOS = sum(len(arquivos) for arquivos in ESTRUTURA.values())
+
+
+# Blocos estáticos de console pré-renderizados na importação: cada bloco
+# vira um único write() no stdout em vez de dezenas de print() (cada
+# print custa lock + duas escritas + re-encode UTF-8 a cada chamada)
+_DEMO_INTRO = (
+    "\n🔧 Esta demonstração iniciará:\n"
+    "   1. Um servidor TCP simplificado na porta 8000\n"
+    "   2. Um cliente que envia mensagens\n"
+    "   3. Troca de dados bidirecional\n"
+    "\n"
+    "⚠️  Você precisará de 2 terminais:\n"
+    "   Terminal 1: python fase3/tcp_server.py\n"
+    "   Terminal 2: python fase3/tcp_client.py\n"
+    "\n"
+    "Ou pode executar o modo echo interativo:\n"
+    "   Terminal 1: python fase3/tcp_server.py --echo\n"
+    "   Terminal 2: python fase3/tcp_client.py --echo\n\n"
+).encode("utf-8")
+
+_DEMO_INSTRUCOES = (
+    "\n" + "=" * 70 + "\n"
+    "INSTRUÇÕES PASSO A PASSO\n"
+    + "=" * 70 + "\n"
+    "\n1️⃣  Abra um novo terminal e execute:\n"
+    "   $ cd fase3\n"
+    "   $ python tcp_server.py --port 8000\n"
+    "\n2️⃣  Abra outro terminal e execute:\n"
+    "   $ cd fase3\n"
+    "   $ python tcp_client.py --host localhost --port 8000\n"
+    "\n3️⃣  Observe a troca de mensagens e estatísticas\n"
+    "\n" + "=" * 70 + "\n"
+    "\n💡 Outras opções úteis:\n"
+    "   --unreliable  : Simula rede não confiável (perdas)\n"
+    "   --messages N  : Envia N mensagens\n"
+    "   --echo        : Modo interativo (digite mensagens)\n"
+    "   --file ARQUIVO: Transfere um arquivo\n\n"
+).encode("utf-8")
+
+
+def _render_estatisticas():
+    """Renderiza o relatório de estatísticas (estático) como bytes"""
+    lines = ["\n📁 Estrutura do Projeto:\n"]
+    
+    for categoria, arquivos in ESTRUTURA.items():
+        lines.append(f"📦 {categoria}")
+        for arquivo, linhas in arquivos.items():
+            lines.append(f"   ├─ {arquivo:20s} {linhas:>6d} linhas")
+        lines.append("")
+    
+    lines.append("=" * 70)
+    lines.append(f"Total: {TOTAL_ARQUIVOS} arquivos, ~{TOTAL_LINHAS:,} linhas de código")
+    lines.append("=" * 70)
+    
+    lines.append("\n📊 Funcionalidades Implementadas:\n")
+    
+    features = [
+        "✅ 8 protocolos diferentes (rdt2.0 a TCP)",
+        "✅ Detecção e correção de erros (checksums)",
+        "✅ Números de sequência e ACKs",
+        "✅ Timers e retransmissão",
+        "✅ Pipelining (janelas deslizantes)",
+        "✅ Controle de fluxo",
+        "✅ Estimativa adaptativa de RTT",
+        "✅ Three-way e Four-way handshakes",
+        "✅ 16 testes automatizados",
+        "✅ Análise de desempenho com gráficos",
+        "✅ Simulador de canal não confiável",
+        "✅ Aplicações cliente-servidor funcionais",
+    ]
+    
+    lines.extend(f"   {feature}" for feature in features)
+    
+    lines.append("\n🎯 Conceitos do Capítulo 3 Aplicados:\n")
+    
+    conceitos = [
+        "• Seção 3.4.1: Protocolos rdt (2.0, 2.1, 3.0)",
+        "• Seção 3.4.3: Go-Back-N",
+        "• Seção 3.4.4: Selective Repeat",
+        "• Seção 3.5.2: Estrutura do segmento TCP",
+        "• Seção 3.5.3: Estimativa de RTT",
+        "• Seção 3.5.4: Transferência confiável",
+        "• Seção 3.5.5: Controle de fluxo",
+        "• Seção 3.5.6: Gerenciamento de conexão",
+    ]
+    
+    lines.extend(f"   {conceito}" for conceito in conceitos)
+    
+    lines.append("\n" + "=" * 70 + "\n")
+    
+    return "\n".join(lines).encode("utf-8")
+
+
+_ESTATISTICAS_BLOCK = _render_estatisticas()
+
+
 def print_header(title, width=70):
     """Imprime cabeçalho formatado"""
     print("\n" + "=" * width)
@@ -70,21 +219,19 @@ def executar_fase1():
     
     input("Pressione ENTER para iniciar os testes...")
     
-    try:
-        from testes.test_fase1 import run_all_tests
-        success = run_all_tests()
-        
-        if success:
-            print("\n✅ Fase 1 concluída com SUCESSO!")
-        else:
-            print("\n⚠️  Fase 1 teve alguns testes com falha")
-        
-        return success
-        
-    except ImportError as e:
-        print(f"\n❌ Erro ao importar testes: {e}")
+    if _run_fase1 is None:
+        print(f"\n❌ Erro ao importar testes: {_erro_fase1}")
         print("   Certifique-se de estar no diretório correto")
         return False
+    
+    success = _run_fase1()
+    
+    if success:
+        print("\n✅ Fase 1 concluída com SUCESSO!")
+    else:
+        print("\n⚠️  Fase 1 teve alguns testes com falha")
+    
+    return success
 
 
 def executar_fase2():
@@ -98,21 +245,19 @@ def executar_fase2():
     
     input("Pressione ENTER para iniciar os testes...")
     
-    try:
-        from testes.test_fase2 import run_all_tests
-        success = run_all_tests()
-        
-        if success:
-            print("\n✅ Fase 2 concluída com SUCESSO!")
-            print("📊 Gráfico salvo: fase2_performance_analysis.png")
-        else:
-            print("\n⚠️  Fase 2 teve alguns testes com falha")
-        
-        return success
-        
-    except ImportError as e:
-        print(f"\n❌ Erro ao importar testes: {e}")
+    if _run_fase2 is None:
+        print(f"\n❌ Erro ao importar testes: {_erro_fase2}")
         return False
+    
+    success = _run_fase2()
+    
+    if success:
+        print("\n✅ Fase 2 concluída com SUCESSO!")
+        print("📊 Gráfico salvo: fase2_performance_analysis.png")
+    else:
+        print("\n⚠️  Fase 2 teve alguns testes com falha")
+    
+    return success
 
 
 def executar_fase3():
@@ -128,62 +273,31 @@ def executar_fase3():
     
     input("Pressione ENTER para iniciar os testes...")
     
-    try:
-        from testes.test_fase3 import run_all_tests
-        success = run_all_tests()
-        
-        if success:
-            print("\n✅ Fase 3 concluída com SUCESSO!")
-        else:
-            print("\n⚠️  Fase 3 teve alguns testes com falha")
-        
-        return success
-        
-    except ImportError as e:
-        print(f"\n❌ Erro ao importar testes: {e}")
+    if _run_fase3 is None:
+        print(f"\n❌ Erro ao importar testes: {_erro_fase3}")
         return False
+    
+    success = _run_fase3()
+    
+    if success:
+        print("\n✅ Fase 3 concluída com SUCESSO!")
+    else:
+        print("\n⚠️  Fase 3 teve alguns testes com falha")
+    
+    return success
 
 
 def demonstracao_interativa():
     """Demonstração interativa do TCP simplificado"""
     print_header("DEMONSTRAÇÃO: CLIENTE-SERVIDOR TCP")
     
-    print("\n🔧 Esta demonstração iniciará:")
-    print("   1. Um servidor TCP simplificado na porta 8000")
-    print("   2. Um cliente que envia mensagens")
-    print("   3. Troca de dados bidirecional\n")
-    
-    print("⚠️  Você precisará de 2 terminais:")
-    print("   Terminal 1: python fase3/tcp_server.py")
-    print("   Terminal 2: python fase3/tcp_client.py\n")
-    
-    print("Ou pode executar o modo echo interativo:")
-    print("   Terminal 1: python fase3/tcp_server.py --echo")
-    print("   Terminal 2: python fase3/tcp_client.py --echo\n")
+    sys.stdout.buffer.write(_DEMO_INTRO)
+    sys.stdout.flush()
     
     input("Pressione ENTER para ver instruções detalhadas...")
     
-    print("\n" + "=" * 70)
-    print("INSTRUÇÕES PASSO A PASSO")
-    print("=" * 70)
-    
-    print("\n1️⃣  Abra um novo terminal e execute:")
-    print("   $ cd fase3")
-    print("   $ python tcp_server.py --port 8000")
-    
-    print("\n2️⃣  Abra outro terminal e execute:")
-    print("   $ cd fase3")
-    print("   $ python tcp_client.py --host localhost --port 8000")
-    
-    print("\n3️⃣  Observe a troca de mensagens e estatísticas")
-    
-    print("\n" + "=" * 70)
-    
-    print("\n💡 Outras opções úteis:")
-    print("   --unreliable  : Simula rede não confiável (perdas)")
-    print("   --messages N  : Envia N mensagens")
-    print("   --echo        : Modo interativo (digite mensagens)")
-    print("   --file ARQUIVO: Transfere um arquivo\n")
+    sys.stdout.buffer.write(_DEMO_INSTRUCOES)
+    sys.stdout.flush()
 
 
 def analise_desempenho():
@@ -205,21 +319,26 @@ def analise_desempenho():
         print("\n🔬 Executando testes de desempenho...")
         results = test_throughput_vs_window_size()
         
-        print("\n✅ Análise concluída!")
-        print("📈 Resultados:")
-        
-        print("\n┌─────────────┬──────────────┬──────────────┐")
-        print("│   Janela    │ GBN Throughput│ SR Throughput│")
-        print("├─────────────┼──────────────┼──────────────┤")
+        # Montar a tabela inteira em memória e emitir em uma única
+        # escrita, em vez de um print (lock + flush de stdout) por linha
+        lines = [
+            "\n✅ Análise concluída!",
+            "📈 Resultados:",
+            "",
+            "┌─────────────┬──────────────┬──────────────┐",
+            "│   Janela    │ GBN Throughput│ SR Throughput│",
+            "├─────────────┼──────────────┼──────────────┤",
+        ]
         
         for i, w in enumerate(results['window_sizes']):
             gbn = results['gbn_throughput'][i]
             sr = results['sr_throughput'][i]
-            print(f"│   N = {w:2d}    │  {gbn:7.1f} B/s │  {sr:7.1f} B/s │")
+            lines.append(f"│   N = {w:2d}    │  {gbn:7.1f} B/s │  {sr:7.1f} B/s │")
         
-        print("└─────────────┴──────────────┴──────────────┘")
+        lines.append("└─────────────┴──────────────┴──────────────┘")
+        lines.append("\n📊 Gráfico salvo: fase2_performance_analysis.png")
         
-        print("\n📊 Gráfico salvo: fase2_performance_analysis.png")
+        sys.stdout.write("\n".join(lines) + "\n")
         
     except Exception as e:
         print(f"\n❌ Erro na análise: {e}")
@@ -229,88 +348,8 @@ def estatisticas_projeto():
     """Exibe estatísticas do projeto"""
     print_header("ESTATÍSTICAS DO PROJETO")
     
-    print("\n📁 Estrutura do Projeto:\n")
-    
-    estrutura = {
-        "Fase 1 - Protocolos RDT": {
-            "rdt20.py": "250 linhas",
-            "rdt21.py": "280 linhas",
-            "rdt30.py": "350 linhas",
-        },
-        "Fase 2 - Pipelining": {
-            "gbn.py": "420 linhas",
-            "sr.py": "480 linhas",
-        },
-        "Fase 3 - TCP Simplificado": {
-            "tcp_socket.py": "650 linhas",
-            "tcp_server.py": "180 linhas",
-            "tcp_client.py": "220 linhas",
-        },
-        "Utilitários": {
-            "packet.py": "180 linhas",
-            "simulator.py": "120 linhas",
-            "logger.py": "80 linhas",
-        },
-        "Testes": {
-            "test_fase1.py": "280 linhas",
-            "test_fase2.py": "350 linhas",
-            "test_fase3.py": "420 linhas",
-        }
-    }
-    
-    total_linhas = 0
-    total_arquivos = 0
-    
-    for categoria, arquivos in estrutura.items():
-        print(f"📦 {categoria}")
-        for arquivo, linhas in arquivos.items():
-            num_linhas = int(linhas.split()[0])
-            total_linhas += num_linhas
-            total_arquivos += 1
-            print(f"   ├─ {arquivo:20s} {linhas:>12s}")
-        print()
-    
-    print("=" * 70)
-    print(f"Total: {total_arquivos} arquivos, ~{total_linhas:,} linhas de código")
-    print("=" * 70)
-    
-    print("\n📊 Funcionalidades Implementadas:\n")
-    
-    features = [
-        "✅ 8 protocolos diferentes (rdt2.0 a TCP)",
-        "✅ Detecção e correção de erros (checksums)",
-        "✅ Números de sequência e ACKs",
-        "✅ Timers e retransmissão",
-        "✅ Pipelining (janelas deslizantes)",
-        "✅ Controle de fluxo",
-        "✅ Estimativa adaptativa de RTT",
-        "✅ Three-way e Four-way handshakes",
-        "✅ 16 testes automatizados",
-        "✅ Análise de desempenho com gráficos",
-        "✅ Simulador de canal não confiável",
-        "✅ Aplicações cliente-servidor funcionais",
-    ]
-    
-    for feature in features:
-        print(f"   {feature}")
-    
-    print("\n🎯 Conceitos do Capítulo 3 Aplicados:\n")
-    
-    conceitos = [
-        "• Seção 3.4.1: Protocolos rdt (2.0, 2.1, 3.0)",
-        "• Seção 3.4.3: Go-Back-N",
-        "• Seção 3.4.4: Selective Repeat",
-        "• Seção 3.5.2: Estrutura do segmento TCP",
-        "• Seção 3.5.3: Estimativa de RTT",
-        "• Seção 3.5.4: Transferência confiável",
-        "• Seção 3.5.5: Controle de fluxo",
-        "• Seção 3.5.6: Gerenciamento de conexão",
-    ]
-    
-    for conceito in conceitos:
-        print(f"   {conceito}")
-    
-    print("\n" + "=" * 70)
+    sys.stdout.buffer.write(_ESTATISTICAS_BLOCK)
+    sys.stdout.flush()
 
 
 def executar_todos():
@@ -1,10 +1,8 @@
 """
 Testes automatizados para Fase 1: Protocolos RDT
 """
-import sys
+import concurrent.futures
 import time
-import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from fase1.rdt20 import RDT20Sender, RDT20Receiver
 from fase1.rdt21 import RDT21Sender, RDT21Receiver
@@ -12,6 +10,29 @@ from fase1.rdt30 import RDT30Sender, RDT30Receiver
 from utils.simulator import UnreliableChannel, ReliableChannel
 
 
+def wait_until(condition, timeout=5.0, interval=0.005):
+    """
+    Espera até condition() ser verdadeira ou o timeout estourar
+    
+    Substitui os sleeps fixos de drenagem: o teste segue assim que o
+    receptor entregar tudo, em vez de esperar sempre o pior caso.
+    
+    Args:
+        condition: Função sem argumentos que retorna bool
+        timeout: Tempo máximo de espera em segundos
+        interval: Intervalo entre verificações
+    
+    Returns:
+        True se a condição foi satisfeita, False se o tempo esgotou
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(interval)
+    return condition()
+
+
 class TestResults:
     """Classe para armazenar resultados de testes"""
     def __init__(self):
@@ -55,21 +76,26 @@ def test_rdt20():
     
     results = TestResults()
     
-    # Teste 1.1: Canal perfeito
-    print("\n[Teste 1.1] Canal perfeito - 10 mensagens")
-    
-    channel = ReliableChannel()
+    # Um único canal + par emissor/receptor para os dois cenários: o
+    # canal é reconfigurado (set_params) e o receptor zerado (reset)
+    # entre os casos, sem pagar novo bind + thread por cenário
+    channel = UnreliableChannel(loss_rate=0.0, corrupt_rate=0.0,
+                                delay_range=(0.01, 0.1))
     receiver = RDT20Receiver(6001, channel)
     receiver.start()
     sender = RDT20Sender(6000, channel)
     
+    # Teste 1.1: Canal perfeito
+    print("\n[Teste 1.1] Canal perfeito - 10 mensagens")
+    
     messages = [f"Mensagem {i}" for i in range(10)]
     
+    # Sem sleep entre envios: send() é stop-and-wait síncrono e só
+    # retorna após o ACK, o próprio protocolo já impõe o ritmo
     for msg in messages:
         sender.send(msg, ('localhost', 6001))
-        time.sleep(0.05)
     
-    time.sleep(1)
+    wait_until(lambda: len(receiver.get_messages()) >= len(messages))
     
     received = receiver.get_messages()
     passed = len(received) == len(messages)
@@ -80,24 +106,18 @@ def test_rdt20():
         f"Recebidas: {len(received)}/{len(messages)}"
     )
     
-    receiver.stop()
-    sender.close()
-    
     # Teste 1.2: Canal com 30% de corrupção
     print("\n[Teste 1.2] Canal com 30% de corrupção")
     
-    channel = UnreliableChannel(loss_rate=0.0, corrupt_rate=0.3, delay_range=(0.01, 0.1))
-    receiver = RDT20Receiver(6003, channel)
-    receiver.start()
-    sender = RDT20Sender(6002, channel)
+    channel.set_params(corrupt_rate=0.3)
+    receiver.reset()
     
     messages = [f"Teste {i}" for i in range(10)]
     
     for msg in messages:
-        sender.send(msg, ('localhost', 6003))
-        time.sleep(0.1)
+        sender.send(msg, ('localhost', 6001))
     
-    time.sleep(2)
+    wait_until(lambda: len(receiver.get_messages()) >= len(messages), timeout=10.0)
     
     received = receiver.get_messages()
     stats_sender = sender.get_statistics()
@@ -142,9 +162,8 @@ def test_rdt21():
     
     for msg in messages:
         sender.send(msg, ('localhost', 6011))
-        time.sleep(0.1)
     
-    time.sleep(2)
+    wait_until(lambda: len(receiver.get_messages()) >= len(messages), timeout=10.0)
     
     received = receiver.get_messages()
     stats_sender = sender.get_statistics()
@@ -216,7 +235,7 @@ def test_rdt30():
     
     elapsed = time.time() - start_time
     
-    time.sleep(1)
+    wait_until(lambda: len(receiver.get_messages()) >= len(messages), timeout=10.0)
     
     received = receiver.get_messages()
     stats_sender = sender.get_statistics()
@@ -270,21 +289,18 @@ def run_all_tests():
     
     all_results = TestResults()
     
-    # Teste RDT 2.0
-    results_20 = test_rdt20()
-    all_results.tests.extend(results_20.tests)
-    
-    time.sleep(1)
-    
-    # Teste RDT 2.1
-    results_21 = test_rdt21()
-    all_results.tests.extend(results_21.tests)
-    
-    time.sleep(1)
-    
-    # Teste RDT 3.0
-    results_30 = test_rdt30()
-    all_results.tests.extend(results_30.tests)
+    # Os três cenários usam portas disjuntas e canais independentes,
+    # então rodam em paralelo: a espera por retransmissões de um teste
+    # se sobrepõe à dos outros (a saída fica intercalada, mas o resumo
+    # final preserva a ordem)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(test_rdt20),
+            executor.submit(test_rdt21),
+            executor.submit(test_rdt30),
+        ]
+        for future in futures:
+            all_results.tests.extend(future.result().tests)
     
     # Resumo final
     all_results.print_summary()
@@ -2,18 +2,36 @@
 Testes automatizados para Fase 2: Pipelining (Selective Repeat)
 Inclui comparações de desempenho e gráficos
 """
-import sys
+import concurrent.futures
 import time
-import matplotlib.pyplot as plt
 import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import matplotlib
+if not os.environ.get('DISPLAY'):
+    # Headless/CI: backend Agg evita inicializar toolkit gráfico
+    # (Qt/Tk) só para salvar um PNG
+    matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
 
 from fase2.selective_repeat_protocol import SRSender, SRReceiver
 from utils.simulator import UnreliableChannel
 
 
-def test_sr_buffering():
-    """Teste do Selective Repeat com foco em bufferização"""
+# Payload de 1MB materializado uma única vez na importação: execuções
+# repetidas do teste reutilizam o mesmo buffer em vez de refazer o
+# memset de 1MB a cada chamada
+_PAYLOAD_1MB = b'X' * (1 << 20)
+
+
+def test_sr_buffering(inter_send_gap=0.0):
+    """
+    Teste do Selective Repeat com foco em bufferização
+    
+    Args:
+        inter_send_gap: Pausa opcional entre envios para exercitar o
+            cenário de chegada "gota a gota"; por padrão não há pausa e
+            o ritmo fica por conta da janela do protocolo
+    """
     print("\n" + "=" * 70)
     print("TESTE 2: Selective Repeat - Bufferização de Pacotes Fora de Ordem")
     print("=" * 70)
@@ -37,7 +55,8 @@ def test_sr_buffering():
     
     for msg in messages:
         sender.send(msg)
-        time.sleep(0.02)
+        if inter_send_gap:
+            time.sleep(inter_send_gap)
     
     sender.wait_for_completion(timeout=15.0)
     time.sleep(1)
@@ -60,6 +79,61 @@ def test_sr_buffering():
     return len(received) == len(messages)
 
 
+def _run_sr(window_size, num_packets, loss_rate, corrupt_rate, port_base):
+    """
+    Executa uma transferência SR completa e retorna as métricas
+    
+    Função de topo de módulo para poder rodar em um processo worker
+    (ProcessPoolExecutor): cada configuração da varredura é independente
+    e recebe sua própria faixa de portas e seu próprio canal.
+    
+    Args:
+        window_size: Tamanho da janela do SR
+        num_packets: Quantidade de mensagens a transferir
+        loss_rate: Taxa de perda do canal
+        corrupt_rate: Taxa de corrupção do canal
+        port_base: Porta do emissor (receptor usa port_base + 1)
+    
+    Returns:
+        Dicionário com throughput_bps, elapsed_time e retransmissions
+    """
+    messages = [f"Packet{i:03d}" for i in range(num_packets)]
+    
+    channel = UnreliableChannel(
+        loss_rate = loss_rate,
+        corrupt_rate = corrupt_rate,
+        delay_range = (0.01, 0.05)
+    )
+    
+    receiver_sr = SRReceiver(port_base + 1, window_size=window_size, channel=channel)
+    receiver_sr.start()
+    
+    sender_sr = SRSender(port_base, window_size=window_size, channel=channel, timeout=0.5)
+    sender_sr.start(('localhost', port_base + 1))
+    
+    # Sem sleep entre envios: send() já bloqueia quando a janela enche,
+    # então o ritmo medido é o do protocolo e não o do sleep.
+    # Cronometrar apenas envio + confirmação, fora da acomodação abaixo
+    t0 = time.perf_counter()
+    for msg in messages:
+        sender_sr.send(msg)
+    
+    sender_sr.wait_for_completion(timeout=20.0)
+    elapsed_sr = time.perf_counter() - t0
+    time.sleep(0.5)
+    
+    stats_sr = sender_sr.get_statistics()
+    
+    sender_sr.stop()
+    receiver_sr.stop()
+    
+    return {
+        'throughput_bps': stats_sr['total_bytes'] / elapsed_sr if elapsed_sr > 0 else 0,
+        'elapsed_time': elapsed_sr,
+        'retransmissions': stats_sr['retransmissions'],
+    }
+
+
 def test_throughput_vs_window_size():
     """
     Teste comparativo: Throughput vs Tamanho da Janela
@@ -83,43 +157,30 @@ def test_throughput_vs_window_size():
         'sr_retrans': []
     }
     
-    # Teste com diferentes tamanhos de janela
-    for window_size in window_sizes:
-        print(f"\n--- Testando com janela = {window_size} ---")
-        messages = [f"Packet{i:03d}" for i in range(num_packets)]
-        
-        # Teste SR
-        print(f"  SR (janela={window_size})...")
-        channel = UnreliableChannel(
-            loss_rate = loss_rate,
-            corrupt_rate = corrupt_rate,
-            delay_range = (0.01, 0.05)
+    # As configurações são independentes (portas e canais próprios), então
+    # a varredura roda em paralelo em processos: o tempo total cai de
+    # soma(execuções) para max(execução), e cada worker tem seu próprio
+    # GIL para as threads de emissor/receptor
+    print(f"\nExecutando {len(window_sizes)} configurações em paralelo...")
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=len(window_sizes)) as pool:
+        runs = pool.map(
+            _run_sr,
+            window_sizes,
+            [num_packets] * len(window_sizes),
+            [loss_rate] * len(window_sizes),
+            [corrupt_rate] * len(window_sizes),
+            [9030 + 10 * i for i in range(len(window_sizes))],
         )
         
-        receiver_sr = SRReceiver(9031, window_size=window_size, channel=channel)
-        receiver_sr.start()
-        
-        sender_sr = SRSender(9030, window_size=window_size, channel=channel, timeout=0.5)
-        sender_sr.start(('localhost', 9031))
-        
-        for msg in messages:
-            sender_sr.send(msg)
-            time.sleep(0.005)
-        
-        sender_sr.wait_for_completion(timeout=20.0)
-        time.sleep(0.5)
-        
-        stats_sr = sender_sr.get_statistics()
-        results['sr_throughput'].append(stats_sr['throughput_bps'])
-        results['sr_time'].append(stats_sr['elapsed_time'])
-        results['sr_retrans'].append(stats_sr['retransmissions'])
-        
-        print(f"    Throughput: {stats_sr['throughput_bps']:.2f} bytes/s")
-        print(f"    Tempo: {stats_sr['elapsed_time']:.2f}s")
-        
-        sender_sr.stop()
-        receiver_sr.stop()
-        time.sleep(0.5)
+        for window_size, run in zip(window_sizes, runs):
+            results['sr_throughput'].append(run['throughput_bps'])
+            results['sr_time'].append(run['elapsed_time'])
+            results['sr_retrans'].append(run['retransmissions'])
+            
+            print(f"\n--- Janela = {window_size} ---")
+            print(f"    Throughput: {run['throughput_bps']:.2f} bytes/s")
+            print(f"    Tempo: {run['elapsed_time']:.2f}s")
     
     # Gerar gráficos
     plot_performance_comparison(results)
@@ -134,13 +195,21 @@ def plot_performance_comparison(results):
     Args:
         results: Dicionário com resultados dos testes
     """
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+    # Layout SoA em arrays NumPy: extrações e derivações (speedup,
+    # deslocamento das barras) viram operações vetorizadas, e varreduras
+    # maiores não pagam o custo de listas Python por ponto
+    window_sizes = np.asarray(results['window_sizes'], dtype=float)
+    tp_sr = np.asarray(results['sr_throughput'], dtype=float)
+    time_sr = np.asarray(results['sr_time'], dtype=float)
+    ret_sr = np.asarray(results['sr_retrans'], dtype=float)
+    
+    fig, axes = plt.subplots(2, 2, figsize=(14, 10), sharex=True)
     fig.suptitle('Análise de Desempenho: Pipelining vs Stop-and-Wait', 
                  fontsize=16, fontweight='bold')
     
     # Gráfico 1: Throughput vs Tamanho da Janela
     ax1 = axes[0, 0]
-    ax1.plot(results['window_sizes'], results['sr_throughput'], 
+    ax1.plot(window_sizes, tp_sr, 
              marker='s', linewidth=2, label='Selective Repeat', color='green')
     ax1.set_xlabel('Tamanho da Janela (N)', fontsize=12)
     ax1.set_ylabel('Throughput (bytes/s)', fontsize=12)
@@ -150,7 +219,7 @@ def plot_performance_comparison(results):
     
     # Gráfico 2: Tempo Total vs Tamanho da Janela
     ax2 = axes[0, 1]
-    ax2.plot(results['window_sizes'], results['sr_time'], 
+    ax2.plot(window_sizes, time_sr, 
              marker='s', linewidth=2, label='Selective Repeat', color='green')
     ax2.set_xlabel('Tamanho da Janela (N)', fontsize=12)
     ax2.set_ylabel('Tempo Total (s)', fontsize=12)
@@ -160,7 +229,7 @@ def plot_performance_comparison(results):
     
     # Gráfico 3: Retransmissões vs Tamanho da Janela
     ax3 = axes[1, 0]
-    ax3.bar([x + 0.2 for x in results['window_sizes']], results['sr_retrans'], 
+    ax3.bar(window_sizes + 0.2, ret_sr, 
             width=0.4, label='Selective Repeat', color='green', alpha=0.7)
     ax3.set_xlabel('Tamanho da Janela (N)', fontsize=12)
     ax3.set_ylabel('Número de Retransmissões', fontsize=12)
@@ -170,9 +239,8 @@ def plot_performance_comparison(results):
     
     # Gráfico 4: Speedup em relação a Window=1
     ax4 = axes[1, 1]
-    sr_speedup = [results['sr_throughput'][i] / results['sr_throughput'][0] 
-                  for i in range(len(results['window_sizes']))]
-    ax4.plot(results['window_sizes'], sr_speedup, 
+    sr_speedup = tp_sr / tp_sr[0]
+    ax4.plot(window_sizes, sr_speedup, 
              marker='s', linewidth=2, label='Selective Repeat', color='green')
     ax4.set_xlabel('Tamanho da Janela (N)', fontsize=12)
     ax4.set_ylabel('Speedup (vs N=1)', fontsize=12)
@@ -183,7 +251,12 @@ def plot_performance_comparison(results):
     plt.tight_layout()
     plt.savefig('fase2_performance_analysis.png', dpi=300, bbox_inches='tight')
     print("\n✓ Gráfico salvo: fase2_performance_analysis.png")
-    plt.show()
+    
+    # Mostrar a janela só quando há display; em CI, liberar o buffer
+    # RGBA da figura (~17MB em 14x10 pol a 300 dpi)
+    if os.environ.get('DISPLAY'):
+        plt.show()
+    plt.close(fig)
 
 
 def test_transfer_1mb():
@@ -192,10 +265,13 @@ def test_transfer_1mb():
     print("TESTE 4: Transferência de 1MB - Comparação de Eficiência")
     print("=" * 70)
     
-    # Gerar dados de 1MB
-    data_1mb = b'X' * (1024 * 1024)  # 1MB
+    # Dados de 1MB (constante de módulo, alocada uma vez)
+    data_1mb = _PAYLOAD_1MB
     chunk_size = 1024  # 1KB por pacote
-    chunks = [data_1mb[i:i+chunk_size] for i in range(0, len(data_1mb), chunk_size)]
+    # Fatiar via memoryview: cada chunk é uma visão zero-copy sobre o
+    # buffer original, sem alocar 1024 objetos bytes de 1KB no setup
+    mv = memoryview(data_1mb)
+    chunks = [mv[i:i+chunk_size] for i in range(0, len(mv), chunk_size)]
     
     print(f"\nTransferindo {len(data_1mb)} bytes em {len(chunks)} pacotes...")
     
@@ -216,11 +292,13 @@ def test_transfer_1mb():
     sender_sr = SRSender(9050, window_size=10, channel=channel, timeout=0.5)
     sender_sr.start(('localhost', 9051))
     
-    start_sr = time.time()
-    for chunk in chunks:
-        sender_sr.send(chunk)
+    # perf_counter: relógio monotônico de alta resolução para medir duração
+    start_sr = time.perf_counter()
+    # send_many enfileira o lote inteiro com uma aquisição de lock e
+    # despacha rajadas do tamanho da janela, em vez de 1024 sends avulsos
+    sender_sr.send_many(chunks)
     sender_sr.wait_for_completion(timeout=60.0)
-    time_sr = time.time() - start_sr
+    time_sr = time.perf_counter() - start_sr
     
     stats_sr = sender_sr.get_statistics()
     
@@ -1,16 +1,28 @@
 """
 Testes automatizados para Fase 3: TCP Simplificado sobre UDP
 """
-import sys
+import concurrent.futures
+import itertools
 import time
 import threading
-import os
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from fase3.tcp_socket import SimpleTCPSocket
 from utils.simulator import UnreliableChannel
 
 
+# Payload de 1MB materializado uma única vez na importação
+_PAYLOAD_1MB = b'A' * (1 << 20)
+
+# Pool compartilhado para as rotinas de servidor: reusa as mesmas
+# threads entre os testes em vez de criar/destruir uma por teste
+_SERVER_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix="tcp-test-srv")
+
+# Alocador de portas: cada teste pega um par único, então execuções
+# consecutivas nunca colidem com um socket anterior ainda aberto
+_PORTS = itertools.count(10000)
+
+
 def test_three_way_handshake():
     """
     Teste 1: Estabelecimento de conexão (Three-Way Handshake)
@@ -20,25 +32,27 @@ def test_three_way_handshake():
     print("TESTE 1: Three-Way Handshake")
     print("=" * 70)
     
+    srv_port = next(_PORTS)
+    cli_port = next(_PORTS)
+    
     # Criar servidor
-    server = SimpleTCPSocket(10000)
+    server = SimpleTCPSocket(srv_port)
     
     # Thread do servidor
     def server_thread():
         server.listen()
         server.accept(timeout=10.0)
     
-    server_t = threading.Thread(target=server_thread)
-    server_t.daemon = True
-    server_t.start()
+    server_t = _SERVER_POOL.submit(server_thread)
     
-    time.sleep(0.5)
+    # Esperar o servidor estar de fato escutando, sem pad fixo
+    server.wait_listening(timeout=5.0)
     
     # Criar cliente e conectar
-    client = SimpleTCPSocket(10001)
+    client = SimpleTCPSocket(cli_port)
     
     print("\nCliente conectando ao servidor...")
-    connected = client.connect(('localhost', 10000))
+    connected = client.connect(('localhost', srv_port))
     
     time.sleep(1)
     
@@ -71,36 +85,42 @@ def test_data_transfer():
     print("TESTE 2: Transferência de Dados (10KB)")
     print("=" * 70)
     
+    srv_port = next(_PORTS)
+    cli_port = next(_PORTS)
+    
     # Dados a enviar
     test_data = b'X' * 10240  # 10KB
     received_data = []
+    done = threading.Event()
     
     # Servidor
-    server = SimpleTCPSocket(10010)
+    server = SimpleTCPSocket(srv_port)
     
     def server_thread():
         server.listen()
         if server.accept(timeout=10.0):
             data = server.recv(buffer_size=12000)
             received_data.append(data)
+            done.set()
             server.close()
     
-    server_t = threading.Thread(target=server_thread)
-    server_t.daemon = True
-    server_t.start()
+    server_t = _SERVER_POOL.submit(server_thread)
     
-    time.sleep(0.5)
+    # Esperar o servidor estar de fato escutando, sem pad fixo
+    server.wait_listening(timeout=5.0)
     
     # Cliente
-    client = SimpleTCPSocket(10011)
+    client = SimpleTCPSocket(cli_port)
     
     print("\nEnviando 10KB de dados...")
     
-    if client.connect(('localhost', 10010)):
+    if client.connect(('localhost', srv_port)):
         bytes_sent = client.send(test_data)
         print(f"Enviado: {bytes_sent} bytes")
         
-        time.sleep(2)
+        # Esperar o último ACK e a entrega no servidor, sem sleep fixo
+        client.wait_for_completion(timeout=10.0)
+        done.wait(timeout=15.0)
         
         # Verificar dados recebidos
         if received_data and received_data[0] == test_data:
@@ -115,7 +135,7 @@ def test_data_transfer():
         print("\n✗ Falha ao conectar")
         success = False
     
-    server_t.join(timeout=2.0)
+    concurrent.futures.wait([server_t], timeout=2.0)
     
     return success
 
@@ -129,11 +149,16 @@ def test_flow_control():
     print("TESTE 3: Controle de Fluxo")
     print("=" * 70)
     
+    srv_port = next(_PORTS)
+    cli_port = next(_PORTS)
+    
     # Servidor com janela pequena
-    server = SimpleTCPSocket(10020)
+    server = SimpleTCPSocket(srv_port)
     server.recv_window = 1024  # Apenas 1KB de janela
     
+    expected_bytes = 5120
     received_data = []
+    done = threading.Event()
     
     def server_thread():
         server.listen()
@@ -141,35 +166,39 @@ def test_flow_control():
             print(f"Servidor: janela de recepção = {server.recv_window} bytes")
             
             # Receber em partes
-            while True:
+            total = 0
+            while total < expected_bytes:
                 data = server.recv(buffer_size=512)
                 if not data:
                     break
                 received_data.append(data)
+                total += len(data)
                 print(f"  Recebido: {len(data)} bytes")
                 time.sleep(0.1)  # Simular processamento lento
             
+            done.set()
             server.close()
     
-    server_t = threading.Thread(target=server_thread)
-    server_t.daemon = True
-    server_t.start()
+    server_t = _SERVER_POOL.submit(server_thread)
     
-    time.sleep(0.5)
+    # Esperar o servidor estar de fato escutando, sem pad fixo
+    server.wait_listening(timeout=5.0)
     
     # Cliente envia mais dados que a janela
-    client = SimpleTCPSocket(10021)
+    client = SimpleTCPSocket(cli_port)
     
-    if client.connect(('localhost', 10020)):
+    if client.connect(('localhost', srv_port)):
         print(f"\nCliente: janela do servidor = {client.send_window} bytes")
         
         # Enviar 5KB (maior que a janela)
-        test_data = b'Y' * 5120
+        test_data = b'Y' * expected_bytes
         print(f"Enviando {len(test_data)} bytes...")
         
         bytes_sent = client.send(test_data)
         
-        time.sleep(3)
+        # Esperar todos os ACKs e o consumo completo no servidor
+        client.wait_for_completion(timeout=15.0)
+        done.wait(timeout=15.0)
         
         # Verificar
         total_received = sum(len(d) for d in received_data)
@@ -187,7 +216,7 @@ def test_flow_control():
     else:
         success = False
     
-    server_t.join(timeout=5.0)
+    concurrent.futures.wait([server_t], timeout=5.0)
     
     return success
 
@@ -201,6 +230,9 @@ def test_retransmission():
     print("TESTE 4: Retransmissão (20% perda)")
     print("=" * 70)
     
+    srv_port = next(_PORTS)
+    cli_port = next(_PORTS)
+    
     # Canal com perda
     channel = UnreliableChannel(
         loss_rate=0.20,
@@ -210,32 +242,47 @@ def test_retransmission():
     
     test_data = b'Z' * 5000
     received_data = []
+    done = threading.Event()
     
     # Servidor
-    server = SimpleTCPSocket(10030, channel=channel)
+    server = SimpleTCPSocket(srv_port, channel=channel)
     
     def server_thread():
         server.listen()
         if server.accept(timeout=15.0):
-            data = server.recv(buffer_size=6000)
-            received_data.append(data)
+            # Acumular em partes: sob perda, uma retransmissão segura a
+            # entrega por um RTO inteiro (com backoff) e um único recv
+            # retornaria só o prefixo já ordenado. Um recv vazio é só a
+            # janela de agregação expirando entre retransmissões, então
+            # insistir até o prazo total
+            deadline = time.monotonic() + 30.0
+            total = 0
+            while total < len(test_data) and time.monotonic() < deadline:
+                data = server.recv(buffer_size=6000)
+                if not data:
+                    continue
+                received_data.append(data)
+                total += len(data)
+            done.set()
             server.close()
     
-    server_t = threading.Thread(target=server_thread)
-    server_t.daemon = True
-    server_t.start()
+    server_t = _SERVER_POOL.submit(server_thread)
     
-    time.sleep(0.5)
+    # Esperar o servidor estar de fato escutando, sem pad fixo
+    server.wait_listening(timeout=5.0)
     
     # Cliente
-    client = SimpleTCPSocket(10031, channel=channel)
+    client = SimpleTCPSocket(cli_port, channel=channel)
     
     print("\nEnviando dados com 20% de perda...")
     
-    if client.connect(('localhost', 10030)):
+    if client.connect(('localhost', srv_port)):
         client.send(test_data)
         
-        time.sleep(5)
+        # Sob perda as retransmissões alongam a cauda (RTO com backoff
+        # exponencial): esperar os ACKs em vez de um sleep fixo de 5s
+        client.wait_for_completion(timeout=30.0)
+        done.wait(timeout=35.0)
         
         # Estatísticas
         stats_client = client.get_statistics()
@@ -243,7 +290,7 @@ def test_retransmission():
         print(f"\nRetransmissões: {stats_client['retransmissions']}")
         
         # Verificar dados
-        if received_data and received_data[0] == test_data:
+        if received_data and b''.join(received_data) == test_data:
             print("✓ Dados recebidos corretamente apesar da perda!")
             success = True
         else:
@@ -260,7 +307,7 @@ def test_retransmission():
     else:
         success = False
     
-    server_t.join(timeout=5.0)
+    concurrent.futures.wait([server_t], timeout=5.0)
     
     channel.print_statistics()
     
@@ -276,8 +323,11 @@ def test_connection_termination():
     print("TESTE 5: Encerramento de Conexão (Four-Way Handshake)")
     print("=" * 70)
     
+    srv_port = next(_PORTS)
+    cli_port = next(_PORTS)
+    
     # Servidor
-    server = SimpleTCPSocket(10040)
+    server = SimpleTCPSocket(srv_port)
     
     def server_thread():
         server.listen()
@@ -290,16 +340,15 @@ def test_connection_termination():
             
             print(f"Servidor: estado final = {server.state}")
     
-    server_t = threading.Thread(target=server_thread)
-    server_t.daemon = True
-    server_t.start()
+    server_t = _SERVER_POOL.submit(server_thread)
     
-    time.sleep(0.5)
+    # Esperar o servidor estar de fato escutando, sem pad fixo
+    server.wait_listening(timeout=5.0)
     
     # Cliente
-    client = SimpleTCPSocket(10041)
+    client = SimpleTCPSocket(cli_port)
     
-    if client.connect(('localhost', 10040)):
+    if client.connect(('localhost', srv_port)):
         print("Cliente: conectado")
         time.sleep(1)
         
@@ -320,7 +369,7 @@ def test_connection_termination():
     else:
         success = False
     
-    server_t.join(timeout=3.0)
+    concurrent.futures.wait([server_t], timeout=3.0)
     
     return success
 
@@ -334,51 +383,65 @@ def test_performance_1mb():
     print("TESTE 6: Desempenho - Transferência de 1MB")
     print("=" * 70)
     
-    # Gerar 1MB de dados
-    data_1mb = b'A' * (1024 * 1024)
-    received_data = []
+    srv_port = next(_PORTS)
+    cli_port = next(_PORTS)
     
-    # Servidor
-    server = SimpleTCPSocket(10050)
+    # Dados de 1MB (constante de módulo, alocada uma vez)
+    data_1mb = _PAYLOAD_1MB
+    # Buffer de recepção pré-alocado: cada chunk é copiado direto na sua
+    # posição final, em vez de acumular uma lista de objetos bytes e
+    # somar os tamanhos no fim
+    recv_buf = bytearray(len(data_1mb))
+    recv_total = [0]
+    done = threading.Event()
+    
+    # Servidor: buffers de kernel de 4MB para o payload de 1MB caber
+    # em voo sem backpressure do socket UDP subjacente
+    server = SimpleTCPSocket(srv_port, sndbuf=4_000_000, rcvbuf=4_000_000)
     
     def server_thread():
         server.listen()
         if server.accept(timeout=15.0):
             print("Servidor: recebendo dados...")
             
+            # recv_into grava direto no buffer final: nenhum objeto
+            # bytes intermediário por chunk
+            mv_recv = memoryview(recv_buf)
             total = 0
             while total < len(data_1mb):
-                chunk = server.recv(buffer_size=8192)
-                if not chunk:
+                n = server.recv_into(mv_recv[total:], 8192)
+                if not n:
                     break
-                received_data.append(chunk)
-                total += len(chunk)
+                total += n
                 
                 if total % 102400 == 0:  # A cada 100KB
                     print(f"  Recebido: {total/1024:.0f} KB")
             
+            recv_total[0] = total
+            done.set()
             print(f"\nServidor: total recebido = {total} bytes")
             server.close()
     
-    server_t = threading.Thread(target=server_thread)
-    server_t.daemon = True
-    server_t.start()
+    server_t = _SERVER_POOL.submit(server_thread)
     
-    time.sleep(0.5)
+    # Esperar o servidor estar de fato escutando, sem pad fixo
+    server.wait_listening(timeout=5.0)
     
     # Cliente
-    client = SimpleTCPSocket(10051)
+    client = SimpleTCPSocket(cli_port, sndbuf=4_000_000, rcvbuf=4_000_000)
     
-    if client.connect(('localhost', 10050)):
+    if client.connect(('localhost', srv_port)):
         print("\nCliente: enviando 1MB...")
         
-        start_time = time.time()
+        # perf_counter: imune a saltos do relógio de parede durante a medição
+        start_time = time.perf_counter()
         client.send(data_1mb)
         
-        # Aguardar transmissão completa
-        time.sleep(5)
+        # Aguardar o último ACK: o tempo medido é o da transmissão real,
+        # sem o pad fixo de 5s que antes entrava no throughput
+        client.wait_for_completion(timeout=60.0)
         
-        elapsed = time.time() - start_time
+        elapsed = time.perf_counter() - start_time
         
         # Estatísticas
         stats = client.get_statistics()
@@ -396,10 +459,11 @@ def test_performance_1mb():
         print("=" * 70)
         
         client.close()
+        done.wait(timeout=30.0)
         
-        # Verificar integridade
-        total_received = sum(len(d) for d in received_data)
-        success = (total_received == len(data_1mb))
+        # Verificar integridade (tamanho e conteúdo, em uma comparação)
+        total_received = recv_total[0]
+        success = (total_received == len(data_1mb) and recv_buf == data_1mb)
         
         if success:
             print("\n✓ 1MB transferido com sucesso!")
@@ -408,7 +472,7 @@ def test_performance_1mb():
     else:
         success = False
     
-    server_t.join(timeout=10.0)
+    concurrent.futures.wait([server_t], timeout=10.0)
     
     return success
 
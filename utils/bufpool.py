@@ -0,0 +1,37 @@
+"""
+Pool de buffers reutilizáveis para recepção e envio de pacotes
+
+Evita alocar um novo buffer de bytes a cada datagrama: os buffers são
+adquiridos do pool, preenchidos via recvfrom_into/serialize_into e
+devolvidos logo após o uso. queue.SimpleQueue é thread-safe, então um
+mesmo pool pode ser compartilhado entre as threads de envio e recepção.
+"""
+import queue
+
+
+class BufferPool:
+    """Pool de bytearrays de tamanho fixo"""
+
+    def __init__(self, buffer_size = 2048, initial = 4):
+        """
+        Inicializa o pool
+
+        Args:
+            buffer_size: Tamanho de cada buffer em bytes
+            initial: Quantidade de buffers pré-alocados
+        """
+        self.buffer_size = buffer_size
+        self._pool = queue.SimpleQueue()
+        for _ in range(initial):
+            self._pool.put(bytearray(buffer_size))
+
+    def acquire(self):
+        """Retira um buffer do pool (aloca um novo se o pool estiver vazio)"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return bytearray(self.buffer_size)
+
+    def release(self, buf):
+        """Devolve um buffer ao pool para reutilização"""
+        self._pool.put(buf)
@@ -1,15 +1,84 @@
 """
 Sistema de logging para protocolos RDT e TCP
 """
+import atexit
+import itertools
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import time
 from datetime import datetime
 
 
+# Formato compartilhado por todos os handlers do projeto
+_FORMATTER = logging.Formatter(
+    '[%(asctime)s] %(name)s %(levelname)s: %(message)s',
+    datefmt = '%Y-%m-%d %H:%M:%S'
+)
+
+# Fila única de registros: as threads de emissor/receptor apenas
+# enfileiram o LogRecord; a escrita em console/arquivo acontece em uma
+# thread consumidora (QueueListener), fora do caminho crítico
+_LOG_QUEUE = queue.Queue(-1)
+_LISTENER = None
+
+
+def _get_listener():
+    """Cria (uma única vez) e retorna o consumidor da fila de logs"""
+    global _LISTENER
+    if _LISTENER is None:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(_FORMATTER)
+        _LISTENER = logging.handlers.QueueListener(_LOG_QUEUE, console_handler)
+        _LISTENER.start()
+        atexit.register(_LISTENER.stop)
+    return _LISTENER
+
+
+def _restart_listener_after_fork():
+    """Religa a thread consumidora em processos filhos (fork)"""
+    global _LISTENER
+    if _LISTENER is not None:
+        _LISTENER = logging.handlers.QueueListener(_LOG_QUEUE,
+                                                   *_LISTENER.handlers)
+        _LISTENER.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child = _restart_listener_after_fork)
+
+
+class DedupFilter(logging.Filter):
+    """
+    Suprime registros repetidos dentro de uma janela de tempo
+
+    Útil em cenários de perda alta, onde o mesmo TIMEOUT/RETRANSMIT é
+    emitido em rajada: só a primeira ocorrência de cada (nível, início
+    da mensagem) passa por janela.
+    """
+    
+    def __init__(self, window=1.0):
+        super().__init__()
+        self.window = window
+        self._last_seen = {}
+    
+    def filter(self, record):
+        key = (record.levelno, record.getMessage()[:40])
+        now = time.monotonic()
+        last = self._last_seen.get(key)
+        if last is not None and now - last < self.window:
+            return False
+        self._last_seen[key] = now
+        return True
+
+
 class ProtocolLogger:
     """Logger customizado para protocolos de rede"""
     
-    def __init__(self, name, level=logging.INFO, log_file=None):
+    def __init__(self, name, level=logging.INFO, log_file=None,
+                 sample_rate=1, dedup_window=None):
         """
         Inicializa o logger
         
@@ -17,6 +86,11 @@ class ProtocolLogger:
             name: Nome do logger (ex: 'RDT2.0-Sender')
             level: Nível de log (DEBUG, INFO, WARNING, ERROR)
             log_file: Arquivo para salvar logs (opcional)
+            sample_rate: Registra 1 a cada N chamadas de send/receive
+                (transferências grandes geram milhares de linhas SEND/RECV
+                sem valor individual; WARNING/ERROR nunca são amostrados)
+            dedup_window: Janela em segundos para suprimir registros
+                repetidos (None desativa)
         """
         self.logger = logging.getLogger(name)
         self.logger.setLevel(level)
@@ -24,66 +98,112 @@ class ProtocolLogger:
         # Remove handlers existentes
         self.logger.handlers = []
         
-        # Formato do log
-        formatter = logging.Formatter(
-            '[%(asctime)s] %(name)s %(levelname)s: %(message)s',
-            datefmt = '%Y-%m-%d %H:%M:%S'
-        )
+        # O logger só enfileira: sem write()/flush síncrono de stdout ou
+        # arquivo nas threads do protocolo
+        listener = _get_listener()
+        self.logger.addHandler(logging.handlers.QueueHandler(_LOG_QUEUE))
         
-        # Handler para console
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(formatter)
-        self.logger.addHandler(console_handler)
-        
-        # Handler para arquivo (opcional)
+        # Handler para arquivo (opcional): fica do lado do consumidor,
+        # filtrado pelo nome para não receber registros de outros loggers
         if log_file:
             file_handler = logging.FileHandler(log_file)
-            file_handler.setFormatter(formatter)
-            self.logger.addHandler(file_handler)
+            file_handler.setFormatter(_FORMATTER)
+            file_handler.addFilter(logging.Filter(name))
+            listener.handlers = listener.handlers + (file_handler,)
+
+        # Sem propagação: evita formatar/emitir o mesmo registro duas
+        # vezes quando setup_logging instala um handler na raiz
+        self.logger.propagate = False
+        
+        # Amostragem dos logs por pacote (contadores atômicos via count)
+        self.sample_rate = sample_rate
+        self._send_seq = itertools.count()
+        self._recv_seq = itertools.count()
+        
+        if dedup_window:
+            self.logger.addFilter(DedupFilter(dedup_window))
+        
+        # Booleans de nível pré-computados: nas chamadas por pacote, um
+        # load de atributo + branch substitui a caminhada na hierarquia
+        # de loggers que isEnabledFor faz a cada registro
+        self._refresh_level_cache()
     
-    def send(self, packet_info):
-        """Log de envio de pacote"""
-        self.logger.info(f"SEND: {packet_info}")
+    def _refresh_level_cache(self):
+        """Recalcula os booleans de nível habilitado"""
+        self._debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+        self._info_enabled = self.logger.isEnabledFor(logging.INFO)
+        self._warn_enabled = self.logger.isEnabledFor(logging.WARNING)
+        self._error_enabled = self.logger.isEnabledFor(logging.ERROR)
     
-    def receive(self, packet_info):
-        """Log de recebimento de pacote"""
-        self.logger.info(f"RECV: {packet_info}")
+    def set_level(self, level):
+        """Altera o nível de log e invalida o cache de booleans"""
+        self.logger.setLevel(level)
+        self._refresh_level_cache()
     
-    def timeout(self, packet_info):
+    def send(self, packet_info, *args):
+        """Log de envio de pacote (formatação %-style adiada ao handler)"""
+        if not self._info_enabled:
+            return
+        if self.sample_rate > 1 and next(self._send_seq) % self.sample_rate:
+            return
+        self.logger.info("SEND: " + packet_info, *args)
+
+    def receive(self, packet_info, *args):
+        """Log de recebimento de pacote"""
+        if not self._info_enabled:
+            return
+        if self.sample_rate > 1 and next(self._recv_seq) % self.sample_rate:
+            return
+        self.logger.info("RECV: " + packet_info, *args)
+
+    def timeout(self, packet_info, *args):
         """Log de timeout"""
-        self.logger.warning(f"TIMEOUT: {packet_info}")
-    
-    def retransmit(self, packet_info):
+        if self._warn_enabled:
+            self.logger.warning("TIMEOUT: " + packet_info, *args)
+
+    def retransmit(self, packet_info, *args):
         """Log de retransmissão"""
-        self.logger.warning(f"RETRANSMIT: {packet_info}")
-    
-    def corrupt(self, packet_info):
+        if self._warn_enabled:
+            self.logger.warning("RETRANSMIT: " + packet_info, *args)
+
+    def corrupt(self, packet_info, *args):
         """Log de pacote corrompido"""
-        self.logger.error(f"CORRUPT: {packet_info}")
-    
+        if self._error_enabled:
+            self.logger.error("CORRUPT: " + packet_info, *args)
+
     def state_change(self, old_state, new_state):
         """Log de mudança de estado"""
-        self.logger.info(f"STATE: {old_state} -> {new_state}")
-    
-    def deliver(self, data_info):
+        if self._info_enabled:
+            self.logger.info("STATE: %s -> %s", old_state, new_state)
+
+    def deliver(self, data_info, *args):
         """Log de entrega de dados à aplicação"""
-        self.logger.info(f"DELIVER: {data_info}")
-    
-    def debug(self, message):
+        if self._info_enabled:
+            self.logger.info("DELIVER: " + data_info, *args)
+
+    def debug(self, message, *args):
         """Log de debug"""
-        self.logger.debug(message)
-    
-    def info(self, message):
+        if self._debug_enabled:
+            self.logger.debug(message, *args)
+
+    def info(self, message, *args):
         """Log de informação"""
-        self.logger.info(message)
-    
-    def warning(self, message):
+        if self._info_enabled:
+            self.logger.info(message, *args)
+
+    def warning(self, message, *args):
         """Log de aviso"""
-        self.logger.warning(message)
-    
-    def error(self, message):
+        if self._warn_enabled:
+            self.logger.warning(message, *args)
+
+    def error(self, message, *args):
         """Log de erro"""
-        self.logger.error(message)
+        if self._error_enabled:
+            self.logger.error(message, *args)
+
+    def is_enabled_for(self, level):
+        """Indica se o nível de log está ativo (para guardar logs caros)"""
+        return self.logger.isEnabledFor(level)
 
 
 def setup_logging(level=logging.INFO):
@@ -93,8 +213,8 @@ def setup_logging(level=logging.INFO):
     Args:
         level: Nível de log padrão
     """
-    logging.basicConfig(
-        level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%H:%M:%S'
-    )
+    root = logging.getLogger()
+    root.setLevel(level)
+    if not root.handlers:
+        _get_listener()
+        root.addHandler(logging.handlers.QueueHandler(_LOG_QUEUE))
@@ -0,0 +1,247 @@
+"""
+Envio e recepção de datagramas UDP em lote usando sendmmsg/recvmmsg (Linux)
+
+recvmmsg/sendmmsg permitem transferir vários datagramas com uma única
+chamada de sistema, reduzindo o custo por pacote em cenários de alta
+taxa. Os buffers e estruturas (mmsghdr/iovec/sockaddr_in) de recepção
+são alocados uma única vez na criação do receptor e reutilizados em
+todas as chamadas.
+
+Em plataformas sem recvmmsg/sendmmsg, batch_receiver() e batch_send()
+degradam para recvfrom/sendto (um datagrama por chamada).
+"""
+import ctypes
+import socket
+import sys
+
+# recvmmsg: retorna assim que houver ao menos um datagrama disponível
+MSG_WAITFORONE = 0x10000
+
+
+class _SockaddrIn(ctypes.Structure):
+    _fields_ = [
+        ('sin_family', ctypes.c_ushort),
+        ('sin_port', ctypes.c_uint16),
+        ('sin_addr', ctypes.c_uint8 * 4),
+        ('sin_zero', ctypes.c_uint8 * 8),
+    ]
+
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [
+        ('iov_base', ctypes.c_void_p),
+        ('iov_len', ctypes.c_size_t),
+    ]
+
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint),
+        ('msg_iov', ctypes.POINTER(_Iovec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int),
+    ]
+
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_hdr', _Msghdr),
+        ('msg_len', ctypes.c_uint),
+    ]
+
+
+def _load_recvmmsg():
+    """Localiza recvmmsg na libc; retorna None se indisponível"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno = True)
+        func = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.POINTER(_Mmsghdr),
+                     ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    func.restype = ctypes.c_int
+    return func
+
+
+def _load_sendmmsg():
+    """Localiza sendmmsg na libc; retorna None se indisponível"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno = True)
+        func = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.POINTER(_Mmsghdr),
+                     ctypes.c_uint, ctypes.c_int]
+    func.restype = ctypes.c_int
+    return func
+
+
+_recvmmsg = _load_recvmmsg()
+_sendmmsg = _load_sendmmsg()
+
+
+def batch_send(sock, payloads, addr):
+    """
+    Envia vários datagramas ao mesmo destino com uma chamada de sistema
+
+    Usa sendmmsg no Linux (um syscall para o lote inteiro); nas demais
+    plataformas degrada para um sendto por datagrama. O destino é
+    empacotado em um único sockaddr_in compartilhado por todos os
+    cabeçalhos, e cada iovec aponta direto para os bytes do payload
+    (sem cópia).
+
+    Args:
+        sock: Socket UDP
+        payloads: Sequência de bytes a enviar
+        addr: Tupla (host, port) de destino, ou None se o socket já está
+            conectado ao destino (connect)
+
+    Returns:
+        Número de datagramas enviados
+    """
+    if _sendmmsg is None or not payloads:
+        if addr is None:
+            for payload in payloads:
+                sock.send(payload)
+        else:
+            for payload in payloads:
+                sock.sendto(payload, addr)
+        return len(payloads)
+
+    n = len(payloads)
+    if addr is None:
+        # Socket conectado: o kernel já conhece o destino (msg_name nulo)
+        sockaddr = None
+    else:
+        sockaddr = _SockaddrIn()
+        sockaddr.sin_family = socket.AF_INET
+        sockaddr.sin_port = socket.htons(addr[1])
+        sockaddr.sin_addr = (ctypes.c_uint8 * 4)(*socket.inet_aton(
+            socket.gethostbyname(addr[0])))
+
+    # c_char_p aponta para o buffer interno do objeto bytes (zero cópia);
+    # manter as referências vivas até o retorno do syscall
+    cpayloads = [ctypes.c_char_p(p) for p in payloads]
+    iovecs = (_Iovec * n)()
+    msgs = (_Mmsghdr * n)()
+
+    for i, payload in enumerate(payloads):
+        iovecs[i].iov_base = ctypes.cast(cpayloads[i], ctypes.c_void_p)
+        iovecs[i].iov_len = len(payload)
+        hdr = msgs[i].msg_hdr
+        if sockaddr is not None:
+            hdr.msg_name = ctypes.addressof(sockaddr)
+            hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+        hdr.msg_iov = ctypes.pointer(iovecs[i])
+        hdr.msg_iovlen = 1
+
+    sent = _sendmmsg(sock.fileno(), msgs, n, 0)
+    if sent < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, 'sendmmsg falhou')
+    return sent
+
+
+class MmsgReceiver:
+    """Receptor em lote sobre recvmmsg (Linux)"""
+
+    def __init__(self, sock, batch_size = 32, buffer_size = 2048):
+        self.socket = sock
+        self.batch_size = batch_size
+
+        # Buffers e estruturas pré-alocados, reutilizados a cada chamada
+        self._buffers = [bytearray(buffer_size) for _ in range(batch_size)]
+        self._views = [memoryview(buf) for buf in self._buffers]
+        self._cbuffers = [(ctypes.c_char * buffer_size).from_buffer(buf)
+                          for buf in self._buffers]
+        self._addrs = (_SockaddrIn * batch_size)()
+        self._iovecs = (_Iovec * batch_size)()
+        self._msgs = (_Mmsghdr * batch_size)()
+
+        for i in range(batch_size):
+            self._iovecs[i].iov_base = ctypes.addressof(self._cbuffers[i])
+            self._iovecs[i].iov_len = buffer_size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._addrs[i])
+            hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+            hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            hdr.msg_iovlen = 1
+
+    def recv(self):
+        """
+        Recebe um lote de datagramas (bloqueia até haver pelo menos um)
+
+        Os payloads são memoryviews sobre os buffers pré-alocados do pool,
+        sem alocar nem copiar bytes por datagrama. As views só são válidas
+        até a próxima chamada de recv(): quem precisar guardar o payload
+        deve copiá-lo (bytes(view)) antes disso.
+
+        Returns:
+            Lista de tuplas (memoryview, (host, port))
+        """
+        # O kernel sobrescreve msg_namelen; restaurar antes de cada chamada
+        for i in range(self.batch_size):
+            self._msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockaddrIn)
+
+        n = _recvmmsg(self.socket.fileno(), self._msgs,
+                      self.batch_size, MSG_WAITFORONE, None)
+        if n < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, 'recvmmsg falhou')
+
+        datagrams = []
+        for i in range(n):
+            length = self._msgs[i].msg_len
+            addr = self._addrs[i]
+            host = socket.inet_ntoa(bytes(addr.sin_addr))
+            port = socket.ntohs(addr.sin_port)
+            datagrams.append((self._views[i][:length], (host, port)))
+        return datagrams
+
+
+class FallbackReceiver:
+    """Receptor compatível baseado em recvfrom (um datagrama por chamada)"""
+
+    def __init__(self, sock, batch_size = 32, buffer_size = 2048):
+        self.socket = sock
+        # Pool circular de buffers pré-alocados: recvfrom_into evita o
+        # bytes novo que recvfrom alocaria a cada datagrama
+        self._buffers = [bytearray(buffer_size) for _ in range(batch_size)]
+        self._views = [memoryview(buf) for buf in self._buffers]
+        self._index = 0
+
+    def recv(self):
+        """
+        Recebe um datagrama e o retorna no mesmo formato de lote
+
+        Como no MmsgReceiver, o payload é uma memoryview sobre um buffer
+        do pool, válida até o buffer ser reutilizado pelo índice circular.
+        """
+        i = self._index
+        self._index = (i + 1) % len(self._buffers)
+        nbytes, addr = self.socket.recvfrom_into(self._buffers[i])
+        return [(self._views[i][:nbytes], addr)]
+
+
+def batch_receiver(sock, batch_size = 32, buffer_size = 2048):
+    """
+    Cria o receptor em lote mais eficiente disponível na plataforma
+
+    Args:
+        sock: Socket UDP já vinculado (bind)
+        batch_size: Máximo de datagramas por chamada de sistema
+        buffer_size: Tamanho de cada buffer de recepção
+
+    Returns:
+        MmsgReceiver no Linux, FallbackReceiver nas demais plataformas
+    """
+    if _recvmmsg is not None:
+        return MmsgReceiver(sock, batch_size, buffer_size)
+    return FallbackReceiver(sock, batch_size, buffer_size)
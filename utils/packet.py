@@ -2,7 +2,33 @@
 Módulo para criação e manipulação de pacotes RDT/TCP
 """
 import struct
-import hashlib
+import zlib
+
+
+# Structs pré-compilados dos cabeçalhos RDT e TCP: evita reinterpretar a
+# string de formato a cada pacote nos caminhos quentes de
+# serialização/checksum. O checksum entra como inteiro sem sinal
+# ('!BBI' produz os mesmos bytes que o antigo 'BB4s' big-endian),
+# poupando um bytes de 4 bytes por pacote e trocando a comparação de
+# bytes de is_corrupt por uma comparação de inteiros
+_RDT_HEADER = struct.Struct('!BBI')
+_RDT_TYPE_SEQ = struct.Struct('BB')
+# header_len, flags e window_size viajam como um único uint32
+# (5 << 24 | flags << 16 | window): big-endian, são os mesmos 4 bytes do
+# antigo 'BBH', com um campo a menos para o struct empacotar
+_TCP_HEADER = struct.Struct('!HHIIIH')
+_TCP_CSUM_HEADER = struct.Struct('!HHIII')
+_CRC32 = struct.Struct('>I')
+
+# Combinações de flags TCP pré-formatadas, indexadas por
+# FIN (bit 0) | SYN (bit 1) | ACK (bit 2): evita montar lista + join a
+# cada __str__ em logs por pacote
+_TCP_FLAG_STRS = ('NONE', 'FIN', 'SYN', 'SYN,FIN',
+                  'ACK', 'ACK,FIN', 'SYN,ACK', 'SYN,ACK,FIN')
+
+# Nomes dos tipos RDT indexados pelo valor do tipo (PacketType é denso
+# a partir de 0): indexação direta em vez de dict.get por __str__
+_RDT_TYPE_NAMES = ('DATA', 'ACK', 'NAK', 'SYN', 'FIN', 'ACK_VECTOR')
 
 
 class PacketType:
@@ -12,6 +38,9 @@ class PacketType:
     NAK = 2
     SYN = 3
     FIN = 4
+    # Vetor de ACKs: o payload é a sequência de seq_nums confirmados
+    # (1 byte cada), coalescendo vários ACKs em um único datagrama
+    ACK_VECTOR = 5
 
 
 class RDTPacket:
@@ -19,7 +48,13 @@ class RDTPacket:
     Estrutura de pacote para protocolos RDT
     Formato: [Tipo(1) | SeqNum(1) | Checksum(4) | Dados(variável)]
     """
-    
+
+    # Sem __dict__ por instância: em transferências grandes são milhares
+    # de pacotes vivos ao mesmo tempo (janela + buffers), e o layout fixo
+    # corta ~56 bytes e um dict por objeto
+    __slots__ = ('type', 'seq_num', 'data', 'checksum', '_header',
+                 '_expected')
+
     def __init__(self, packet_type, seq_num=0, data=b''):
         """
         Inicializa um pacote RDT
@@ -33,51 +68,155 @@ class RDTPacket:
         self.seq_num = seq_num
         self.data = data
         self.checksum = self._calculate_checksum()
+        self._header = None  # Cabeçalho serializado, memoizado sob demanda
+        self._expected = self.checksum  # Checksum recalculado, memoizado
     
     def _calculate_checksum(self):
-        """Calcula checksum MD5 do pacote"""
-        content = struct.pack('BB', self.type, self.seq_num) + self.data
-        return hashlib.md5(content).digest()[:4]
+        """Calcula checksum CRC32 do pacote (inteiro sem sinal)"""
+        # CRC encadeado: o CRC do cabeçalho alimenta o dos dados, sem
+        # concatenar cabeçalho + payload em um bytes temporário
+        return zlib.crc32(self.data,
+                          zlib.crc32(_RDT_TYPE_SEQ.pack(self.type, self.seq_num)))
     
     def serialize(self):
         """Serializa o pacote para bytes"""
-        header = struct.pack('BB4s', self.type, self.seq_num, self.checksum)
-        return header + self.data
-    
+        # Caminho rápido para pacotes de controle (ACK/NAK sem payload):
+        # o cabeçalho memoizado já é o pacote inteiro
+        if not self.data:
+            return self.serialize_header()
+        # join aceita payload bytes ou memoryview
+        return b''.join((self.serialize_header(), self.data))
+
+    def serialize_header(self):
+        """
+        Serializa apenas o cabeçalho fixo (o checksum já cobre cabeçalho + dados)
+
+        Combinado com socket.sendmsg([header, data]), permite enviar o pacote
+        sem concatenar cabeçalho e payload. O resultado é memoizado, então
+        retransmissões reutilizam os mesmos bytes.
+
+        Returns:
+            Bytes do cabeçalho (6 bytes)
+        """
+        if self._header is None:
+            self._header = _RDT_HEADER.pack(self.type, self.seq_num, self.checksum)
+        return self._header
+
+    def serialize_into(self, buf):
+        """
+        Serializa o pacote em um buffer pré-alocado, sem alocar bytes novos
+
+        Args:
+            buf: bytearray com espaço para cabeçalho + dados
+
+        Returns:
+            Número de bytes escritos
+        """
+        _RDT_HEADER.pack_into(buf, 0, self.type, self.seq_num, self.checksum)
+        end = 6 + len(self.data)
+        buf[6:end] = self.data
+        return end
+
+    @classmethod
+    def _from_wire(cls, packet_type, seq_num, data, checksum):
+        """
+        Constrói um pacote a partir de campos já vindos do fio
+
+        Não recalcula o checksum na construção: o valor recebido é
+        adotado como está e a verificação fica adiada (e memoizada) em
+        is_corrupt, eliminando um CRC redundante por pacote recebido.
+        """
+        packet = cls.__new__(cls)
+        packet.type = packet_type
+        packet.seq_num = seq_num
+        packet.data = data
+        packet.checksum = checksum
+        packet._header = None
+        packet._expected = None
+        return packet
+
     @staticmethod
     def deserialize(packet_bytes):
         """
         Deserializa bytes para um objeto RDTPacket
-        
+
         Args:
-            packet_bytes: Bytes recebidos
-            
+            packet_bytes: Bytes ou memoryview recebidos
+
         Returns:
             RDTPacket ou None se inválido
         """
         try:
             if len(packet_bytes) < 6:
                 return None
-            
-            packet_type, seq_num, checksum = struct.unpack('BB4s', packet_bytes[:6])
-            data = packet_bytes[6:]
-            
-            packet = RDTPacket(packet_type, seq_num, data)
-            packet.checksum = checksum
-            
-            return packet
+
+            # Visão zero-copy: fatiar um bytearray direto criaria uma
+            # cópia intermediária antes do bytes() final
+            mv = memoryview(packet_bytes)
+            packet_type, seq_num, checksum = _RDT_HEADER.unpack_from(mv, 0)
+            # Copiar os dados: o buffer de origem pode ser reutilizado (pool)
+            data = bytes(mv[6:])
+
+            return RDTPacket._from_wire(packet_type, seq_num, data, checksum)
         except Exception as e:
             print(f"Erro ao deserializar pacote: {e}")
             return None
     
+    @staticmethod
+    def verify_buffer(packet_bytes):
+        """
+        Verifica a integridade direto no buffer bruto, antes de qualquer parse
+
+        Inverte o fluxo "interpretar e depois validar": o tipo é checado e o
+        CRC32 é calculado sobre o próprio buffer (cabeçalho sem checksum +
+        dados), então pacotes corrompidos nem chegam a virar um RDTPacket.
+
+        Args:
+            packet_bytes: Bytes ou memoryview recebidos
+
+        Returns:
+            True se o cabeçalho é plausível e o checksum confere
+        """
+        if len(packet_bytes) < 6:
+            return False
+        if packet_bytes[0] > PacketType.ACK_VECTOR:
+            return False
+        crc = zlib.crc32(packet_bytes[6:], zlib.crc32(packet_bytes[:2]))
+        return _CRC32.unpack_from(packet_bytes, 2)[0] == crc
+
+    def deserialize_into(self, packet_bytes):
+        """
+        Preenche ESTA instância a partir dos bytes recebidos
+
+        Permite reutilizar um único RDTPacket no loop de recepção em vez de
+        alocar (e descartar) um objeto por datagrama. Os dados são copiados,
+        então o buffer de origem pode ser reutilizado em seguida.
+
+        Args:
+            packet_bytes: Bytes ou memoryview recebidos
+
+        Returns:
+            True se o cabeçalho é bem-formado, False caso contrário
+        """
+        if len(packet_bytes) < 6:
+            return False
+
+        self.type, self.seq_num, self.checksum = _RDT_HEADER.unpack_from(packet_bytes, 0)
+        self.data = bytes(packet_bytes[6:])
+        self._header = None
+        self._expected = None
+        return True
+
     def is_corrupt(self):
         """Verifica se o pacote está corrompido"""
-        expected_checksum = self._calculate_checksum()
-        return self.checksum != expected_checksum
-    
+        if self._expected is None:
+            self._expected = self._calculate_checksum()
+        return self.checksum != self._expected
+
     def __str__(self):
-        type_names = {0: 'DATA', 1: 'ACK', 2: 'NAK', 3: 'SYN', 4: 'FIN'}
-        return f"[{type_names.get(self.type, 'UNKNOWN')} | Seq:{self.seq_num} | Len:{len(self.data)}]"
+        name = (_RDT_TYPE_NAMES[self.type]
+                if self.type < len(_RDT_TYPE_NAMES) else 'UNKNOWN')
+        return f"[{name} | Seq:{self.seq_num} | Len:{len(self.data)}]"
 
 
 class TCPSegment:
@@ -90,7 +229,11 @@ class TCPSegment:
     FLAG_FIN = 0x01
     FLAG_SYN = 0x02
     FLAG_ACK = 0x10
-    
+
+    __slots__ = ('src_port', 'dst_port', 'seq_num', 'ack_num', 'flags',
+                 'window_size', 'data', 'checksum', '_wire', '_expected')
+
+
     def __init__(self, src_port, dst_port, seq_num, ack_num, 
                  flags=0, window_size=4096, data=b''):
         """
@@ -113,65 +256,106 @@ class TCPSegment:
         self.window_size = window_size
         self.data = data
         self.checksum = self._calculate_checksum()
+        self._wire = None  # Segmento serializado, memoizado sob demanda
+        self._expected = self.checksum  # Checksum recalculado, memoizado
     
     def _calculate_checksum(self):
-        """Calcula checksum do segmento"""
-        header = struct.pack('!HHIIBBH', 
-                           self.src_port, self.dst_port,
-                           self.seq_num, self.ack_num,
-                           5, self.flags, self.window_size)
-        content = header + self.data
-        return hashlib.md5(content).digest()[:2]
+        """Calcula checksum CRC32 (truncado a 16 bits) do segmento"""
+        header = _TCP_CSUM_HEADER.pack(self.src_port, self.dst_port,
+                                       self.seq_num, self.ack_num,
+                                       (5 << 24) | (self.flags << 16)
+                                       | self.window_size)
+        # CRC encadeado: o do cabeçalho alimenta o dos dados, aceitando
+        # payload memoryview sem concatenar em um bytes temporário.
+        # Detecção de erro não precisa de hash criptográfico: CRC32 em C
+        # custa uma fração do MD5 por byte
+        return zlib.crc32(self.data, zlib.crc32(header)) & 0xFFFF
     
     def serialize(self):
-        """Serializa o segmento para bytes"""
-        header = struct.pack('!HHIIBBH2s',
-                           self.src_port, self.dst_port,
-                           self.seq_num, self.ack_num,
-                           5, self.flags, self.window_size,
-                           self.checksum)
-        return header + self.data
+        """
+        Serializa o segmento para bytes
+
+        O resultado é memoizado: retransmissões do mesmo segmento
+        reutilizam os mesmos bytes em vez de reempacotar o cabeçalho
+        e reconcatenar o payload a cada envio.
+        """
+        if self._wire is None:
+            header = _TCP_HEADER.pack(self.src_port, self.dst_port,
+                                      self.seq_num, self.ack_num,
+                                      (5 << 24) | (self.flags << 16)
+                                      | self.window_size,
+                                      self.checksum)
+            # join aceita payload bytes ou memoryview
+            self._wire = b''.join((header, self.data))
+        return self._wire
     
+    @classmethod
+    def _from_wire(cls, src_port, dst_port, seq_num, ack_num, flags,
+                   window_size, data, checksum):
+        """
+        Constrói um segmento a partir de campos já vindos do fio
+
+        O checksum recebido é adotado sem recalcular; a verificação fica
+        adiada (e memoizada) em is_corrupt.
+        """
+        segment = cls.__new__(cls)
+        segment.src_port = src_port
+        segment.dst_port = dst_port
+        segment.seq_num = seq_num
+        segment.ack_num = ack_num
+        segment.flags = flags
+        segment.window_size = window_size
+        segment.data = data
+        segment.checksum = checksum
+        segment._wire = None
+        segment._expected = None
+        return segment
+
     @staticmethod
     def deserialize(segment_bytes):
-        """Deserializa bytes para TCPSegment"""
+        """
+        Deserializa bytes para TCPSegment
+
+        Args:
+            segment_bytes: Bytes ou memoryview recebidos
+
+        Returns:
+            TCPSegment ou None se inválido
+        """
         try:
-            if len(segment_bytes) < 20:
+            # Cabeçalho fixo de 18 bytes (formato '!HHIIIH')
+            if len(segment_bytes) < 18:
                 return None
+
+            mv = memoryview(segment_bytes)
+            src_port, dst_port, seq_num, ack_num, packed, \
+                checksum = _TCP_HEADER.unpack_from(mv, 0)
+            flags = (packed >> 16) & 0xFF
+            window_size = packed & 0xFFFF
+
+            # Copiar os dados: o buffer de origem pode ser reutilizado
+            data = bytes(mv[18:])
             
-            src_port, dst_port, seq_num, ack_num, header_len, flags, \
-                window_size, checksum = struct.unpack('!HHIIBBH2s', segment_bytes[:20])
-            
-            data = segment_bytes[20:]
-            
-            segment = TCPSegment(src_port, dst_port, seq_num, ack_num,
-                               flags, window_size, data)
-            segment.checksum = checksum
-            
-            return segment
+            return TCPSegment._from_wire(src_port, dst_port, seq_num, ack_num,
+                                         flags, window_size, data, checksum)
         except Exception as e:
             print(f"Erro ao deserializar segmento TCP: {e}")
             return None
     
     def is_corrupt(self):
         """Verifica se o segmento está corrompido"""
-        expected_checksum = self._calculate_checksum()
-        return self.checksum != expected_checksum
+        if self._expected is None:
+            self._expected = self._calculate_checksum()
+        return self.checksum != self._expected
     
     def has_flag(self, flag):
         """Verifica se uma flag está ativada"""
         return (self.flags & flag) != 0
     
     def __str__(self):
-        flags_str = []
-        if self.has_flag(self.FLAG_SYN):
-            flags_str.append('SYN')
-        if self.has_flag(self.FLAG_ACK):
-            flags_str.append('ACK')
-        if self.has_flag(self.FLAG_FIN):
-            flags_str.append('FIN')
-        
+        # FIN e SYN já ocupam os bits 0 e 1; ACK (0x10) desce para o bit 2
+        idx = (self.flags & 0x03) | ((self.flags >> 2) & 0x04)
         return (f"[TCP | {self.src_port}->{self.dst_port} | "
                 f"Seq:{self.seq_num} Ack:{self.ack_num} | "
-                f"Flags:{','.join(flags_str) if flags_str else 'NONE'} | "
+                f"Flags:{_TCP_FLAG_STRS[idx]} | "
                 f"Win:{self.window_size} | Len:{len(self.data)}]")
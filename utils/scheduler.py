@@ -0,0 +1,123 @@
+"""
+Agendador de temporizadores compartilhado
+
+threading.Timer cria uma thread do sistema operacional por temporizador;
+protocolos com janela (re)agendam timers constantemente e pagam esse
+custo a cada pacote. Aqui uma única thread daemon serve todos os
+temporizadores a partir de um heap de (prazo, callback); cancelamento é
+preguiçoso (a entrada é marcada e ignorada ao chegar ao topo do heap).
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+
+
+class TimerHandle:
+    """Referência a um temporizador agendado"""
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancela o temporizador (o callback não será chamado)"""
+        self.cancelled = True
+
+
+class TimerScheduler:
+    """Fila de temporizadores servida por uma única thread daemon"""
+
+    def __init__(self):
+        self._heap = []
+        self._cv = threading.Condition()
+        self._counter = itertools.count()  # desempate de prazos iguais
+        self._thread = None
+
+    def call_later(self, delay, callback):
+        """
+        Agenda callback para daqui a delay segundos
+
+        Args:
+            delay: Atraso em segundos
+            callback: Função sem argumentos a chamar no disparo
+
+        Returns:
+            TimerHandle (use .cancel() para desarmar)
+        """
+        handle = TimerHandle()
+        deadline = time.monotonic() + delay
+
+        with self._cv:
+            heapq.heappush(self._heap,
+                           (deadline, next(self._counter), callback, handle))
+            if self._thread is None:
+                self._thread = threading.Thread(target = self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cv.notify()
+
+        return handle
+
+    def _run(self):
+        """Loop da thread: dorme até o prazo mais próximo e dispara"""
+        while True:
+            due = []
+            with self._cv:
+                while not self._heap:
+                    self._cv.wait()
+
+                deadline, _, callback, handle = self._heap[0]
+
+                if handle.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+
+                now = time.monotonic()
+                if deadline > now:
+                    # Um call_later mais próximo notifica e reavalia o topo
+                    self._cv.wait(deadline - now)
+                    continue
+
+                # Drena todos os prazos já vencidos em uma única passada
+                # sob o lock: uma rajada de temporizadores vira uma
+                # aquisição de lock, não uma por disparo
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, cb, h = heapq.heappop(self._heap)
+                    if not h.cancelled:
+                        due.append((cb, h))
+
+            # Callbacks fora do lock (podem reagendar via call_later)
+            for cb, h in due:
+                if h.cancelled:
+                    continue
+                try:
+                    cb()
+                except Exception as e:
+                    print(f"[SCHEDULER] Erro no callback: {e}")
+
+
+# Agendador global compartilhado por todos os protocolos do processo
+_scheduler = TimerScheduler()
+
+
+def _restart_scheduler_after_fork():
+    """Reinicia o agendador em processos filhos (fork)
+
+    A thread do agendador não sobrevive ao fork, e call_later só a cria
+    quando _thread is None — sem isto, temporizadores agendados no filho
+    nunca disparariam. Os prazos herdados pertencem ao pai e são
+    descartados.
+    """
+    _scheduler._thread = None
+    _scheduler._heap.clear()
+    _scheduler._cv = threading.Condition()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child = _restart_scheduler_after_fork)
+
+
+def call_later(delay, callback):
+    """Agenda callback no agendador global; retorna TimerHandle"""
+    return _scheduler.call_later(delay, callback)
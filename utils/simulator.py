@@ -2,10 +2,25 @@
 Simulador de canal não confiável para testes
 Simula perda de pacotes, corrupção e atrasos
 """
+import collections
+import logging
 import random
 import threading
 import time
 
+from utils.mmsg import batch_send
+from utils.scheduler import call_later
+
+try:
+    import numpy as np
+except ImportError:  # numpy é opcional: o canal degrada para random
+    np = None
+
+# Logger de módulo: print() no caminho por pacote serializa o simulador
+# inteiro no lock do stdout em cenários de perda alta; log.debug vira um
+# branch barato quando o nível DEBUG está desabilitado
+log = logging.getLogger(__name__)
+
 
 class UnreliableChannel:
     """
@@ -13,7 +28,8 @@ class UnreliableChannel:
     Pode perder pacotes, corromper dados e introduzir atrasos
     """
     
-    def __init__(self, loss_rate=0.0, corrupt_rate=0.0, delay_range=(0.01, 0.1)):
+    def __init__(self, loss_rate=0.0, corrupt_rate=0.0, delay_range=(0.01, 0.1),
+                 prefetch=100000):
         """
         Inicializa o canal não confiável
         
@@ -21,56 +37,145 @@ class UnreliableChannel:
             loss_rate: Probabilidade de perda de pacote (0.0 a 1.0)
             corrupt_rate: Probabilidade de corrupção (0.0 a 1.0)
             delay_range: Tupla (min_delay, max_delay) em segundos
+            prefetch: Tamanho do lote de números aleatórios pré-gerados
         """
         self.loss_rate = loss_rate
         self.corrupt_rate = corrupt_rate
         self.delay_range = delay_range
         
+        # Lote de uniformes [0,1) gerado de uma vez em C (numpy): as
+        # decisões de perda/corrupção/atraso por pacote consomem do lote
+        # em vez de chamar random.random() uma a uma
+        self.prefetch = prefetch
+        self._rng = np.random.default_rng() if np is not None else None
+        self._rand = None
+        self._rand_idx = 0
+        # Instância própria de Random para o fallback sem numpy: o módulo
+        # random compartilha um único Mersenne Twister global, disputado
+        # por todas as threads do simulador
+        self._pyrand = random.Random()
+        
+        # Pacotes com prazo vencido aguardando o flush em lote: rajadas
+        # que vencem juntas saem agrupadas via sendmmsg em vez de um
+        # syscall por pacote
+        self._ready = collections.deque()
+        self._ready_lock = threading.Lock()
+        self._flush_scheduled = False
+
         # Estatísticas
         self.packets_sent = 0
         self.packets_lost = 0
         self.packets_corrupted = 0
         self.total_delay = 0.0
     
+    def _next_random(self):
+        """Próximo uniforme [0,1) do lote pré-gerado (regenera ao esgotar)"""
+        if self._rng is None:
+            return self._pyrand.random()
+        if self._rand is None or self._rand_idx >= self.prefetch:
+            self._rand = self._rng.random(self.prefetch)
+            self._rand_idx = 0
+        r = self._rand[self._rand_idx]
+        self._rand_idx += 1
+        return r
+    
+    def set_params(self, loss_rate=None, corrupt_rate=None, delay_range=None):
+        """
+        Reconfigura o canal sem recriá-lo (reuso entre cenários de teste)
+        
+        Args:
+            loss_rate: Nova probabilidade de perda (None mantém a atual)
+            corrupt_rate: Nova probabilidade de corrupção
+            delay_range: Nova faixa (min, max) de atraso em segundos
+        """
+        if loss_rate is not None:
+            self.loss_rate = loss_rate
+        if corrupt_rate is not None:
+            self.corrupt_rate = corrupt_rate
+        if delay_range is not None:
+            self.delay_range = delay_range
+    
     def send(self, packet, dest_socket, dest_addr):
         """
         Envia pacote através do canal não confiável
-        
+
         Args:
-            packet: Bytes do pacote a enviar
+            packet: Bytes do pacote a enviar, ou lista de buffers
+                (cabeçalho, dados) no estilo scatter-gather
             dest_socket: Socket UDP de destino
             dest_addr: Endereço (host, port) de destino
         """
         self.packets_sent += 1
-        
+
         # Simular perda
-        if random.random() < self.loss_rate:
+        if self._next_random() < self.loss_rate:
             self.packets_lost += 1
-            print(f"[CANAL] Pacote #{self.packets_sent} PERDIDO")
+            log.debug("[CANAL] Pacote #%d PERDIDO", self.packets_sent)
             return
-        
-        # Simular corrupção
-        if random.random() < self.corrupt_rate:
+
+        # Simular corrupção: só aqui o pacote inteiro é necessário, então
+        # listas de buffers (iovec) são juntadas apenas neste ramo; no
+        # caminho comum elas seguem separadas até o sendmsg
+        if self._next_random() < self.corrupt_rate:
+            if isinstance(packet, (list, tuple)):
+                packet = b''.join(packet)
             packet = self._corrupt_packet(packet)
             self.packets_corrupted += 1
-            print(f"[CANAL] Pacote #{self.packets_sent} CORROMPIDO")
+            log.debug("[CANAL] Pacote #%d CORROMPIDO", self.packets_sent)
         
         # Simular atraso
-        delay = random.uniform(*self.delay_range)
+        lo, hi = self.delay_range
+        delay = lo + self._next_random() * (hi - lo)
         self.total_delay += delay
         
-        # Enviar com atraso
-        timer = threading.Timer(delay, self._delayed_send, 
-                              args=(packet, dest_socket, dest_addr))
-        timer.daemon = True
-        timer.start()
+        # Enviar com atraso: o agendador compartilhado serve todos os
+        # pacotes com uma única thread, em vez de uma threading.Timer
+        # (uma thread de SO) por pacote
+        call_later(delay, lambda: self._delayed_send(packet, dest_socket,
+                                                     dest_addr))
     
     def _delayed_send(self, packet, dest_socket, dest_addr):
-        """Envia o pacote após o atraso"""
-        try:
-            dest_socket.sendto(packet, dest_addr)
-        except Exception as e:
-            print(f"[CANAL] Erro ao enviar pacote: {e}")
+        """Enfileira o pacote vencido para envio (em lote, se em rajada)"""
+        with self._ready_lock:
+            self._ready.append((packet, dest_socket, dest_addr))
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        # O flush roda na mesma passada de drenagem do agendador, depois
+        # dos demais temporizadores vencidos: tudo que venceu junto é
+        # agrupado em um lote só
+        call_later(0, self._flush_ready)
+
+    def _flush_ready(self):
+        """Envia os pacotes vencidos, agrupados por (socket, destino)"""
+        with self._ready_lock:
+            ready = list(self._ready)
+            self._ready.clear()
+            self._flush_scheduled = False
+
+        groups = {}
+        for packet, dest_socket, dest_addr in ready:
+            groups.setdefault((dest_socket, dest_addr), []).append(packet)
+
+        for (dest_socket, dest_addr), packets in groups.items():
+            try:
+                if len(packets) == 1:
+                    packet = packets[0]
+                    if isinstance(packet, (list, tuple)):
+                        # Scatter-gather: o kernel junta cabeçalho e
+                        # payload em um único datagrama, sem concatenação
+                        # em userspace
+                        dest_socket.sendmsg(packet, [], 0, dest_addr)
+                    else:
+                        dest_socket.sendto(packet, dest_addr)
+                else:
+                    # Rajada: um sendmmsg para o lote inteiro compensa a
+                    # concatenação dos pacotes em iovec
+                    payloads = [b''.join(p) if isinstance(p, (list, tuple))
+                                else p for p in packets]
+                    batch_send(dest_socket, payloads, dest_addr)
+            except Exception as e:
+                log.warning("[CANAL] Erro ao enviar pacote: %s", e)
     
     def _corrupt_packet(self, packet):
         """
@@ -82,20 +187,30 @@ class UnreliableChannel:
         Returns:
             Bytes do pacote corrompido
         """
-        packet_list = list(packet)
-        
-        if len(packet_list) == 0:
+        if len(packet) == 0:
             return packet
         
-        # Corrompe de 1 a 5 bytes aleatórios
-        num_corruptions = random.randint(1, min(5, len(packet_list)))
+        buf = bytearray(packet)
         
-        for _ in range(num_corruptions):
-            idx = random.randint(0, len(packet_list) - 1)
-            # Inverter todos os bits do byte
-            packet_list[idx] = packet_list[idx] ^ 0xFF
+        # Corrompe de 1 a 5 bytes aleatórios (uniforme do lote pré-gerado,
+        # sem tocar no Mersenne Twister global do módulo random)
+        num_corruptions = 1 + int(self._next_random() * min(5, len(buf)))
+
+        if np is not None:
+            # XOR vetorizado: frombuffer é uma visão zero-copy sobre o
+            # bytearray, então a inversão acontece toda em C. bitwise_xor.at
+            # aplica índices duplicados um a um (o XOR duplo se cancela,
+            # como aconteceria no fio)
+            idxs = self._rng.integers(0, len(buf), size=num_corruptions)
+            arr = np.frombuffer(buf, dtype=np.uint8)
+            np.bitwise_xor.at(arr, idxs, np.uint8(0xFF))
+        else:
+            for _ in range(num_corruptions):
+                idx = self._pyrand.randrange(len(buf))
+                # Inverter todos os bits do byte
+                buf[idx] ^= 0xFF
         
-        return bytes(packet_list)
+        return bytes(buf)
     
     def get_statistics(self):
         """
@@ -114,11 +229,13 @@ class UnreliableChannel:
         }
     
     def reset_statistics(self):
-        """Reseta as estatísticas do canal"""
+        """Reseta as estatísticas do canal (e o lote de aleatórios)"""
         self.packets_sent = 0
         self.packets_lost = 0
         self.packets_corrupted = 0
         self.total_delay = 0.0
+        self._rand = None
+        self._rand_idx = 0
     
     def print_statistics(self):
         """Imprime estatísticas formatadas"""